@@ -6,10 +6,23 @@ import datetime as dt
 import argparse
 import importlib
 import logging
+import copy
+import time
+import itertools
+import tempfile
+import concurrent.futures
+import numpy as np
 import matplotlib.pyplot as plt
 import backtrader as bt
 import backtrader.analyzers as btanalyzers
 import strategies
+from strategies.base import ParityError
+from utils.candle_store import CandleStore
+from utils.indicator_matrix import IndicatorMatrix
+from utils.data_quality import check_candles, sort_candles, ffill_gaps
+from utils.frames import compact_candles, frame_memory
+from utils.results import FEES, RunResult, ResultsStore
+from utils.performance import RunTrades, run_stats
 
 
 class DataCollectionError(Exception):
@@ -34,6 +47,7 @@ class Base:
         self.data_prefetch_period = 15*86400
 
         self._load_config()
+        self.candle_store = CandleStore(f'{self.path}/data/candles')
 
         # Overwrite config file settings from cli args
         self.csv_file = args.file
@@ -50,6 +64,8 @@ class Base:
             self.trading_cfg['num_periods'] = args.num_periods
         if args.asset_type:
             self.trading_cfg['asset_type'] = args.asset_type
+        if getattr(args, 'compact', False):
+            self.trading_cfg['compact_candles'] = True
 
         for _cfg in self.data_cfg:
             i = 1
@@ -121,34 +137,58 @@ class Base:
                 start_ts -= 1
         self.start_prefetch = dt.datetime.fromtimestamp(start_ts)
 
+    def _candle_store_key(self, symbol, period):
+        return (self.trading_cfg['exchange'], symbol, period[2], self.trading_cfg['asset_type'])
+
+    def _sync_candle_store(self, symbol, period, start_ts, end_ts):
+        """
+        Fetch the parts of [start_ts, end_ts) the local candle store doesn't
+            cover yet from the exchange
+
+        Returns
+        ---------
+        (tuple): candle store key for the series
+
+        """
+        key = self._candle_store_key(symbol, period)
+        for _start, _end in self.candle_store.missing_ranges(key, start_ts, end_ts):
+            new_df = self.exchange_obj.get_backtest_data_range(
+                symbol,
+                period[2],
+                dt.datetime.fromtimestamp(_start),
+                dt.datetime.fromtimestamp(_end),
+                asset_type=self.trading_cfg['asset_type'])
+            if new_df is None or new_df.empty:
+                logging.warning(f'No {period[1]} candles for {symbol} from {_start} to {_end}')
+                # Nothing listed then (e.g. pre-listing, delisted): covered, up to the last completed candle
+                covered_end = min(_end, int(time.time())//period[2]*period[2])
+                self.candle_store.write(key, None, _start, covered_end)
+                continue
+            # Only completed candles are returned, so coverage ends after the last one
+            covered_end = min(_end, int(new_df['datetime'].max()) + period[2])
+            self.candle_store.write(key, new_df, _start, covered_end)
+            logging.info(f'Stored {new_df.shape[0]} {period[1]} candles for {symbol} from {_start} to {covered_end}')
+        return key
+
     def _get_data_api(self, period, start=None):
-        df_list = []
-        start_dt = self.start_prefetch
+        """
+        Load candles for the series from the local candle store, fetching only
+            the ranges it doesn't cover yet from the exchange
+        """
+        symbol = self.data_cfg[len(self.df) - 1][0]
         if self.end is None:
             end_dt = None
         else:
             self.end = self.end + tuple([0 for i in range(len(self.end), 5)])
             end_dt = dt.datetime(*self.end)
-        while True:
-            _end_dt = dt.datetime.utcnow() if end_dt is None else end_dt
-            new_df = self.exchange_obj.get_backtest_data(
-                self.data_cfg[len(self.df) - 1][0],
-                period[2],
-                start_dt,
-                _end_dt,
-                asset_type=self.trading_cfg['asset_type'])
-            df_list.append(new_df)
-            remaining = int(
-                ((_end_dt.timestamp() - start_dt.timestamp())/period[2]))
-            logging.debug(f'Collecting data - {len(df_list)*df_list[0].shape[0]} periods, remaining: {remaining}')
-            secs_til_end = _end_dt.timestamp() - start_dt.timestamp()
-            if not self.exchange_obj.max_candles_fetch or secs_til_end < period[2]*self.exchange_obj.max_candles_fetch:
-                break
-            start_dt = max(new_df.index) + dt.timedelta(seconds=period[2])
+        _end_dt = dt.datetime.utcnow() if end_dt is None else end_dt
+        start_ts = int(self.start_prefetch.timestamp())
+        end_ts = int(_end_dt.timestamp())
+        key = self._sync_candle_store(symbol, period, start_ts, end_ts)
         self.end = (_end_dt.year, _end_dt.month, _end_dt.day, _end_dt.hour, _end_dt.minute)
         self.end_ts = int(dt.datetime(*self.end).timestamp())
-        self.df.append(pd.concat(df_list))
-        self.df[-1] = self.df[-1].set_index(['datetime'], verify_integrity=True)
+        # Candles completed by the end time
+        self.df.append(self.candle_store.read(key, start_ts, end_ts - period[2] + 1))
         logging.info(f'Data collection finished. Dataframe dimensions: {self.df[-1].shape}')
         self.dump_to_csv()
 
@@ -159,46 +199,82 @@ class Base:
         """
         Do extra checks on data retrived from API
             - Verify all gaps between timestamps are as expected
-            - Verfiy traded volume is not zero
+            - Verify candles are in order, without duplicates
+            - Report candles with zero traded volume
+
+        With args.gap_fill set, out of order/duplicate candles are dropped and
+            gaps filled first: 'refetch' asks the exchange for just the
+            missing ranges, 'ffill' adds flat candles at the previous close
+
+        Reports per series are kept in self.data_reports
         """
-        time_checks = [False for _ in self.df]
-        vol_checks = [False for _ in self.df]
+        gap_fill = getattr(self.args, 'gap_fill', None)
+        self.data_reports = []
         for i, _df in enumerate(self.df):
-            # Check for timestamp gaps
-            _shifted_col = [list(_df.index)[0] - self.data_cfg[i][2]] + list(_df.index)[:-1]
-            tmp_df = pd.DataFrame(_shifted_col, columns=['time_prv']).set_index(_df.index)
-            tmp_df['time'] = list(_df.index)
-            time_deltas = tmp_df.apply(
-                lambda r: True
-                if r.time - r.time_prv == self.data_cfg[i][2]
-                else False, axis=1)
-            if not time_deltas.all():
-                # There are gaps
-                time_checks[i] = [
-                    tmp_df['time'].iloc[i]
-                    for i, chk in enumerate(time_deltas)
-                    if not chk
-                ]
-
-            # Check for 0 volume
-            ### Not working yet ###
-            if 0 in _df['volume']:
-                vol_checks[i] = [
-                    True
-                    for vol in _df['volume']
-                    if not vol == 0
-                ]
-        for i, check in enumerate(time_checks):
-            if check:
-                t = [
-                    dt.datetime.fromtimestamp(_t).strftime('%y-%m-%d:%H:%M')
-                    for _t in time_checks[i]
-                ]
-                msg = f"Gaps in {self.trading_cfg['series'][i][1]} series: {t}"
-                logging.warning(msg)
-
-        return not any(time_checks)
-
+            period = self.data_cfg[i][2]
+            report = check_candles(_df.index, _df['volume'] if 'volume' in _df else None, period)
+            if gap_fill and not report.ok:
+                _df = sort_candles(_df)
+                if gap_fill == 'refetch' and len(report.gaps):
+                    _df = self._refetch_gaps(i, _df, report.gaps)
+                if gap_fill == 'ffill':
+                    _df = ffill_gaps(_df, period)
+                self.df[i] = _df
+                logging.info(f"Filled {self.data_cfg[i][1]} series ({gap_fill}): {report}")
+                report = check_candles(_df.index, _df['volume'] if 'volume' in _df else None, period)
+            self.data_reports.append(report)
+
+            series = self.trading_cfg['series'][i][1]
+            fmt = lambda ts: [dt.datetime.fromtimestamp(_t).strftime('%y-%m-%d:%H:%M') for _t in ts[:10]]
+            if len(report.gaps):
+                logging.warning(f"Gaps in {series} series ({report.missing_candles} candles): {fmt(report.gaps[:, 0])}")
+            if len(report.duplicates) or len(report.non_monotonic) or len(report.misaligned):
+                logging.warning(
+                    f"Bad timestamps in {series} series: duplicates {fmt(report.duplicates)},"
+                    f" out of order {fmt(report.non_monotonic)}, misaligned {fmt(report.misaligned)}")
+            if len(report.zero_volume):
+                logging.warning(f"{len(report.zero_volume)} zero volume candles in {series} series: {fmt(report.zero_volume)}")
+
+        return all(report.ok for report in self.data_reports)
+
+    def _refetch_gaps(self, i, df, gaps):
+        """
+        Fetch just the missing [start, end) ranges of series i from the
+            exchange and merge them into df (and the candle store)
+        """
+        symbol = self.data_cfg[i][0]
+        period = self.data_cfg[i]
+        key = self._candle_store_key(symbol, period)
+        new = []
+        for start_ts, end_ts in gaps:
+            new_df = self.exchange_obj.get_backtest_data_range(
+                symbol,
+                period[2],
+                dt.datetime.fromtimestamp(int(start_ts)),
+                dt.datetime.fromtimestamp(int(end_ts)),
+                asset_type=self.trading_cfg['asset_type'])
+            if new_df is None:
+                continue
+            new_df = new_df[new_df['datetime'].between(start_ts, end_ts - 1)]
+            if self.csv_file is None:
+                self.candle_store.write(key, new_df, int(start_ts), int(start_ts))
+            new.append(new_df.set_index('datetime')[list(df.columns)].astype(float))
+        logging.info(f'Refetched {sum(len(_df.index) for _df in new)} {period[1]} candles for {len(gaps)} gaps')
+        return sort_candles(pd.concat([df] + new)) if new else df
+
+    def _compact_candles(self):
+        """
+        Opt-in (cfg compact_candles, or --compact): int64 index, OHLCV cols
+            only, float32 where the prices are exact in it
+        """
+        if not self.trading_cfg.get('compact_candles'):
+            return
+        for i, _df in enumerate(self.df):
+            before = frame_memory(_df)
+            self.df[i] = compact_candles(_df)
+            logging.info(
+                f"Compact {self.data_cfg[i][1]} candles: {before/1e6:.2f}MB -> {frame_memory(self.df[i])/1e6:.2f}MB"
+                f" per 100k, float32 cols: {list(self.df[i].attrs['decimals'])}")
 
     def _trim_dataframes(self):
         # If more than one series, align final timestamps
@@ -209,15 +285,8 @@ class Base:
 
 
     def dump_to_csv(self):
+        # Candles are kept in the candle store (data/candles/), only the latest df is dumped for reporting
         i = len(self.df) - 1
-        filename = (
-            f'{self.exchange_cls.__name__}'
-            f'_{self.data_cfg[i][0]}'
-            f'_{self.data_cfg[i][1]}'
-            f'_{int(self.start_prefetch.timestamp())}_{self.end_ts}.csv')
-        if not os.path.exists(f'{self.path}/data/'):
-            os.mkdir('data/')
-        self.df[i][self.df_expected_cols[1:]].to_csv(f'{self.path}/data/{filename}')
         latest = 'latest_bt_df.csv'
         self.df[i][self.df_expected_cols[1:]].to_csv(f'{self.path}/logs/{latest}')
 
@@ -248,6 +317,12 @@ class Base:
         argp.add_argument(
             "-f", "--file", "--files", type=str, default=None, nargs='*', help="Filename(s) within data folder. For backtesting only"
         )
+        argp.add_argument(
+            "--compact", action='store_true', help="Compact candle frames: float32 prices where exact, indicators as float32"
+        )
+        argp.add_argument(
+            "--gap-fill", type=str, default=None, choices=('ffill', 'refetch'), help="Fill candle gaps instead of failing: forward fill, or refetch the missing ranges"
+        )
         argp.add_argument(
             "-t", "--use-testnet", action='store_true', help="Set to False to run on live account. For live trading only"
         )
@@ -279,6 +354,30 @@ class Backtest(Base):
         argp.add_argument(
             "-d", "--debug", action='store_true', help="Debug mode. Print tables to csvs in logs/debug/ folder"
         )
+        argp.add_argument(
+            "--check-parity", action='store_true', help="Verify the array-backed trade loop gives the same trades as the original per-row loop"
+        )
+        argp.add_argument(
+            "--store-results", action='store_true', help="Append each run's trades and params to the results store (data/results/)"
+        )
+        argp.add_argument(
+            "--sweep-symbols", type=str, default=None, nargs='+', help="Sweep: symbols to backtest (e.g. BTCUSDT ETHUSDT)"
+        )
+        argp.add_argument(
+            "--sweep-windows", type=str, default=None, nargs='+', help="Sweep: date windows as start:end, e.g. 2021-3-5:2021-4-21 (empty end for now)"
+        )
+        argp.add_argument(
+            "--sweep-params", type=str, default=None, nargs='+', help="Sweep: strategy params as name=val1,val2,... e.g. stoploss=0.01,0.02"
+        )
+        argp.add_argument(
+            "--workers", type=int, default=None, help="Sweep: number of worker processes (default: all cores)"
+        )
+        argp.add_argument(
+            "--results", type=str, default='logs/sweep_results.csv', help="Sweep: results table file"
+        )
+        argp.add_argument(
+            "--check-batch", type=int, default=0, help="Sweep: verify this many sampled param sets per batch against the single-run trade loop"
+        )
         args = argp.parse_args()
         return args
 
@@ -329,24 +428,6 @@ class Backtest(Base):
 
         return True
 
-    def _get_best_csv(self, symbol, period):
-        # Figures out which csv file has the biggest range of data in desired range
-        _start_ts = int(self.start_prefetch.timestamp())
-        filename_prefix = f'{self.exchange_cls.__name__}_{symbol.lower()}_{period}'
-        files = [f for f in os.listdir('data/') if f.startswith(filename_prefix)]
-        files = [f for f in files if _start_ts >= int(f.strip('.csv').split('_')[-2])]
-        best_file = files[0]
-        _end = self.end if self.end else int(dt.datetime.utcnow().timestamp())
-        for f in files:
-            if _end > int(f.strip('.csv').split('_')[-2]):
-                csv_end = int(f.strip('.csv').split('_')[-1])
-            else:
-                csv_end = _end
-            _best = best_file.strip('.csv').split('_')
-            if csv_end - _start_ts > int(_best[-1]) - int(_best[-2]):
-                best_file = f
-        return best_file
-
     def load_csv(self):
         return False
 
@@ -355,7 +436,16 @@ class Backtest(Base):
             data = self.df
         else:
             raise DataCollectionError
-        self.strategy(self.df, self.exchange_obj, self.trading_cfg, self.start).run()
+        self._compact_candles()
+        strategy = self.strategy(self.df, self.exchange_obj, self.trading_cfg, self.start)
+        if self.args.check_parity:
+            strategy.check_execution_parity()
+            return None
+        result = strategy.run() # RunResult, for strategies that return one
+        if result is not None and self.args.store_results:
+            ResultsStore().append(result)
+            logging.info(f'Stored run {result.run_id}')
+        return result
 
     def run_backtrader(self):
         cerebro = bt.Cerebro()
@@ -381,6 +471,306 @@ class Backtest(Base):
         print('number of trades:', len(back[0].analyzers.trans.get_analysis()))
         cerebro.plot()
 
+SWEEP_STATS = ('win_rate', 'sharpe', 'max_drawdown', 'exposure', 'turnover') # run_stats() cols in the results table
+
+
+def _read_sweep_data(job):
+    """
+    Candles for a sweep job from the candle store
+
+    Returns
+    ---------
+    (tuple): (list of dataframes, error str or None)
+
+    """
+    store = CandleStore(job['store_root'])
+    data = []
+    for key, (start_ts, end_ts) in zip(job['keys'], job['ranges']):
+        df = store.read(key, start_ts, end_ts)
+        gaps = np.flatnonzero(np.diff(df.index.to_numpy()) != key[2])
+        if df.empty or len(gaps):
+            return data, f'{key[2]}s series: {len(df.index)} candles, {len(gaps)} gaps'
+        data.append(compact_candles(df) if job['cfg'].get('compact_candles') else df)
+    return data, None
+
+
+def _build_indicator_matrix(job):
+    """
+    Calc the indicators for a group of sweep jobs once, saved to job['matrix']
+
+    Returns
+    ---------
+    (str): error, empty if none
+
+    """
+    data, error = _read_sweep_data(job)
+    if error:
+        return error
+    try:
+        strategy = getattr(strategies, job['strategy'])(
+            data, None, job['cfg'], job['start'], tradelog=False)
+        strategy.indicator_matrix().save(job['matrix'])
+    except Exception as ex:
+        logging.exception(f"Sweep indicators for {job['row']} failed")
+        return repr(ex)
+    return ''
+
+
+def _run_sweep_job(job):
+    """
+    Backtest one (symbol, window, params) combination of a sweep. Runs in a
+        worker process, against the group's shared indicator matrix if there
+        is one, else reading candles from the candle store
+
+    Returns
+    ---------
+    (dict): results table row
+
+    """
+    t = time.time()
+    result = dict(job['row'])
+    if job.get('error'):
+        result.update(error=job['error'])
+        return result
+    if job.get('matrix'):
+        data = IndicatorMatrix.load(job['matrix'])
+    else:
+        data, error = _read_sweep_data(job)
+        if error:
+            result.update(error=error)
+            return result
+    try:
+        strategy = getattr(strategies, job['strategy'])(
+            [] if job.get('matrix') else data, None, job['cfg'], job['start'], tradelog=False)
+        if job.get('matrix'):
+            run = strategy.run_trades(data)
+        else:
+            run = strategy.run()
+    except Exception as ex:
+        logging.exception(f"Sweep job {job['row']} failed")
+        result.update(error=repr(ex))
+        return result
+    if job.get('results_root'):
+        result.update(run_id=ResultsStore(job['results_root']).append(run))
+    stats = run_stats(RunTrades.from_results([run]), job['fee']).iloc[0]
+    result.update(
+        candles=len(data) if job.get('matrix') else data[0].shape[0],
+        num_trades=len(run.trades),
+        roi=run.roi(),
+        **{col: stats[col] for col in SWEEP_STATS},
+        error='',
+        secs=round(time.time() - t, 3))
+    return result
+
+
+def _run_sweep_batch(batch):
+    """
+    Backtest a batch of sweep jobs that share an indicator matrix and
+        execution_name, simulating all their trade_params at once
+
+    Returns
+    ---------
+    (list): results table rows, in job order
+
+    """
+    t = time.time()
+    jobs = batch['jobs']
+    matrix = IndicatorMatrix.load(batch['matrix'])
+    strategy_cls = getattr(strategies, batch['strategy'])
+    strategy = strategy_cls([], None, jobs[0]['cfg'], jobs[0]['start'], tradelog=False)
+    params = {
+        k: [job['cfg'][k] for job in jobs]
+        for k in strategy.trade_params if not k == 'execution_name'
+    }
+    trades, roi = strategy.run_trades_batch(matrix, params, fee=jobs[0]['fee'])
+    if batch['check']:
+        # Compare sampled sets with the single-run trade loop
+        for k in np.random.default_rng().choice(len(jobs), min(batch['check'], len(jobs)), replace=False):
+            single = strategy_cls([], None, jobs[k]['cfg'], jobs[k]['start'], tradelog=False)
+            single.run_trades(matrix)
+            if not single.trades == trades.trades(k):
+                logging.critical(f"Sweep batch differs from single run for {jobs[k]['row']}")
+                raise ParityError
+    num_trades = trades.counts()
+    stats = run_stats(
+        trades.run_trades(
+            start_ts=np.full(len(jobs), strategy.bt_start.timestamp()),
+            end_ts=np.full(len(jobs), matrix.index[-1])),
+        jobs[0]['fee'])
+    secs = round((time.time() - t)/len(jobs), 5)
+    results = []
+    for k, job in enumerate(jobs):
+        result = dict(job['row'])
+        if job.get('results_root'):
+            run = RunResult(job['cfg'], trades.trades(k), strategy.bt_start.timestamp(), matrix.index[-1])
+            result.update(run_id=ResultsStore(job['results_root']).append(run))
+        result.update(
+            candles=len(matrix),
+            num_trades=num_trades[k],
+            roi=roi[k],
+            **{col: stats[col].iat[k] for col in SWEEP_STATS},
+            error='',
+            secs=secs)
+        results.append(result)
+    return results
+
+
+class Sweep(Backtest):
+    """
+    Backtest every combination of symbols x date windows x strategy params
+        from a config entry, in parallel
+
+    Candles for each symbol are synced into the candle store once, over the
+        span of all windows, then worker processes read their window from the
+        (memory-mapped) store and run the strategy without any API calls.
+        Results go to one table (args.results), one row per combination,
+        with the ROI and SWEEP_STATS from utils.performance.
+        With args.store_results each run is also appended to the results
+        store, and its run_id added to the row
+
+    For strategies that declare trade_params, the indicators are calculated
+        once per (symbol, window, other params) group and saved as a
+        memory-mapped IndicatorMatrix; the jobs in the group then only run the
+        trade logic against it. Matrices go to a temp dir under
+        $SWEEP_MATRIX_DIR (e.g. /dev/shm) if set. Jobs whose execution_name
+        the strategy can batch (batch_executions) are simulated together, a
+        chunk of param sets per worker
+
+    """
+
+    MIN_BATCH = 50 # Param sets per batch, below this splitting across workers doesn't pay
+
+    def __init__(self, args):
+        super().__init__(args)
+        self.workers = args.workers or os.cpu_count()
+        self.results_file = args.results
+
+    @staticmethod
+    def _parse_window(window):
+        start, end = window.split(':')
+        start = tuple(int(v) for v in start.split('-'))
+        end = tuple(int(v) for v in end.split('-')) if end else None
+        return start, end
+
+    @staticmethod
+    def _parse_param(param):
+        name, values = param.split('=')
+        parsed = []
+        for v in values.split(','):
+            try:
+                parsed.append(json.loads(v))
+            except ValueError:
+                parsed.append(v)
+        return name, parsed
+
+    def _window_ranges(self, start, end):
+        """
+        Prefetch start (aligned) and end timestamps of a window, as Backtest
+        """
+        self.start_prefetch = dt.datetime(*start) - dt.timedelta(seconds=self.data_prefetch_period)
+        self._align_first_row()
+        end = end + tuple(0 for _ in range(len(end), 5)) if end else end
+        end_dt = dt.datetime(*end) if end else dt.datetime.utcnow()
+        return int(self.start_prefetch.timestamp()), int(end_dt.timestamp())
+
+    def jobs(self):
+        symbols = self.args.sweep_symbols or [self.data_cfg[0][0]]
+        if self.args.sweep_windows:
+            windows = [self._parse_window(w) for w in self.args.sweep_windows]
+        else:
+            windows = [(self.start, self.end)]
+        params = [self._parse_param(p) for p in self.args.sweep_params or []]
+        quote = self.trading_cfg['symbol'][1]
+        strategy = self.strategy.__name__
+        fee = FEES[self.trading_cfg['asset_type']]
+        results_root = ResultsStore().root if self.args.store_results else None
+        jobs = []
+        for symbol in symbols:
+            ranges = [self._window_ranges(*w) for w in windows]
+            keys = []
+            for series in self.data_cfg:
+                # Fetch once per symbol, over all windows
+                keys.append(self._sync_candle_store(
+                    symbol, series, min(r[0] for r in ranges), max(r[1] for r in ranges)))
+            for (start, end), (start_ts, end_ts) in zip(windows, ranges):
+                for values in itertools.product(*[v for _, v in params]):
+                    cfg = copy.deepcopy(self.trading_cfg)
+                    cfg['symbol'] = (symbol[:-len(quote)].upper(), quote)
+                    cfg['start'], cfg['end'] = list(start), list(end) if end else end
+                    cfg.update(zip([n for n, _ in params], values))
+                    row = {
+                        'name': self.run_name,
+                        'symbol': symbol.upper(),
+                        'start': '-'.join(str(v) for v in start),
+                        'end': '-'.join(str(v) for v in end) if end else ''}
+                    row.update(zip([n for n, _ in params], values))
+                    jobs.append({
+                        'group': (symbol, start, end) + tuple(
+                            (n, v) for (n, _), v in zip(params, values)
+                            if n not in getattr(self.strategy, 'trade_params', ())),
+                        'row': row,
+                        'strategy': strategy,
+                        'cfg': cfg,
+                        'start': start,
+                        'fee': fee,
+                        'results_root': results_root,
+                        'store_root': self.candle_store.root,
+                        'keys': keys,
+                        # Candles completed by the end time
+                        'ranges': [(start_ts, end_ts - series[2] + 1) for series in self.data_cfg],
+                    })
+        return jobs
+
+    def run(self):
+        jobs = self.jobs()
+        logging.info(f'Sweep: {len(jobs)} backtests on {self.workers} workers')
+        t = time.time()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor, \
+                tempfile.TemporaryDirectory(dir=os.environ.get('SWEEP_MATRIX_DIR')) as matrix_dir:
+            if hasattr(self.strategy, 'trade_params'):
+                groups = {}
+                for job in jobs:
+                    if job['group'] not in groups:
+                        groups[job['group']] = dict(job, matrix=f'{matrix_dir}/{len(groups)}')
+                    job['matrix'] = groups[job['group']]['matrix']
+                errors = dict(zip(
+                    [g['matrix'] for g in groups.values()],
+                    executor.map(_build_indicator_matrix, groups.values())))
+                for job in jobs:
+                    job['error'] = errors[job['matrix']]
+                logging.info(f'Sweep: indicators for {len(groups)} groups done in {round(time.time() - t, 1)}s')
+            batches = {}
+            single = []
+            for job in jobs:
+                if job.get('matrix') and not job['error'] and \
+                        job['cfg']['execution_name'] in getattr(self.strategy, 'batch_executions', {}):
+                    batches.setdefault((job['matrix'], job['cfg']['execution_name']), []).append(job)
+                else:
+                    single.append(job)
+            chunks = []
+            for _jobs in batches.values():
+                size = max(self.MIN_BATCH, -(-len(_jobs)//self.workers))
+                for i in range(0, len(_jobs), size):
+                    chunks.append({
+                        'jobs': _jobs[i:i + size],
+                        'matrix': _jobs[0]['matrix'],
+                        'strategy': _jobs[0]['strategy'],
+                        'check': self.args.check_batch,
+                    })
+            chunksize = max(1, len(single)//(4*self.workers))
+            single_results = executor.map(_run_sweep_job, single, chunksize=chunksize)
+            results = {}
+            for chunk, rows in zip(chunks, executor.map(_run_sweep_batch, chunks)):
+                results.update(zip([id(job) for job in chunk['jobs']], rows))
+            results.update(zip([id(job) for job in single], single_results))
+            results = [results[id(job)] for job in jobs]
+        results = pd.DataFrame(results)
+        results.to_csv(f'{self.path}/{self.results_file}', index=False)
+        logging.info(f'Sweep finished in {round(time.time() - t, 1)}s, results in {self.results_file}')
+        print(results.to_string(index=False))
+        return results
+
+
 def test_setup():
     args = Object()
     args.name = 'WillRBband_BTC_3m_60m'
@@ -401,4 +791,7 @@ if __name__ == '__main__':
     logging.basicConfig(filename=logfile, level=logging.INFO)
     logging.info(f'{int(dt.datetime.utcnow().timestamp())}: Starting backtester')
     args = Backtest.parse_args()
-    Backtest(args).run()
+    if args.sweep_symbols or args.sweep_windows or args.sweep_params:
+        Sweep(args).run()
+    else:
+        Backtest(args).run()
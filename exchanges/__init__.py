@@ -1,5 +1,330 @@
+import os
+import time
+import json
+import random
+import threading
+import datetime as dt
+import logging
+from functools import wraps
+from urllib.parse import urlsplit
+import requests
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExchangeUnavailable(Exception):
+    """
+    API call given up on: its retries ran out, or its endpoint's circuit is open
+    """
+    pass
+
+
+class RateLimited(Exception):
+    """
+    Request rejected for the exchange's rate limits (HTTP 429, or 418 once the IP is banned)
+    """
+
+    def __init__(self, status, retry_after=None):
+        self.status = status
+        self.retry_after = retry_after # Secs, from the Retry-After header
+        super().__init__(f'HTTP {status}, retry after {retry_after}s')
+
+
+def _retry_after(headers):
+    try:
+        return float(headers['Retry-After'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class SessionPool:
+    """
+    Shared requests.Session per host, so REST calls reuse pooled keep-alive
+        connections instead of a new TCP+TLS handshake per request
+
+    Also applies a default timeout, keeps per-endpoint latency stats and the
+        request weight the exchange reports used (USED_WEIGHT_HEADERS).
+        Rate limit rejections raise RateLimited, other error statuses
+        requests.HTTPError
+
+    Arguments
+    ---------
+    pool_maxsize (int):     connections kept per host, unless set in pool_sizes
+    timeout (tuple):        default (connect, read) timeout (secs)
+
+    """
+
+    USED_WEIGHT_HEADERS = ('x-mbx-used-weight-1m', 'x-mbx-used-weight') # Binance, per clock minute
+
+    def __init__(self, pool_maxsize=10, timeout=(3.05, 10)):
+        self.pool_maxsize = pool_maxsize
+        self.pool_sizes = {} # host -> pool size, for hosts that need more/fewer
+        self.timeout = timeout
+        self._sessions = {}
+        self._latency = {} # (host, path) -> [count, total secs, max secs, last secs]
+        self._used_weight = {} # host -> (time, weight)
+        self._lock = threading.Lock()
+
+    def session(self, host):
+        with self._lock:
+            if host not in self._sessions:
+                size = self.pool_sizes.get(host, self.pool_maxsize)
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def request(self, method, uri, **kwargs):
+        parts = urlsplit(uri)
+        kwargs.setdefault('timeout', self.timeout)
+        t = time.perf_counter()
+        resp = self.session(parts.netloc).request(method, uri, **kwargs)
+        elapsed = time.perf_counter() - t
+        with self._lock:
+            stats = self._latency.setdefault((parts.netloc, parts.path), [0, 0., 0., 0.])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3] = elapsed
+        self.record_weight(parts.netloc, resp.headers)
+        if resp.status_code in (418, 429):
+            raise RateLimited(resp.status_code, _retry_after(resp.headers))
+        resp.raise_for_status()
+        return resp
+
+    def get(self, uri, params=None, **kwargs):
+        return self.request('GET', uri, params=params, **kwargs)
+
+    def record_weight(self, host, headers):
+        """
+        Keep the used request weight from a response's headers (also for
+            responses of other clients, e.g. python-binance's)
+        """
+        for header in self.USED_WEIGHT_HEADERS:
+            if header in headers:
+                with self._lock:
+                    self._used_weight[host] = (time.time(), int(headers[header]))
+                return
+
+    def used_weight(self, host):
+        """
+        Request weight the exchange last reported used on host, this minute (0 if none)
+        """
+        with self._lock:
+            entry = self._used_weight.get(host)
+        if entry is None or int(entry[0]//60) != int(time.time()//60):
+            return 0
+        return entry[1]
+
+    def latency_stats(self):
+        """
+        Returns
+        ---------
+        (dict): '<host><path>' -> {'count', 'mean', 'max', 'last'} (secs)
+
+        """
+        with self._lock:
+            return {
+                f'{host}{path}': {
+                    'count': count,
+                    'mean': total/count,
+                    'max': _max,
+                    'last': last,
+                }
+                for (host, path), (count, total, _max, last) in self._latency.items()
+            }
+
+
+class MetadataCache:
+    """
+    On-disk cache for slow-changing exchange metadata (e.g. exchangeInfo),
+        with a TTL
+
+    Within a process each key is fetched at most once at a time and then held
+        in memory, so several API objects (or several lookups in one) share a
+        single request. A stale entry is still served while a background thread
+        refreshes it; only a missing entry blocks on the fetch
+
+    Arguments
+    ---------
+    root (str): cache directory, defaults to $EXCHANGE_CACHE_DIR or data/cache/
+    ttl (int):  secs before an entry is refreshed
+
+    """
+
+    def __init__(self, root=None, ttl=6*3600):
+        if root is None:
+            root = os.environ.get(
+                'EXCHANGE_CACHE_DIR',
+                f"{'/'.join(os.path.abspath(__file__).split('/')[:-2])}/data/cache")
+        self.root = root
+        self.ttl = ttl
+        self.logger = logging.getLogger(__name__)
+        self._entries = {} # key -> (fetched_at, value)
+        self._refreshing = set()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return f'{self.root}/{key}.json'
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), 'r') as f:
+                entry = json.load(f)
+            return entry['fetched_at'], entry['value']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store(self, key, fetch):
+        value = fetch()
+        entry = (time.time(), value)
+        with self._lock:
+            self._entries[key] = entry
+        try:
+            if not os.path.isdir(self.root):
+                os.makedirs(self.root)
+            tmp = f'{self._path(key)}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({'fetched_at': entry[0], 'value': value}, f)
+            os.replace(tmp, self._path(key))
+        except OSError as ex:
+            self.logger.warning(f'Could not write {key} to metadata cache: {ex}')
+        return entry
+
+    def _refresh(self, key, fetch):
+        try:
+            self._store(key, fetch)
+        except Exception as ex:
+            self.logger.warning(f'Background refresh of {key} failed: {ex}')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key, fetch):
+        """
+        Cached value for key, calling fetch() to get it if missing/stale
+        """
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(key)
+                if entry is None:
+                    entry = self._store(key, fetch)
+                else:
+                    with self._lock:
+                        self._entries[key] = entry
+        if time.time() - entry[0] > self.ttl:
+            with self._lock:
+                refresh = key not in self._refreshing
+                self._refreshing.add(key)
+            if refresh:
+                threading.Thread(target=self._refresh, args=(key, fetch), daemon=True).start()
+        return entry[1]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if os.path.isfile(self._path(key)):
+            os.remove(self._path(key))
+
+
+class CircuitBreaker:
+    """
+    Fail calls to an endpoint fast once threshold calls in a row have failed
+        (each after its retries), instead of every caller retrying into an
+        outage. After cooldown secs one trial call is let through
+        (half-open): its success closes the circuit, a failure opens it again
+
+    Arguments
+    ---------
+    threshold (int):    failed calls in a row that open the circuit
+    cooldown (float):   secs open before a trial call
+
+    """
+
+    def __init__(self, threshold=3, cooldown=30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0 # In a row
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return 'open'
+        return 'half-open'
+
+    def allow(self):
+        """
+        Returns
+        ---------
+        (bool): True if a call may go ahead
+
+        """
+        with self._lock:
+            state = self.state
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return state == 'closed'
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+def retry(attempts=None, max_wait=None):
+    """
+    Retry an ExchangeAPI method on failure, with jittered exponential backoff,
+        up to attempts calls and max_wait secs of waiting (the class
+        RETRY_ATTEMPTS, RETRY_MAX_WAIT unless given). Then, or while the
+        endpoint's circuit is open, raises ExchangeUnavailable. Errors that
+        aren't transport or exchange side (see ExchangeAPI._retryable())
+        are re-raised unchanged on the first attempt
+
+    Not for order placement, where a retry may place the order twice
+    """
+    def deco_retry(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            return self._call(func.__name__, lambda: func(self, *args, **kwargs), attempts, max_wait)
+        return wrapper
+    return deco_retry
+
+
 class ExchangeAPI:
     name = ''
+    http = SessionPool() # Shared by all exchange objects in the process
+    metadata_cache = MetadataCache()
+
+    # @retry() defaults, per call
+    RETRY_ATTEMPTS = 5
+    RETRY_MAX_WAIT = 30 # Secs of backoff, a longer Retry-After gives up at once
+    RETRY_BACKOFF = (0.5, 8) # Secs, first and max delay before the jitter
+    CIRCUIT_THRESHOLD = 3
+    CIRCUIT_COOLDOWN = 30
+    _endpoints_lock = threading.Lock()
 
     def __init__(self):
         self.base_uri = ''
@@ -7,3 +332,170 @@ class ExchangeAPI:
         self.trading_fee = None
         self.KEY = None
         self.SECRET = None
+
+    def _endpoint(self, name):
+        # Created on first use, as exchange classes don't all call ExchangeAPI.__init__()
+        with ExchangeAPI._endpoints_lock:
+            endpoints = self.__dict__.setdefault('_endpoints', {})
+            if name not in endpoints:
+                endpoints[name] = (
+                    CircuitBreaker(self.CIRCUIT_THRESHOLD, self.CIRCUIT_COOLDOWN),
+                    {'calls': 0, 'retries': 0, 'failures': 0, 'rejected': 0,
+                     'rate_limited': 0, 'last_error': None})
+            return endpoints[name]
+
+    @staticmethod
+    def _status(ex):
+        """
+        int or None: HTTP status the exchange answered the failed call with
+        """
+        status = getattr(ex, 'status_code', None) # python-binance API errors
+        if status is None and isinstance(ex, requests.HTTPError) and ex.response is not None:
+            status = ex.response.status_code # SessionPool requests
+        return status
+
+    @classmethod
+    def _retryable(cls, ex):
+        """
+        (bool, float or None): whether ex is worth retrying, and for rate
+            limits the secs the exchange asked to wait (0 if it didn't say)
+
+        Only transport and exchange side errors are: connection errors and
+            timeouts, unreadable responses and 408, 418, 429, 5xx statuses.
+            Anything else (a rejected request, a bug) fails the same again
+        """
+        if isinstance(ex, RateLimited):
+            return True, ex.retry_after or 0.
+        status = cls._status(ex)
+        if status in (418, 429):
+            return True, _retry_after(getattr(getattr(ex, 'response', None), 'headers', None)) or 0.
+        if status is not None:
+            return status == 408 or status >= 500, None
+        if isinstance(ex, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+            return True, None
+        # python-binance raises this when the response isn't valid JSON (e.g. a proxy error page)
+        return type(ex).__name__ == 'BinanceRequestException', None
+
+    def _after_call(self):
+        """
+        Called after each @retry() call attempt, e.g. to read rate limit headers
+        """
+        pass
+
+    def _call(self, name, call, attempts=None, max_wait=None):
+        """
+        Run call() under endpoint name's retry budget and circuit breaker (see retry())
+        """
+        attempts = self.RETRY_ATTEMPTS if attempts is None else attempts
+        max_wait = self.RETRY_MAX_WAIT if max_wait is None else max_wait
+        breaker, stats = self._endpoint(name)
+        label = f'{type(self).__name__}.{name}'
+        stats['calls'] += 1
+        if not breaker.allow():
+            stats['rejected'] += 1
+            raise ExchangeUnavailable(f'{label}: circuit open after {breaker.failures} failed calls')
+        if breaker.state == 'half-open':
+            attempts = 1
+        base, cap = self.RETRY_BACKOFF
+        waited = 0.
+        error = None
+        for attempt in range(attempts):
+            try:
+                result = call()
+            except Exception as ex:
+                self._after_call()
+                error = ex
+                stats['last_error'] = repr(ex)
+                retryable, retry_after = self._retryable(ex)
+                if not retryable:
+                    if self._status(ex) is not None:
+                        breaker.success() # Exchange is up, the request was wrong
+                    raise
+                if retry_after is not None:
+                    stats['rate_limited'] += 1
+                delay = min(cap, base*2**attempt)
+                delay = delay/2 + random.uniform(0, delay/2)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                if attempt == attempts - 1 or waited + delay > max_wait:
+                    break
+                logger.info(f'{label} failed ({ex!r}), retry {attempt + 1} in {delay:.2f}s')
+                stats['retries'] += 1
+                waited += delay
+                time.sleep(delay)
+            else:
+                self._after_call()
+                breaker.success()
+                return result
+        stats['failures'] += 1
+        breaker.failure()
+        logger.warning(
+            f'{label} failed after {attempt + 1} attempts, circuit {breaker.state}: {stats["last_error"]}')
+        raise ExchangeUnavailable(f'{label}: {stats["last_error"]}') from error
+
+    def call_stats(self):
+        """
+        Returns
+        ---------
+        (dict): endpoint (method name) -> {'calls', 'retries', 'failures',
+            'rejected', 'rate_limited', 'last_error', 'circuit'}, for the
+            @retry() methods called so far
+
+        """
+        with ExchangeAPI._endpoints_lock:
+            endpoints = dict(self.__dict__.get('_endpoints', {}))
+        return {
+            name: dict(stats, circuit=breaker.state)
+            for name, (breaker, stats) in endpoints.items()
+        }
+
+    def kline_stream(self, series, asset_type='spot'):
+        """
+        Started stream of closed candles for (symbol, period) series, or None
+            if the exchange has none (callers then poll REST)
+        """
+        return None
+
+    def order_book(self, symbol, asset_type='spot'):
+        """
+        Local order book replica (utils.order_book.OrderBook) kept current from
+            a stream, or None if the exchange has none (get_book() stays on REST)
+        """
+        return None
+
+    def account_state(self, asset_type='spot'):
+        """
+        Account state (utils.account_state.AccountState) kept current from a
+            stream, or None if the exchange has none (account calls stay on REST)
+        """
+        return None
+
+    def get_backtest_data_range(self, symbol, period, start_dt, end_dt, asset_type='spot'):
+        """
+        Page through get_backtest_data() from start_dt to end_dt, one request
+            at a time
+
+        Returns
+        ---------
+        (pd.DataFrame or NoneType): candles, None if there were none
+
+        """
+        df_list = []
+        while True:
+            new_df = self.get_backtest_data(
+                symbol,
+                period,
+                start_dt,
+                end_dt,
+                asset_type=asset_type)
+            if new_df is None:
+                break
+            df_list.append(new_df)
+            remaining = int(
+                ((end_dt.timestamp() - start_dt.timestamp())/period))
+            logging.debug(f'Collecting data - {len(df_list)*df_list[0].shape[0]} periods, remaining: {remaining}')
+            secs_til_end = end_dt.timestamp() - start_dt.timestamp()
+            if not self.max_candles_fetch or secs_til_end < period*self.max_candles_fetch:
+                break
+            start_dt = max(new_df.index) + dt.timedelta(seconds=period)
+        return pd.concat(df_list) if df_list else None
@@ -1,37 +1,62 @@
 import os
+import hashlib
 import datetime as dt
 import time
 import json
 import logging
-import traceback
-from functools import wraps
-import requests
+import threading
+import collections
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 from binance.client import Client as BinanceClient
-from . import ExchangeAPI
+from . import ExchangeAPI, ExchangeUnavailable, retry
+from .binance_streams import KlineStream, DepthStream, UserDataStream
+from utils.frames import compact_candles
+from utils.account_state import AccountState
 
 
 class NotImplementedError(Exception):
     pass
 
 
-def meta(wait=1):
+class RequestWeightBudget:
     """
-        Retry on API call failure
+    Client-side cap on the request weight used per rolling minute, shared by
+        all threads making calls through the same API object
+
+    acquire() blocks until the weight fits in the budget, counting both the
+        weight acquired here and, if reported is given, the weight the
+        exchange reports used this clock minute (which also counts other
+        calls, and other processes on the IP)
     """
-    def deco_meta(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            x = None
-            while True:
-                try:
-                    x = func(*args, **kwargs)
-                    break
-                except Exception as ex:
-                    time.sleep(wait)
-            return x
-        return wrapper
-    return deco_meta
+
+    def __init__(self, limit, window=60, reported=None):
+        self.limit = limit
+        self.window = window
+        self.reported = reported # () -> used weight from the exchange's response headers
+        self._used = collections.deque() # (time, weight)
+        self._lock = threading.Lock()
+
+    def acquire(self, weight):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._used and self._used[0][0] <= now - self.window:
+                    self._used.popleft()
+                local_ok = not self._used or sum(w for _, w in self._used) + weight <= self.limit
+                reported_ok = self.reported is None or self.reported() + weight <= self.limit
+                if local_ok and reported_ok:
+                    self._used.append((now, weight))
+                    return
+                waits = []
+                if not local_ok:
+                    waits.append(self._used[0][0] + self.window - now)
+                if not reported_ok:
+                    waits.append(60 - time.time() % 60) # Exchange resets it on the minute
+                wait = max(waits)
+            time.sleep(wait)
 
 
 class BinanceAPI(ExchangeAPI):
@@ -40,11 +65,23 @@ class BinanceAPI(ExchangeAPI):
     API_URL_FUTURES = 'https://fapi.binance.com'
     API_URL_TESTNET = 'https://testnet.binance.vision/api'
     API_URL_FUTURES_TESTNET = 'https://testnet.binancefuture.com'
+    WS_URL_TESTNET = 'wss://testnet.binance.vision'
+
+    KLINE_FETCH_WORKERS = 8
+    # Request weight per minute. Binance allows 1200 (spot) / 2400 (futures) per IP, leave headroom for live trading
+    REQUEST_WEIGHT_BUDGET = {'spot': 1000, 'futures': 2000}
+    KLINES_REQUEST_WEIGHT = {'spot': 2, 'futures': 5} # At limit=1000
+    ORDER_TRADES_POLLS = 10 # Refetches (0.5s apart) of a filled order's trades before order_status() gives up
 
     def __init__(self, use_testnet=False):
         self.logger = logging.getLogger(__name__)
+        self.request_weight_budget = {
+            atype: RequestWeightBudget(limit, reported=lambda atype=atype: self.used_weight()[atype])
+            for atype, limit in self.REQUEST_WEIGHT_BUDGET.items()
+        }
         self.max_candles_fetch = 1000
         self.max_trades_fetch = 1000
+        self.use_testnet = use_testnet
         if use_testnet:
             if 'BINANCE_TEST_KEY' in os.environ:
                 self._API_KEY = os.environ['BINANCE_TEST_KEY']
@@ -75,9 +112,25 @@ class BinanceAPI(ExchangeAPI):
             self._external_client.API_URL = BinanceAPI.API_URL_TESTNET
             self._external_client.FUTURES_URL = BinanceAPI.API_URL_FUTURES_TESTNET
 
-        self.trade_fees = self._get_trade_fees()
+        # Loaded on first use, from the metadata cache where possible
+        self._trade_fees = None
         self.trade_fee_spot_asset = {'BUY': 'base', 'SELL': 'quote'}
-        self._symbol_info = self._get_symbol_info()
+        self._symbol_info_cached = None
+        self._depth_streams = {} # (asset_type, symbol) -> DepthStream
+        self._account_states = {} # asset_type -> AccountState, fed by a UserDataStream
+        self._streams_lock = threading.Lock()
+
+    @property
+    def trade_fees(self):
+        if self._trade_fees is None:
+            self._trade_fees = self._get_trade_fees()
+        return self._trade_fees
+
+    @property
+    def _symbol_info(self):
+        if self._symbol_info_cached is None:
+            self._symbol_info_cached = self._get_symbol_info()
+        return self._symbol_info_cached
 
     # Internal helper funcs
 
@@ -181,15 +234,24 @@ class BinanceAPI(ExchangeAPI):
             for s in self._get_exchange_info(asset_type='futures')['symbols']
         )
         if self._external_client:
-            tier = self._external_client.futures_account().get('feeTier')
-            fees = {
-                'tradeFee': self._external_client.get_trade_fee()
-            }
+            # Account specific, so cached per API key (hashed, the key isn't written to disk)
+            key_id = hashlib.sha256(self._API_KEY.encode()).hexdigest()[:16]
+            fees = self.metadata_cache.get(
+                f'{self.NAME}_trade_fees_{key_id}',
+                lambda: {
+                    'feeTier': self._external_client.futures_account().get('feeTier'),
+                    'tradeFee': self._external_client.get_trade_fee(),
+                })
+            tier = fees['feeTier']
         else:
             tier = 'none'
             fees = {
                 'tradeFee': [
-                    dict({'symbol': s}.items() | spot_tiers[0].items())
+                    {
+                        'symbol': s,
+                        'makerCommission': spot_tiers[0]['maker'],
+                        'takerCommission': spot_tiers[0]['taker'],
+                    }
                     for s in spot_symbols
                 ]
             }
@@ -218,8 +280,24 @@ class BinanceAPI(ExchangeAPI):
         else:
             raise ValueError
 
-        resp = json.loads(requests.get(uri, params=None).text)
-        return resp
+        def fetch():
+            resp = json.loads(self.http.get(uri, params=None).text)
+            # Only the symbol filters are used, keep the cached copy small
+            return {
+                'symbols': [
+                    {'symbol': s['symbol'], 'filters': s['filters']}
+                    for s in resp['symbols']
+                ]
+            }
+
+        return self.metadata_cache.get(f'{self.NAME}_exchange_info_{asset_type}', fetch)
+
+    def _client_call(self, method, *args, attempts=None, max_wait=None, **kwargs):
+        """
+        python-binance client call, retried as its own endpoint (see exchanges.retry())
+        """
+        return self._call(
+            method, lambda: getattr(self._external_client, method)(*args, **kwargs), attempts, max_wait)
 
     # Generic call to external client
     def external_misc(self, func, *args, **kwargs):
@@ -231,9 +309,143 @@ class BinanceAPI(ExchangeAPI):
     def get_backtest_data(self, *args, **kwargs):
         return self.get_historical_candles(*args, **kwargs)
 
+    def kline_stream(self, series, asset_type='spot'):
+        ws_url = BinanceAPI.WS_URL_TESTNET if self.use_testnet else None
+        return KlineStream(series, asset_type=asset_type, ws_url=ws_url).start()
+
+    def order_book(self, symbol, asset_type='spot'):
+        """
+        Local order book replica of symbol, fed by a depth stream started on
+            the first call. Once synced, get_book() up to DepthStream.SNAPSHOT_DEPTH
+            levels is served from it instead of REST
+        """
+        key = (asset_type, symbol.upper())
+        with self._streams_lock:
+            if key not in self._depth_streams:
+                ws_url = BinanceAPI.WS_URL_TESTNET if self.use_testnet else None
+                self._depth_streams[key] = DepthStream(
+                    symbol,
+                    lambda: self.get_book(
+                        symbol=symbol, asset_type=asset_type, depth=DepthStream.SNAPSHOT_DEPTH),
+                    asset_type=asset_type,
+                    ws_url=ws_url).start()
+            return self._depth_streams[key].book
+
+    def account_state(self, asset_type='spot'):
+        """
+        Account state (balances, positions, order P&L) kept current by the
+            user data stream, started on the first call. While it is ready,
+            get_balances(), futures_get_positions() and the realized P&L of
+            futures_get_position_pnl() read it instead of REST. The positions
+            it serves have no unrealizedProfit: that and the margin balance
+            (_futures_get_balances()) move with the mark price, so stay on REST
+        """
+        with self._streams_lock:
+            if asset_type not in self._account_states:
+                client = self._external_client
+                if asset_type == 'spot':
+                    get_listen_key = client.stream_get_listen_key
+                    keepalive = lambda key: client.stream_keepalive(key)
+                elif asset_type == 'futures':
+                    get_listen_key = client.futures_stream_get_listen_key
+                    keepalive = lambda key: client.futures_stream_keepalive(key)
+                else:
+                    raise ValueError
+                state = AccountState(asset_type)
+                ws_url = BinanceAPI.WS_URL_TESTNET if self.use_testnet else None
+                UserDataStream(
+                    state, get_listen_key, keepalive, lambda: self._load_account_state(state),
+                    asset_type=asset_type, ws_url=ws_url).start()
+                self._account_states[asset_type] = state
+            return self._account_states[asset_type]
+
+    def _load_account_state(self, state):
+        # REST snapshot of the account; a futures one comes in a single request
+        state.loaded = False
+        if state.asset_type == 'spot':
+            state.load(self.get_balances(asset_type='spot'))
+        else:
+            account = self._external_client.futures_account()
+            state.load(
+                {a['asset']: a['walletBalance'] for a in account['assets']},
+                positions=account['positions'])
+
+    def _ready_account(self, asset_type):
+        state = self._account_states.get(asset_type)
+        return state if state is not None and state.ready else None
+
+    def used_weight(self):
+        """
+        Request weight the exchange reports used this minute, per asset type
+            (by this process's REST calls and anything else on the IP)
+
+        Returns
+        ---------
+        (dict): asset_type -> weight
+
+        """
+        return {
+            'spot': self.http.used_weight(urlsplit(self.API_URL).netloc),
+            'futures': self.http.used_weight(urlsplit(self.API_URL_FUTURES).netloc),
+        }
+
+    def _after_call(self):
+        # python-binance keeps the last response, read its used weight too
+        resp = getattr(self._external_client, 'response', None)
+        if resp is not None:
+            self.http.record_weight(urlsplit(resp.url).netloc, resp.headers)
+
+    def get_backtest_data_range(self, symbol, period, start_dt, end_dt=None, asset_type='spot'):
+        """
+        Concurrent version of ExchangeAPI.get_backtest_data_range()
+
+        The range is split up front into windows of max_candles_fetch candles,
+            fetched by a pool of KLINE_FETCH_WORKERS threads within the request
+            weight budget, then put back in order with overlaps deduped. As
+            with paging, the last candle of the range is dropped since it may
+            not be completed
+
+        Returns
+        ---------
+        df (pd or NoneType): candles, None if there were none
+
+        """
+        if end_dt is None:
+            end_dt = dt.datetime.utcnow()
+        start_ts = int(start_dt.timestamp())
+        end_ts = int(end_dt.timestamp())
+        page_secs = period*self.max_candles_fetch
+        windows = [
+            (_start, min(_start + page_secs - 1, end_ts))
+            for _start in range(start_ts, end_ts + 1, page_secs)
+        ]
+
+        def fetch(window):
+            return self.get_historical_candles(
+                symbol,
+                period,
+                dt.datetime.fromtimestamp(window[0]),
+                dt.datetime.fromtimestamp(window[1]),
+                asset_type=asset_type,
+                completed_only=False)
+
+        with ThreadPoolExecutor(max_workers=self.KLINE_FETCH_WORKERS) as pool:
+            pages = [df for df in pool.map(fetch, windows) if df is not None]
+        if not pages:
+            return None
+        df = pd.concat(pages)
+        df = df[~df.datetime.duplicated(keep='last')].sort_values('datetime')
+        df = df.iloc[:-1]
+        if df.empty:
+            # The in-progress candle was the only one
+            return None
+        df['completed'] = True
+        self.logger.debug(f'Fetched {df.shape[0]} candles for {symbol} in {len(windows)} requests')
+        return df
+
 
     # PUBLIC ENDPOINTS (SPOT & FUTURES)
-    @meta(wait=1)
+    @retry(attempts=8, max_wait=60)
     def get_historical_candles(
             self,
             symbol: str,
@@ -241,7 +453,8 @@ class BinanceAPI(ExchangeAPI):
             startTime: dt,
             endTime: dt = None,
             asset_type: str = 'spot',
-            completed_only: bool = True) -> pd:
+            completed_only: bool = True,
+            compact: bool = False) -> pd:
 
         """
             Arguments
@@ -251,6 +464,8 @@ class BinanceAPI(ExchangeAPI):
             startTime (dt): series start time in datetime format
             endTime (dt or NoneType): series end time in datetime format
             completed_only: do not show candles that have not been completed
+            compact: int64 'datetime' and OHLCV cols only, float32 where exact
+                (utils.frames.compact_candles)
 
             Returns
             ---------
@@ -283,7 +498,8 @@ class BinanceAPI(ExchangeAPI):
             'limit' : self.max_candles_fetch
         }
 
-        df = pd.DataFrame(json.loads(requests.get(uri, params=req_params).text))
+        self.request_weight_budget[asset_type].acquire(self.KLINES_REQUEST_WEIGHT[asset_type])
+        df = pd.DataFrame(json.loads(self.http.get(uri, params=req_params).text))
 
         if (len(df.index) == 0):
             return None
@@ -297,10 +513,14 @@ class BinanceAPI(ExchangeAPI):
         df.close     = df.close.astype("float")
         df.volume    = df.volume.astype("float")
 
+        if compact:
+            df['datetime'] = df['datetime'].to_numpy(dtype=np.int64)//1000
+            return compact_candles(df.iloc[:-1] if completed_only else df)
+
         df['adj_close'] = df['close']
 
-        df.index = [dt.datetime.utcfromtimestamp(x/1000.0) for x in df.datetime]
-        df.datetime = df.datetime.apply(lambda r: int(r/1000))
+        df.index = pd.to_datetime(df.datetime, unit='ms').rename(None)
+        df.datetime = df.datetime.to_numpy(dtype=np.int64)//1000
         df['completed'] = True
         if completed_only:
             df = df.iloc[:-1]
@@ -308,7 +528,7 @@ class BinanceAPI(ExchangeAPI):
             df.iloc[-1, df.columns.get_loc('completed')] = False
         return df
 
-    @meta(wait=1)
+    @retry(attempts=8, max_wait=60)
     def get_historical_trades(
             self,
             symbol: str,
@@ -358,7 +578,7 @@ class BinanceAPI(ExchangeAPI):
         }
 
         trades = []
-        _trades = json.loads(requests.get(uri, params=req_params).text)
+        _trades = json.loads(self.http.get(uri, params=req_params).text)
         uri = f'{base_uri}/aggTrades'
         while True:
             trades = _trades + trades
@@ -366,13 +586,16 @@ class BinanceAPI(ExchangeAPI):
                 break
             start_id = _trades[0]['id'] - 1 - self.max_trades_fetch
             req_params['fromId'] = str(start_id)
-            _trades = json.loads(requests.get(uri, params=req_params).text)
+            _trades = json.loads(self.http.get(uri, params=req_params).text)
             quit() ### tmp
 
         return trades
 
-    @meta(wait=1)
+    @retry(attempts=3, max_wait=5)
     def get_book(self, symbol='BTCUSDT', asset_type='spot', depth=100):
+        stream = self._depth_streams.get((asset_type, symbol.upper()))
+        if stream is not None and stream.ready and depth <= stream.SNAPSHOT_DEPTH:
+            return stream.book.to_dict(depth)
         if asset_type == 'spot':
             base_uri = self.API_URL
             endpoint = '/depth'
@@ -393,7 +616,7 @@ class BinanceAPI(ExchangeAPI):
             'symbol' : symbol.upper(),
             'limit' : limit,
         }
-        resp = json.loads(requests.get(uri, params=req_params).text)
+        resp = json.loads(self.http.get(uri, params=req_params).text)
         if not depth in VALID_LIMITS:
             resp['bids'] = resp['bids'][:depth]
             resp['asks'] = resp['asks'][:depth]
@@ -408,7 +631,7 @@ class BinanceAPI(ExchangeAPI):
         params = None
         if symbol:
             params = {'symbol': symbol.upper()}
-        resp = json.loads(requests.get(uri, params=params).text)
+        resp = json.loads(self.http.get(uri, params=params).text)
         if symbol:
             return resp['markPrice']
         return {s['symbol']: s['markPrice'] for s in resp}
@@ -419,7 +642,7 @@ class BinanceAPI(ExchangeAPI):
         params = None
         if symbol:
             params = {'symbol': symbol.upper()}
-        resp = json.loads(requests.get(uri, params=params).text)
+        resp = json.loads(self.http.get(uri, params=params).text)
         if symbol:
             return resp['indexPrice']
         return {s['symbol']: s['indexPrice'] for s in resp}
@@ -427,10 +650,12 @@ class BinanceAPI(ExchangeAPI):
     ### SPOT ###
 
     # ACCOUNT ENDPOINTS
-    @meta(wait=1)
     def get_balances(self, asset='all', asset_type='spot', filter_zero=False):
-        if asset_type == 'spot':
-            bals = self._external_client.get_account()['balances']
+        account = self._ready_account(asset_type)
+        if account is not None:
+            bals = account.balances()
+        elif asset_type == 'spot':
+            bals = self._client_call('get_account')['balances']
             bals = {b['asset']: float(b['free']) for b in bals}
         elif asset_type == 'futures':
             bals = self.futures_get_balances()
@@ -455,7 +680,6 @@ class BinanceAPI(ExchangeAPI):
             balances = balances[0]
         return balances
 
-    @meta(wait=1)
     def order_status(self, symbol='BTCUSDT', order_id=None, asset_type='spot'):
         """
         Spot statuses:
@@ -474,19 +698,28 @@ class BinanceAPI(ExchangeAPI):
             resp = self.futures_order_status(symbol=symbol, order_id=order_id)
         elif asset_type == 'spot':
             if order_id is None:
-                resp = self._external_client.get_all_orders(symbol=symbol)
+                resp = self._client_call('get_all_orders', symbol=symbol, attempts=10, max_wait=60)
             else:
-                resp = self._external_client.get_order(symbol=symbol, orderId=order_id)
+                resp = self._client_call(
+                    'get_order', symbol=symbol, orderId=order_id, attempts=10, max_wait=60)
         else:
             raise ValueError
 
         self.logger.debug(resp)
         if isinstance(resp, dict):
             trades = self.get_trades(symbol=symbol, order_id=order_id, asset_type=asset_type)
+            for _ in range(self.ORDER_TRADES_POLLS):
+                # A fill's trades can be listed a moment after the order status
+                if trades or not float(resp['executedQty']) > 0:
+                    break
+                time.sleep(0.5)
+                trades = self.get_trades(symbol=symbol, order_id=order_id, asset_type=asset_type)
+            if not trades and float(resp['executedQty']) > 0:
+                raise ExchangeUnavailable(f'No trades listed for filled order {order_id}')
             qty = sum([float(t['quantity']) for t in trades])
-            avg_pr = sum([float(t['price'])*float(t['quantity']) for t in trades])/qty
+            avg_pr = sum([float(t['price'])*float(t['quantity']) for t in trades])/qty if qty else None
             fee = sum([float(t['fee']) for t in trades])
-            fee_asset = trades[0]['fee_asset']
+            fee_asset = trades[0]['fee_asset'] if trades else None
             return {
                     'order_id': resp['orderId'],
                     'symbol': resp['symbol'],
@@ -517,9 +750,7 @@ class BinanceAPI(ExchangeAPI):
         else:
             raise ValueError
 
-    @meta(wait=1)
     def get_trades(self, symbol='BTCUSDT', order_id=None, asset_type='spot'):
-        resp = self._external_client.get_my_trades(symbol=symbol)
         parser = lambda x: {
             'order_id': x['orderId'],
             'trade_id': x['id'],
@@ -535,6 +766,7 @@ class BinanceAPI(ExchangeAPI):
         if asset_type == 'futures':
             trades = self.futures_get_trades(symbol=symbol, order_id=order_id)
         elif asset_type == 'spot':
+            resp = self._client_call('get_my_trades', symbol=symbol)
             if order_id is None:
                 trades = [parser(tr) for tr in resp]
             else:
@@ -695,15 +927,17 @@ class BinanceAPI(ExchangeAPI):
 
     # ACCOUNT ENDPOINTS
 
-    @meta(wait=1)
+    @retry()
     def futures_get_balances(self):
         resp = self._external_client.futures_account_balance()
         return {s['asset']:s['balance'] for s in resp}
 
-    @meta(wait=1)
+    @retry()
     def _futures_get_balances(self):
         """
-        Different info than previous
+        Different info than previous. Always REST: margin balance and
+            unrealized P&L move with the mark price, the account stream
+            doesn't carry them
         """
         resp = self._external_client.futures_account()
         return resp
@@ -713,7 +947,7 @@ class BinanceAPI(ExchangeAPI):
         asset_acct = [a for a in account['assets'] if a['asset'] == asset][0]
         return float(asset_acct['availableBalance'])
 
-    @meta(wait=1)
+    @retry(attempts=10, max_wait=60)
     def futures_order_status(self, symbol='BTCUSDT', order_id=None):
         if order_id is None:
             resp = self._external_client.futures_get_all_orders(symbol=symbol)
@@ -746,9 +980,13 @@ class BinanceAPI(ExchangeAPI):
             order_id = close_position(symbol)
             return order_id
 
-    @meta(wait=1)
+    @retry()
     def futures_get_positions(self, symbol=None, filter_zero=False):
-        resp = self._external_client.futures_account()
+        account = self._ready_account('futures')
+        if account is not None:
+            resp = {'positions': account.positions()}
+        else:
+            resp = self._external_client.futures_account()
         if symbol:
             return [s for s in resp['positions'] if s['symbol'] == symbol][0]
         else:
@@ -759,7 +997,7 @@ class BinanceAPI(ExchangeAPI):
                 ]
             return resp['positions']
 
-    @meta(wait=1)
+    @retry()
     def _futures_get_positions(self, symbol=None, filter_zero=False):
         """
         WIP. Gives slightly different info than from futures_get_positions()
@@ -775,7 +1013,7 @@ class BinanceAPI(ExchangeAPI):
                 ]
             return resp
 
-    @meta(wait=1)
+    @retry()
     def futures_get_trades(self, symbol='BTCUSDT', order_id=None):
         kwargs = {
             'symbol': symbol,
@@ -802,11 +1040,15 @@ class BinanceAPI(ExchangeAPI):
         return trades
 
     def futures_get_position_pnl(self, symbol='BTCUSDT', order_id=None):
-        trades = self.futures_get_trades(symbol=symbol, order_id=order_id)
-        if order_id is None:
-            trades = [tr for tr in trades if tr['order_id'] == trades[-1]['order_id']]
-        r_pnl = sum([float(tr['realized_pnl']) for tr in trades])
-        u_pnl = float(self.futures_get_positions(symbol=symbol)['unrealizedProfit'])
+        account = self._ready_account('futures')
+        r_pnl = None if account is None else account.order_pnl(symbol, order_id)
+        if r_pnl is None:
+            trades = self.futures_get_trades(symbol=symbol, order_id=order_id)
+            if order_id is None:
+                trades = [tr for tr in trades if tr['order_id'] == trades[-1]['order_id']]
+            r_pnl = sum([float(tr['realized_pnl']) for tr in trades])
+        positions = self._futures_get_balances()['positions']
+        u_pnl = float([p for p in positions if p['symbol'] == symbol][0]['unrealizedProfit'])
         return {'realized': r_pnl, 'unrealized': u_pnl}
 
     def futures_place_order(self, symbol, side, quantity, order_type='MARKET', price=None):
@@ -870,3 +1112,21 @@ class BinanceAPI(ExchangeAPI):
     def futures_account(self):
         bals = self._external_client.futures_account()
         return bals
+
+
+if __name__ == '__main__':
+    # Startup benchmark: construct BinanceAPI and load its fees/symbol info,
+    #   cold (empty metadata cache) then warm (from the on-disk cache)
+    import tempfile
+    from . import MetadataCache
+    logging.basicConfig(level=logging.INFO)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for run in ('cold', 'warm (disk)', 'warm (memory)'):
+            if not run == 'warm (memory)':
+                ExchangeAPI.metadata_cache = MetadataCache(root=cache_dir)
+            t = time.perf_counter()
+            api = BinanceAPI()
+            t_init = time.perf_counter() - t
+            api.trade_fees, api._symbol_info
+            t_total = time.perf_counter() - t
+            print(f'{run}: __init__ {t_init:.3f}s, with fees/symbol info {t_total:.3f}s')
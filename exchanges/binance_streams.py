@@ -0,0 +1,419 @@
+import json
+import time
+import asyncio
+import logging
+import threading
+import collections
+import websockets
+
+from utils.order_book import OrderBook
+
+
+class BinanceStream:
+    """
+    Background connection to a Binance combined websocket stream
+
+    Runs its own asyncio loop in a daemon thread and reconnects with
+        exponential backoff whenever the connection drops (Binance also closes
+        every connection after 24h). Subclasses handle the messages in
+        _on_message(), which runs on the stream thread
+
+    Arguments
+    ---------
+    streams (list):     stream names, e.g. ['btcusdt@kline_3m']
+    asset_type (str):   'spot' or 'futures', picks the default ws_url
+    ws_url (str):       base url, to override the exchange's (e.g. testnet)
+
+    """
+
+    WS_URL = 'wss://stream.binance.com:9443'
+    WS_URL_FUTURES = 'wss://fstream.binance.com'
+    MAX_BACKOFF = 30 # Secs
+
+    def __init__(self, streams, asset_type='spot', ws_url=None):
+        if ws_url is None:
+            if asset_type == 'spot':
+                ws_url = self.WS_URL
+            elif asset_type == 'futures':
+                ws_url = self.WS_URL_FUTURES
+            else:
+                raise ValueError
+        self.streams = list(streams)
+        self.uri = f"{ws_url}/stream?streams={'/'.join(self.streams)}"
+        self.logger = logging.getLogger(__name__)
+        self.connected = threading.Event()
+        self.reconnects = 0
+        self._stop = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop = True
+
+    async def _run(self):
+        backoff = 1
+        while not self._stop:
+            try:
+                async with websockets.connect(self.uri) as ws:
+                    self.connected.set()
+                    self._on_connect()
+                    backoff = 1
+                    self.logger.info(f'Connected to {self.uri}')
+                    while not self._stop:
+                        try:
+                            msg = await asyncio.wait_for(ws.recv(), timeout=1)
+                        except asyncio.TimeoutError:
+                            continue
+                        self._on_message(json.loads(msg))
+            except Exception as ex:
+                self.logger.warning(f'Stream {self.uri} dropped ({ex!r}), reconnecting in {backoff}s')
+            self.connected.clear()
+            if self._stop:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(2*backoff, self.MAX_BACKOFF)
+
+    def _on_connect(self):
+        pass
+
+    def _on_message(self, msg):
+        raise NotImplementedError
+
+
+class KlineStream(BinanceStream):
+    """
+    Closed-kline (candle) events for a set of (symbol, period) series, over one
+        connection
+
+    Each candle is queued as soon as Binance marks it closed; consumers pop()
+        them per series. Candles missed while disconnected are not replayed, so
+        consumers should check timestamps for gaps and fill them over REST
+
+    Arguments
+    ---------
+    series (list):  (symbol, period) tuples, e.g. [('BTCUSDT', 180), ('BTCUSDT', 3600)]
+
+    """
+
+    def __init__(self, series, asset_type='spot', ws_url=None):
+        self.series = [(symbol.upper(), int(period)) for symbol, period in series]
+        self._period_of = {self.interval(period): period for _, period in self.series}
+        super().__init__(
+            [f'{symbol.lower()}@kline_{self.interval(period)}' for symbol, period in self.series],
+            asset_type=asset_type,
+            ws_url=ws_url)
+        self._candles = {key: collections.deque() for key in self.series}
+        self._cond = threading.Condition()
+        self._arrived = False # Candle queued since the last wait()
+
+    @staticmethod
+    def interval(period):
+        """
+        Binance interval str for a period in secs (e.g. 180 -> '3m', 3600 -> '1h')
+        """
+        if period % 86400 == 0:
+            return f'{int(period/86400)}d'
+        elif period % 3600 == 0:
+            return f'{int(period/3600)}h'
+        elif period % 60 == 0:
+            return f'{int(period/60)}m'
+        raise ValueError
+
+    def _on_message(self, msg):
+        kline = msg.get('data', msg).get('k')
+        if not kline or not kline.get('x'):
+            # Not a kline, or candle still open
+            return
+        key = (kline['s'], self._period_of.get(kline['i']))
+        if key not in self._candles:
+            return
+        candle = {
+            'datetime': int(kline['t']/1000),
+            'open': float(kline['o']),
+            'high': float(kline['h']),
+            'low': float(kline['l']),
+            'close': float(kline['c']),
+            'volume': float(kline['v']),
+            'received': time.time(),
+        }
+        with self._cond:
+            self._candles[key].append(candle)
+            self._arrived = True
+            self._cond.notify_all()
+
+    def pop(self, symbol, period):
+        """
+        Returns
+        ---------
+        (list): closed candles (dicts) received for the series since the last pop, oldest first
+
+        """
+        with self._cond:
+            candles = self._candles[(symbol.upper(), int(period))]
+            popped = list(candles)
+            candles.clear()
+        return popped
+
+    def wait(self, timeout=None):
+        """
+        Block until a candle arrives for any series, or timeout (secs). Returns
+            at once if one arrived since the last call, but candles left
+            queued (e.g. a 60m candle ahead of its 3m one) don't make it spin
+        """
+        with self._cond:
+            if not self._arrived:
+                self._cond.wait(timeout)
+            self._arrived = False
+
+
+class DepthStream(BinanceStream):
+    """
+    Local order book replica of one symbol, kept current from the diff depth
+        stream
+
+    Syncs as Binance documents it: diffs are buffered, a REST snapshot is
+        loaded, diffs it already covers are dropped and the rest applied in
+        order. A gap in the update ids (or a reconnect) drops the book back
+        to unsynced and resyncs from a new snapshot
+
+    Arguments
+    ---------
+    symbol (str)
+    fetch_snapshot (callable):  REST depth snapshot, {'lastUpdateId', 'bids', 'asks'}
+    speed (str):                diff push interval, '100ms' or '250ms'/'1000ms'
+
+    """
+
+    SNAPSHOT_DEPTH = 1000 # Levels of the REST snapshot, the replica's reliable depth
+    SNAPSHOT_INTERVAL = 1 # Min secs between snapshot fetches while syncing
+
+    def __init__(self, symbol, fetch_snapshot, asset_type='spot', ws_url=None, speed='100ms'):
+        self.symbol = symbol.upper()
+        self.fetch_snapshot = fetch_snapshot
+        self.book = OrderBook(self.symbol)
+        self.synced = False
+        self.resyncs = 0
+        self._pending = collections.deque()
+        self._snapshot = None
+        self._snapshot_at = 0
+        super().__init__(
+            [f'{symbol.lower()}@depth@{speed}' if speed != '1000ms' else f'{symbol.lower()}@depth'],
+            asset_type=asset_type,
+            ws_url=ws_url)
+
+    @property
+    def ready(self):
+        """
+        Book can be read: connected, and synced since the last (re)connect
+        """
+        return self.synced and self.connected.is_set()
+
+    def _on_connect(self):
+        self.synced = False
+        self._pending.clear()
+        self._snapshot = None
+
+    def _on_message(self, msg):
+        event = msg.get('data', msg)
+        if event.get('e') != 'depthUpdate':
+            return
+        if self.synced:
+            if not self._continues(event):
+                self.logger.warning(f'{self.symbol} depth stream gap, resyncing')
+                self.synced = False
+                self._pending.clear()
+                self._snapshot = None
+            else:
+                self.book.apply(event['b'], event['a'], event['u'], event.get('E'))
+                return
+        self._pending.append(event)
+        self._sync()
+
+    def _continues(self, event):
+        # Futures diffs carry the previous diff's final id (pu), spot diffs follow on by id
+        if 'pu' in event:
+            return event['pu'] == self.book.last_update_id
+        return event['U'] == self.book.last_update_id + 1
+
+    def _sync(self):
+        """
+        Load a snapshot, then apply the buffered diffs that follow on from it
+
+        The snapshot is kept until a diff past it arrives, and refetched (at
+            most every SNAPSHOT_INTERVAL secs) if the diffs have moved past it
+        """
+        if self._snapshot is None:
+            if time.time() - self._snapshot_at < self.SNAPSHOT_INTERVAL:
+                return
+            self._snapshot_at = time.time()
+            try:
+                self._snapshot = self.fetch_snapshot()
+            except Exception as ex:
+                self.logger.warning(f'{self.symbol} depth snapshot failed ({ex!r}), retrying')
+                return
+        last_id = self._snapshot['lastUpdateId']
+        while self._pending and self._pending[0]['u'] < last_id:
+            self._pending.popleft()
+        if not self._pending:
+            return
+        if self._pending[0]['U'] > last_id + 1:
+            # Snapshot is behind the buffered diffs
+            self._snapshot = None
+            return
+        self.book.load_snapshot(self._snapshot)
+        self._snapshot = None
+        first = self._pending.popleft()
+        self.book.apply(first['b'], first['a'], first['u'], first.get('E'))
+        while self._pending:
+            event = self._pending.popleft()
+            if not self._continues(event):
+                self._pending.clear()
+                return
+            self.book.apply(event['b'], event['a'], event['u'], event.get('E'))
+        self.synced = True
+        self.resyncs += 1
+        self.logger.info(f'{self.symbol} order book synced at update {self.book.last_update_id}')
+
+
+class UserDataStream(BinanceStream):
+    """
+    Account events (balances, positions, order fills) of the API key's
+        account, applied to an AccountState
+
+    The listen key is kept alive every KEEPALIVE secs and renewed when
+        Binance expires it. Events missed while disconnected are not replayed,
+        so on each (re)connect the state is reloaded over REST
+
+    Arguments
+    ---------
+    state (utils.account_state.AccountState)
+    get_listen_key (callable):  new listen key
+    keepalive (callable):       keepalive(listen_key)
+    reload (callable):          reload the state from REST
+
+    """
+
+    KEEPALIVE = 30*60 # Secs, Binance expires listen keys after 60 mins
+
+    def __init__(self, state, get_listen_key, keepalive, reload, asset_type='spot', ws_url=None):
+        self.state = state
+        self.state.stream = self
+        self.get_listen_key = get_listen_key
+        self.keepalive = keepalive
+        self.reload = reload
+        self.listen_key = get_listen_key()
+        super().__init__([self.listen_key], asset_type=asset_type, ws_url=ws_url)
+        self._ws_url = self.uri.split('/stream?')[0]
+
+    def start(self):
+        threading.Thread(target=self._keepalive, daemon=True).start()
+        return super().start()
+
+    def _keepalive(self):
+        while not self._stop:
+            time.sleep(self.KEEPALIVE)
+            try:
+                self.keepalive(self.listen_key)
+            except Exception as ex:
+                self.logger.warning(f'Listen key keepalive failed ({ex!r})')
+
+    def _on_connect(self):
+        try:
+            self.reload()
+        except Exception as ex:
+            self.state.loaded = False
+            self.logger.warning(f'Account state reload failed ({ex!r}), REST is used until the next connect')
+
+    def _on_message(self, msg):
+        event = msg.get('data', msg)
+        if event.get('e') == 'listenKeyExpired':
+            self.listen_key = self.get_listen_key()
+            self.uri = f'{self._ws_url}/stream?streams={self.listen_key}'
+            raise ConnectionError('Listen key expired') # Reconnects with the new key
+        try:
+            self.state.apply_event(event)
+        except Exception:
+            # A bad event shouldn't drop the stream (and force a REST reload)
+            self.logger.exception(f"Could not apply {event.get('e')} event")
+
+
+if __name__ == '__main__':
+    # Check KlineStream against a local fake Binance server, and the live
+    #   strategy's gap fill on top of it:
+    #   - open candles ('x' false) are not queued, closed ones are
+    #   - a dropped connection is reconnected (after the 1s backoff)
+    #   - candles missed while down are filled over (fake) REST, in order
+    import datetime as dt
+    import pandas as pd
+    from strategies.willr_bband import LiveWillRBband
+    logging.basicConfig(level=logging.INFO)
+
+    period = 60
+    last = int(time.time())//period*period - period # Last completed candle
+    prices = lambda ts: {'open': ts % 1000, 'high': ts % 1000 + 2, 'low': ts % 1000 - 2, 'close': ts % 1000 + 1}
+
+    def kline(ts, closed=True):
+        p = prices(ts)
+        if not closed:
+            p['close'] += 0.5 # Still moving, must not make it into the data
+        return json.dumps({'stream': 'btcusdt@kline_1m', 'data': {'e': 'kline', 'k': {
+            's': 'BTCUSDT', 'i': '1m', 't': ts*1000, 'x': closed, 'v': '1',
+            'o': str(p['open']), 'h': str(p['high']), 'l': str(p['low']), 'c': str(p['close'])}}})
+
+    # 1st connection: an open candle, its closed one, then a drop. 2nd: a
+    #   closed candle 2 periods later (the 2 between are missed)
+    sessions = [[kline(last - 3*period, closed=False), kline(last - 3*period)], [kline(last)]]
+
+    async def handler(ws):
+        for msg in sessions.pop(0) if sessions else []:
+            await ws.send(msg)
+        if sessions:
+            return # Drop
+        await asyncio.sleep(3600)
+
+    server_ready = threading.Event()
+    port = []
+
+    async def serve():
+        async with websockets.serve(handler, '127.0.0.1', 0) as server:
+            port.append(server.sockets[0].getsockname()[1])
+            server_ready.set()
+            await asyncio.sleep(3600)
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    server_ready.wait(5)
+    stream = KlineStream([('BTCUSDT', period)], ws_url=f'ws://127.0.0.1:{port[0]}').start()
+
+    class FakeExchange:
+        def get_backtest_data(self, symbol, period, start, end, asset_type='spot'):
+            ts = range(int(start.timestamp())//period*period, int(end.timestamp()), period)
+            return pd.DataFrame([dict(prices(t), datetime=t) for t in ts if t <= last])
+
+    strategy = LiveWillRBband.__new__(LiveWillRBband)
+    strategy.cfg = {'symbol': ('BTC', 'USDT'), 'series': [('BTCUSDT', '1m', period)], 'asset_type': 'spot'}
+    strategy.data = [pd.DataFrame([prices(last - 4*period)], index=[last - 4*period])]
+    strategy.exchange = FakeExchange()
+    strategy.logger = logging.getLogger('check')
+    strategy.kline_stream = stream
+    strategy._buffers = None
+    strategy.KLINE_STREAM_GRACE = 600 # Stay on the stream, no REST polling fallback
+    strategy._pending_candles = [collections.deque()]
+
+    deadline = time.time() + 10
+    while time.time() < deadline and not strategy.data[0].index[-1] == last:
+        stream.wait(timeout=0.5)
+        while strategy._get_streamed_candle(0):
+            pass
+    stream.stop()
+    index = list(strategy.data[0].index)
+    expected = list(range(last - 4*period, last + period, period))
+    assert index == expected, f'candles {index}, expected {expected}'
+    assert stream.reconnects >= 1, 'no reconnect'
+    for ts in index:
+        assert (strategy.data[0].loc[ts, list(prices(ts))] == pd.Series(prices(ts))).all(), f'candle {ts}'
+    print(f'OK: {len(index)} candles in order, {stream.reconnects} reconnect(s), gap filled over REST')
@@ -3,36 +3,14 @@ import datetime as dt
 import time
 import json
 import logging
-import traceback
-from functools import wraps
-import requests
 import pandas as pd
-from . import ExchangeAPI
+from . import ExchangeAPI, retry
 
 
 class NotImplementedError(Exception):
     pass
 
 
-def meta(wait=1):
-    """
-        Retry on API call failure
-    """
-    def deco_meta(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            x = None
-            while True:
-                try:
-                    x = func(*args, **kwargs)
-                    break
-                except Exception as ex:
-                    time.sleep(wait)
-            return x
-        return wrapper
-    return deco_meta
-
-
 class OkexAPI(ExchangeAPI):
     NAME = 'okex'
     API_URL = 'https://www.okex.com'
@@ -91,7 +69,7 @@ class OkexAPI(ExchangeAPI):
 
 
     # PUBLIC ENDPOINTS (SPOT & FUTURES)
-    @meta(wait=1)
+    @retry(attempts=8, max_wait=60)
     def get_historical_candles(
             self,
             symbol: str,
@@ -144,7 +122,7 @@ class OkexAPI(ExchangeAPI):
         }
 
         time_before = dt.datetime.utcnow()
-        df = pd.DataFrame(json.loads(requests.get(uri, params=req_params).text))
+        df = pd.DataFrame(json.loads(self.http.get(uri, params=req_params).text))
 
         if (len(df.index) == 0):
             return None
@@ -1,6 +1,8 @@
 import subprocess
 import json 
 import os
+import copy
+import time
 import pandas as pd
 import datetime as dt
 import argparse
@@ -21,8 +23,8 @@ class DataConfigurationError(Exception):
 
 
 class LiveTrader(Base):
-    def __init__(self, *_args):
-        super().__init__(*_args)
+    def __init__(self, args, exchanges=None):
+        super().__init__(args)
 
         # Figure out how much historical data to fetch before trading
         interval = 0
@@ -38,7 +40,11 @@ class LiveTrader(Base):
         self.start_prefetch = dt.datetime.utcnow() - dt.timedelta(seconds=self.data_prefetch_period)
 
         self._align_first_row()
-        self.exchange_obj = self.exchange_cls(use_testnet=args.use_testnet)
+        # Exchange objects can be shared between traders in one process, by class
+        exchanges = {} if exchanges is None else exchanges
+        if self.exchange_cls not in exchanges:
+            exchanges[self.exchange_cls] = self.exchange_cls(use_testnet=self.args.use_testnet)
+        self.exchange_obj = exchanges[self.exchange_cls]
 
         if self.args.debug:
             if not os.path.exists(f'{self.path}/logs/debug/'):
@@ -56,6 +62,9 @@ class LiveTrader(Base):
         argp.add_argument(
             "-d", "--debug", action='store_true', help="Debug mode. Print tables to csvs in logs/debug/ folder"
         )
+        argp.add_argument(
+            "-m", "--names", type=str, default=None, nargs="+", help="Run several settings names from config file in one process (one per base asset), instead of -n"
+        )
         args = argp.parse_args()
         return args
 
@@ -90,15 +99,18 @@ class LiveTrader(Base):
     def show_positions_nl(self, tokens):
         print('Open positions (unrealized P&L):')
         filler = None
+        # One account request for all positions and the desk NL
+        account = self.exchange_obj._futures_get_balances()
+        positions = {p['symbol']: p for p in account['positions']}
         for tkn in tokens:
-            position = self.exchange_obj.futures_get_positions(symbol=f'{tkn}USDT')
+            position = positions[f'{tkn}USDT']
             if not float(position['unrealizedProfit']) == 0:
                 side = 'Long' if float(position['positionAmt']) > 0 else 'Short'
                 filler = ' '.join(['' for _ in range(7 - len(tkn))])
                 print(f"    {tkn}:{filler}${round(float(position['unrealizedProfit']), 2)} ({side})")
         if filler is None:
             print('    None')
-        desk_nl = self.exchange_obj._futures_get_balances()['totalMarginBalance']
+        desk_nl = account['totalMarginBalance']
         print(f'Desk NL:   ${round(float(desk_nl), 2)}')
 
     def close_positions(self, tokens):
@@ -119,13 +131,100 @@ class LiveTrader(Base):
             self.close_positions(self.args.close_position)
             return
         #
-        if self.get_data():
-            data = self.df
-        else:
+        self.build_strategy().run()
+
+    def build_strategy(self, **kwargs):
+        """
+        Fetch the prefetch data and set up the live strategy on it
+        """
+        if not self.get_data():
             raise DataCollectionError
-        self.strategy(
+        self._compact_candles()
+        return self.strategy(
             self.df, self.exchange_obj,
-            self.trading_cfg, debug=self.args.debug).run()
+            self.trading_cfg, debug=self.args.debug, **kwargs)
+
+
+class MultiLiveTrader:
+    """
+    Run several config.json entries live in one process
+
+    Strategies share one exchange object per exchange class (so one HTTP
+        session pool and metadata cache), and one kline stream per (exchange,
+        asset_type) carrying every strategy's series. A single loop steps each
+        strategy as candles arrive. Each strategy keeps its own data, config
+        and log files (logs/<base asset>/); one that raises is logged and
+        dropped without stopping the others. Settings trading the same base
+        asset are rejected: they would share a position, log files and the
+        stream's candle queue
+
+    Arguments
+    ---------
+    args (argparse.Namespace): LiveTrader args, args.names being the settings names to run
+
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.strategies = {} # Settings name -> strategy
+        self.streams = []
+        exchanges = {}
+        streams = {}
+        names_by_dir = {}
+        for name in args.names:
+            _args = copy.copy(args)
+            _args.name = name
+            trader = LiveTrader(_args, exchanges=exchanges)
+            logs_dir = f"logs/{trader.trading_cfg['symbol'][0]}"
+            if logs_dir in names_by_dir:
+                raise DataConfigurationError(
+                    f"Settings {names_by_dir[logs_dir]} and {name} both trade"
+                    f" {trader.trading_cfg['symbol'][0]}, run them separately")
+            names_by_dir[logs_dir] = name
+            if not os.path.isdir(f'{logs_dir}/debug'):
+                os.makedirs(f'{logs_dir}/debug')
+            strategy = trader.build_strategy(logs_dir=logs_dir)
+            key = (trader.exchange_cls, trader.trading_cfg['asset_type'])
+            streams.setdefault(key, (trader.exchange_obj, []))[1].append(strategy)
+            self.strategies[name] = strategy
+        for (_, asset_type), (exchange_obj, _strategies) in streams.items():
+            series = []
+            for strategy in _strategies:
+                symbol = strategy.cfg['symbol'][0] + strategy.cfg['symbol'][1]
+                series += [(symbol, s[2]) for s in strategy.cfg['series'] if (symbol, s[2]) not in series]
+            stream = exchange_obj.kline_stream(series, asset_type=asset_type)
+            if stream is not None:
+                self.streams.append(stream)
+                for strategy in _strategies:
+                    strategy.kline_stream = stream
+
+    def _wait(self):
+        if len(self.streams) == 1:
+            self.streams[0].wait(timeout=1)
+        else:
+            time.sleep(1 if not self.streams else 0.1)
+
+    def run(self):
+        for name, strategy in self.strategies.items():
+            logging.info(f'Starting {name}')
+            strategy.start_live()
+        try:
+            while self.strategies:
+                stepped = False
+                for name, strategy in list(self.strategies.items()):
+                    try:
+                        stepped = strategy.step() or stepped
+                    except Exception:
+                        logging.exception(f'{name} failed, dropping it. Others keep running')
+                        del self.strategies[name]
+                        strategy.stop()
+                if not stepped:
+                    self._wait()
+            logging.critical('No strategies left running')
+        finally:
+            # Let queued post-trade accounting finish
+            for strategy in self.strategies.values():
+                strategy.stop()
 
 
 def test_setup():
@@ -151,4 +250,7 @@ if __name__ == '__main__':
             os.mkdir('logs')
         logging.basicConfig(filename=logfile, level=logging.INFO)
         logging.info(f'{int(dt.datetime.utcnow().timestamp())}: Starting live trader')
-    LiveTrader(args).run()
+    if args.names:
+        MultiLiveTrader(args).run()
+    else:
+        LiveTrader(args).run()
@@ -1,37 +1,18 @@
-for token in {BTCUSDT,ETHUSDT,BCHUSDT,XRPUSDT,EOSUSDT,LTCUSDT,TRXUSDT,ETCUSDT,LINKUSDT,XLMUSDT,ADAUSDT,XMRUSDT,DASHUSDT,ZECUSDT,XTZUSDT,BNBUSDT}
-
-do
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2021 3 5 --end 2021 4 21
-  python ta2_stats_reportonly.py
-
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2021 2 10 --end 2021 3 5
-  python ta2_stats_reportonly.py
-
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2020 12 26 --end 2021 2 10
-  python ta2_stats_reportonly.py
-
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2020 12 1 --end 2020 12 21
-  python ta2_stats_reportonly.py
-
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2020 6 29 --end 2020 11 29
-  python ta2_stats_reportonly.py
-
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2020 4 26 --end 2020 6 27
-  python ta2_stats_reportonly.py
-
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2020 3 6 --end 2020 4 23
-  python ta2_stats_reportonly.py
-
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2020 2 20 --end 2020 3 4
-  python ta2_stats_reportonly.py
-
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2020 2 10 --end 2020 2 19
-  python ta2_stats_reportonly.py
-
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2019 11 26 --end 2020 2 7
-  python ta2_stats_reportonly.py
-
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token --start 2020 2 20 --end 2020 3 4
-  python ta2_stats_reportonly.py
-done
-
+#!/bin/bash
+# Backtest each token over each date window, in parallel (see Sweep in backtester.py)
+# Results: logs/sweep_results.csv. Extra args are passed on, e.g. --workers 8 --sweep-params stoploss=0.01,0.02
+
+python backtester.py -n WillRBband_BTC_3m_60m \
+  --sweep-symbols BTCUSDT ETHUSDT BCHUSDT XRPUSDT EOSUSDT LTCUSDT TRXUSDT ETCUSDT LINKUSDT XLMUSDT ADAUSDT XMRUSDT DASHUSDT ZECUSDT XTZUSDT BNBUSDT \
+  --sweep-windows \
+    2021-3-5:2021-4-21 \
+    2021-2-10:2021-3-5 \
+    2020-12-26:2021-2-10 \
+    2020-12-1:2020-12-21 \
+    2020-6-29:2020-11-29 \
+    2020-4-26:2020-6-27 \
+    2020-3-6:2020-4-23 \
+    2020-2-20:2020-3-4 \
+    2020-2-10:2020-2-19 \
+    2019-11-26:2020-2-7 \
+  "$@"
@@ -1,8 +1,7 @@
-for token in
-{BTCUSDT,ETHUSDT,BCHUSDT,XRPUSDT,EOSUSDT,LTCUSDT,TRXUSDT,ETCUSDT,LINKUSDT,XLMUSDT,ADAUSDT,XMRUSDT,DASHUSDT,ZECUSDT,XTZUSDT,BNBUSDT}
+#!/bin/bash
+# Backtest each token from the config start date to now, in parallel (see Sweep in backtester.py)
+# Results: logs/sweep_results.csv
 
-do
-  date +%Y%m%d%H%M%S
-  python backtester.py -n WillRBband_BTC_3m_60m --symbol $token
-  python ta2_stats_reportonly.py
-done
+python backtester.py -n WillRBband_BTC_3m_60m \
+  --sweep-symbols BTCUSDT ETHUSDT BCHUSDT XRPUSDT EOSUSDT LTCUSDT TRXUSDT ETCUSDT LINKUSDT XLMUSDT ADAUSDT XMRUSDT DASHUSDT ZECUSDT XTZUSDT BNBUSDT \
+  "$@"
@@ -7,14 +7,68 @@ import numpy as np
 import btalib
 import backtrader as bt
 
+from utils import crosses
+from utils import timeframes
+from utils.frames import exact_values
+
 
 class ApplicationStateError(Exception):
     pass
 
 
+class ParityError(Exception):
+    pass
+
+
+class CandleRows:
+    """
+    Cursor over the rows of a candle dataframe, backed by column arrays
+
+    Stands in for the rows built by iterating with DataFrame.iterrows() and
+        appending a 'datetime' field, for use by the per-candle trade logic
+        (e.g. row['close'], row[self.cross_buy_open_col], row['datetime'])
+
+    Each column is pulled out of the dataframe once, on first lookup, as a
+        plain list. A lookup is then a list index at the cursor position,
+        instead of a new pd.Series per row
+
+    Note the cursor object itself is yielded on every step, so it must not be
+        held on to across rows
+    """
+
+    def __init__(self, df, start_ts=None):
+        self._df = df
+        self._cols = {'datetime': df.index.tolist()}
+        self._decimals = getattr(df, 'attrs', {}).get('decimals', {}) # float32 cols of compact frames
+        self._start_ts = start_ts
+        self.pos = 0
+
+    def __getitem__(self, col):
+        try:
+            values = self._cols[col]
+        except KeyError:
+            values = self._cols[col] = (
+                exact_values(self._df, col) if col in self._decimals else self._df[col]).tolist()
+        return values[self.pos]
+
+    def __len__(self):
+        return len(self._cols['datetime'])
+
+    def __iter__(self):
+        index = self._cols['datetime']
+        for pos in range(len(index)):
+            if self._start_ts is not None and not index[pos] >= self._start_ts:
+                # Skip pre-fetch rows
+                continue
+            self.pos = pos
+            yield self
+
+
 class BacktestingBaseClass:
 
     data_cfg = tuple()
+    cross_mode = crosses.STANDARD
+    upsample_cols = {} # Series index -> cols copied onto data[0] by _upsample_series()
     operator_lookup = {
 	'>': operator.gt,
 	'<': operator.lt,
@@ -53,21 +107,25 @@ class BacktestingBaseClass:
         self.cross_sell_open_col = f"crossunder:{self.col_tags['short_entry_cross'][0]}-{self.col_tags['short_entry_cross'][1]}"
         self.cross_sell_close_col = f"crossover:{self.col_tags['short_close_cross'][0]}-{self.col_tags['short_close_cross'][1]}"
 
+    def _upsample_series(self):
+        """
+        Copy the columns declared in upsample_cols from the longer series onto
+            data[0], each row getting the previous completed longer candle
+        """
+        for i, cols in self.upsample_cols.items():
+            aligned = timeframes.align_to_base(
+                self.data[0].index, self.data[i], self.cfg['series'][i][-1], cols)
+            for col in cols:
+                self.data[0][col] = aligned[col].to_numpy()
+
     def get_crosses(self, col_1, col_2, i, over=True):
-        op = '>' if over else '<'
         col_name_suffix = 'over' if over else 'under'
-        comparator = self.operator_lookup.get(op)
         col_name = f'cross{col_name_suffix}:{col_1}-{col_2}'
-        col_idx = [col_1, f'{col_1}_prev', col_2, f'{col_2}_prev']
-        self.data[i][col_name] = self.data[i][col_idx].apply(
-            lambda row: True if (
-                    not np.isnan(row[col_1])
-                    and not np.isnan(row[f'{col_1}_prev'])
-                    and not np.isnan(row[col_2])
-                    and not np.isnan(row[f'{col_2}_prev'])
-                    and comparator(row[col_1], row[col_2])
-                    and not comparator(row[f'{col_1}_prev'], row[f'{col_2}_prev']))
-                else False, axis=1)
+        df = self.data[i]
+        self.data[i][col_name] = crosses.detect_crosses(
+            df[col_1].to_numpy(), df[f'{col_1}_prev'].to_numpy(),
+            df[col_2].to_numpy(), df[f'{col_2}_prev'].to_numpy(),
+            over=over, mode=self.cross_mode)
 
     def run(self):
         self.preprocess_data()
@@ -4,7 +4,9 @@ import csv
 import datetime as dt
 import operator
 import logging
+import collections
 import backtrader as bt
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -12,10 +14,23 @@ from utils.influxdb import InfluxDBClient
 import btalib
 
 from utils.s3 import write_s3
-from .base import BacktestingBaseClass
+from .base import BacktestingBaseClass, CandleRows, ParityError
+from exchanges import ExchangeUnavailable
 
 from utils.sns import SNS_call
 from utils.analytics import book_query
+from utils.floating import FloatingCandles, phased_willr_ema
+from utils.crosses import detect_crosses
+from utils.timeframes import completed_candle_ts
+from utils.streaming import (
+    StreamingWillR, StreamingEMA, StreamingBBands, StreamingFloatingWillR,
+    check_consistency)
+from utils.indicator_matrix import IndicatorMatrix
+from utils.batch_sim import simulate_all_params
+from utils.results import RunResult
+from utils.frames import compact_indicators, exact_at, exact_values, expand_candles
+from utils.workers import TaskQueue
+from utils.ring_buffer import CandleRingBuffer
 
 
 class ApplicationStateError(Exception):
@@ -24,10 +39,28 @@ class ApplicationStateError(Exception):
 
 class WillRBband(BacktestingBaseClass):
 
-    def __init__(self, *args, **kwargs):
+    bband_devs = 2.3
+    upsample_cols = {1: ('willr_ema', 'willr_ema_prev')}
+    # cfg keys only read by the trade logic, not the indicators. Sweeps over these share one IndicatorMatrix
+    trade_params = (
+        'execution_name',
+        'willrema_diff_threshold',
+        'willrema_long_entry',
+        'willrema_short_entry',
+        'willr_long_entry',
+        'willr_short_entry',
+        'stoploss',
+        'timestop',
+    )
+    # execution_name -> willrema_stop, for the ones run_trades_batch() can simulate
+    batch_executions = {'_execute_trade_all_params': False}
+
+    def __init__(self, *args, tradelog=True, **kwargs):
         super().__init__(*args, **kwargs)
         self.execution_mode = 'backtesting'
-        self._backtesting_tradelog_setup()
+        self.tradelog = tradelog # Append trades to logs/backtesting_trades.csv
+        if self.tradelog:
+            self._backtesting_tradelog_setup()
         self.col_tags = {
             'long_entry_cross': ('close', 'bband_20_low'),
             'long_close_cross': ('close', 'bband_20_high'),
@@ -37,6 +70,7 @@ class WillRBband(BacktestingBaseClass):
         self.position_open_state = False # Vals: 'long_open', 'short_open', False
         self._on_new_candle = getattr(self, self.cfg['execution_name'])
         self.influxdb_client = InfluxDBClient()
+        self.trim_df = False
 
     def _backtesting_tradelog_setup(self):
         cols = (
@@ -97,21 +131,14 @@ class WillRBband(BacktestingBaseClass):
 
         # ..load 3m data
         i = 0
-        self.data[i]['bband_20_low'] = btalib.bbands(self.data[i]['close'], period = 20, devs = 2.3).bot
+        self.data[i]['bband_20_low'] = btalib.bbands(self.data[i]['close'], period = 20, devs = self.bband_devs).bot
         self.data[i]['bband_20_low_prev'] = self.data[i]['bband_20_low'].shift(1)
-        self.data[i]['bband_20_high'] = btalib.bbands(self.data[i]['close'], period = 20, devs = 2.3).top
+        self.data[i]['bband_20_high'] = btalib.bbands(self.data[i]['close'], period = 20, devs = self.bband_devs).top
         self.data[i]['bband_20_high_prev'] = self.data[i]['bband_20_high'].shift(1)
         self.data[i]['close_prev'] = self.data[i]['close'].shift(1)
 
         # Upsample longer interval series to dataframe at index=0
-        modulo = int(self.cfg['series'][1][-1])
-        for _i, row in self.data[0].iterrows():
-            dt_60m = int(_i - _i % modulo) - modulo
-            if not dt_60m >= self.data[1].index[0]:
-                # Skip first 60m row
-                continue
-            self.data[0].at[_i, 'willr_ema'] = self.data[1].at[dt_60m, 'willr_ema']
-            self.data[0].at[_i, 'willr_ema_prev'] = self.data[1].at[dt_60m, 'willr_ema_prev']
+        self._upsample_series()
 
         if self.cfg['floating_willr']:
             self._create_floating_willr()
@@ -130,7 +157,33 @@ class WillRBband(BacktestingBaseClass):
         self.get_crosses('close', 'bband_20_low', i, over=False)
 
     def _create_floating_willr(self):
-        ### Build floating willr/willr_ema indicators
+        """
+        Build floating willr/willr_ema indicators
+
+        All num_intervals phases are calc'd in one pass over strided views of
+            the floating columns (utils.floating.phased_willr_ema). Series with
+            gaps or NaN floating candles, where the resampled phases get
+            interpolated, go through the per-phase resampling instead
+        """
+        period_short = self.cfg['series'][0][-1]
+        num_intervals = int(self.cfg['series'][1][-1]/period_short)
+        period_str = self.cfg['series'][1][1] # Period str in mins (e.g. '60m')
+        tag = f'{period_str}_float'
+        index = self.data[0].index.to_numpy()
+        floating_hlc = [self.data[0][f'{c}_{tag}'].to_numpy(dtype=float) for c in ('high', 'low', 'close')]
+        if self.debug or not (
+                np.all(np.diff(index) == period_short)
+                and not any(np.isnan(x[num_intervals-1:]).any() for x in floating_hlc)):
+            self._create_floating_willr_resampled()
+            return
+        willr, willr_ema = phased_willr_ema(
+            *floating_hlc, num_intervals, willr_period=14, ema_period=43)
+        self.data[0][f'willr_{period_str}_float'] = willr
+        self.data[0][f'willr_ema_{tag}'] = willr_ema
+        self.data[0][f'willr_ema_prev_{tag}'] = self.data[0][f'willr_ema_{tag}'].shift(num_intervals)
+
+    def _create_floating_willr_resampled(self):
+        ### Build floating willr/willr_ema indicators, resampling each phase
         modulo = int(self.cfg['series'][1][-1])
         num_intervals = int(self.cfg['series'][1][-1]/self.cfg['series'][0][-1])
         last_idx = self.data[0].index[-1]
@@ -203,26 +256,47 @@ class WillRBband(BacktestingBaseClass):
         period_long = self.cfg['series'][1][2] # Period in secs
         period_long_str = self.cfg['series'][1][1] # Period str in mins (e.g. '60m')
         tag = f'{period_long_str}_float'
-        self.data[0][f'open_{tag}'] = pd.Series()
-        self.data[0][f'high_{tag}'] = pd.Series()
-        self.data[0][f'low_{tag}'] = pd.Series()
-        self.data[0][f'close_{tag}'] = pd.Series()
-        self.data[0]['Datetime'] = pd.to_datetime(self.data[0].index, unit='s')
         if self.debug:
             self.data[0].to_csv('logs/debug/1.orig_data.csv')
-        first_row_ts = self.data[0].index[0]
-        for i, row in self.data[0].iterrows():
-            i_start = i - period_long + period_short
-            i_end = i
-            if i_start < first_row_ts:
-                continue
-            self.data[0].at[i, f'open_{tag}'] = self.data[0].loc[i_start]['open']
-            self.data[0].at[i, f'high_{tag}'] = self.data[0].loc[i_start:i_end]['high'].max()
-            self.data[0].at[i, f'low_{tag}'] = self.data[0].loc[i_start:i_end]['low'].min()
-            self.data[0].at[i, f'close_{tag}'] = self.data[0].loc[i_end]['close']
+        self._floating_candles = FloatingCandles(period_short, period_long)
+        floating_ohlc = self._floating_candles.build(
+            self.data[0].index, *(self.data[0][c] for c in ('open', 'high', 'low', 'close')))
+        decimals = self.data[0].attrs.get('decimals', {})
+        for col, values in zip(('open', 'high', 'low', 'close'), floating_ohlc):
+            self.data[0][f'{col}_{tag}'] = values
+            if col in decimals: # Floating candles are made of the same prices
+                decimals[f'{col}_{tag}'] = decimals[col]
+        if not self.cfg.get('compact_candles'):
+            self.data[0]['Datetime'] = pd.to_datetime(self.data[0].index, unit='s')
         if self.debug:
             self.data[0].to_csv('logs/debug/2.floating_ohlc.csv')
 
+    def _update_floating_ohlc(self):
+        """
+        Extend the floating OHLC columns over candles added since the last
+            build/update, one candle at a time (live mode)
+        """
+        if getattr(self, '_floating_candles', None) is None:
+            self._create_floating_ohlc()
+            return
+        tag = f"{self.cfg['series'][1][1]}_float"
+        df = self.data[0]
+        for idx in df.index[df.index > self._floating_candles.last_ts]:
+            floating_ohlc = self._floating_candles.append(
+                int(idx), *(exact_at(df, idx, c) for c in ('open', 'high', 'low', 'close')))
+            values = {f'{col}_{tag}': value for col, value in zip(('open', 'high', 'low', 'close'), floating_ohlc)}
+            if 'Datetime' in df:
+                values['Datetime'] = pd.to_datetime(idx, unit='s')
+            self._set_row(0, idx, values)
+
+    def _set_row(self, i, idx, values):
+        # Live candle buffers (LiveWillRBband) are written to directly, the frames being views
+        if getattr(self, '_buffers', None) is not None:
+            self._buffers[i].set(idx, values)
+            return
+        for col, value in values.items():
+            self.data[i].at[idx, col] = value
+
     def _resample_floating_candles(self, offset=0):
         """
         Pick out the longer series' candles, offset to the final row of the dataFrame
@@ -276,9 +350,7 @@ class WillRBband(BacktestingBaseClass):
             self.trades.append(trade_settings)
             self._trades[-1] += f'_{trade_settings[1].lower()}_{trade_settings[2].lower()}'
         elif self.execution_mode == 'live':
-            symbol = self.cfg['symbol'][0] + self.cfg['symbol'][1]
-            ob_snapshot = self.exchange.get_book(symbol=symbol, depth=10, asset_type=self.cfg['asset_type'])
-            self._place_live_order(trade_settings + (side, ob_snapshot))
+            self._place_live_order(trade_settings + (side,))
         else:
             raise ValueError
 
@@ -480,27 +552,164 @@ class WillRBband(BacktestingBaseClass):
                 return True
         return False
 
-    def run(self):
-        if self.cfg['floating_willr']:
-            self._create_floating_ohlc()
-        self.preprocess_data()
-        #
-        if not self._crosses_sanity_check():
-            raise SanityCheckError
+    def _reset_trade_state(self):
+        self.trades = []
+        self.position = 0
+        self.position_open_state = False
         self._trades = [] # Trade diagnostic col for writing df to csv
         self._POSs = [] # ""
         self.long_open = False
         self.long_close = False
         self.short_open = False
         self.short_close = False
+
+    def _candle_rows(self):
+        """
+        Rows of the shorter series from bt_start onwards, for the trade loop
+        """
+        return CandleRows(self.data[0], start_ts=self.bt_start.timestamp())
+
+    def _candle_rows_legacy(self):
+        """
+        Original per-row iteration, building a pd.Series for every candle
+
+        Kept as the reference path for check_execution_parity()
+        """
         for i, row in self.data[0].iterrows(): # iterate over 3m series
             _row = row.append(pd.Series([i], index=['datetime']))
             if _row['datetime'] >= self.bt_start.timestamp(): # Skip pre-fetch rows
-                self._trades.append('')
-                if self._on_new_candle(_row):
-                    # If a position was closed in this candle, check to re-open new position
-                    self._on_new_candle(_row)
-                self._POSs.append(self.position_open_state)
+                yield _row
+
+    def _run_trade_loop(self, rows):
+        self._reset_trade_state()
+        for _row in rows:
+            self._trades.append('')
+            if self._on_new_candle(_row):
+                # If a position was closed in this candle, check to re-open new position
+                self._on_new_candle(_row)
+            self._POSs.append(self.position_open_state)
+
+    def _expand_data(self):
+        # Opt-in (cfg compact_candles): calc indicators from the exact float64 prices
+        if self.cfg.get('compact_candles'):
+            for df in self.data:
+                expand_candles(df)
+
+    def _compact_data(self):
+        # Opt-in (cfg compact_candles): keep the prices and calc'd indicator cols as float32
+        if self.cfg.get('compact_candles'):
+            self.data[:] = [compact_indicators(df) for df in self.data]
+
+    def _prepare_run(self):
+        self._expand_data()
+        if self.cfg['floating_willr']:
+            self._create_floating_ohlc()
+        self.preprocess_data()
+        self._compact_data()
+        #
+        if not self._crosses_sanity_check():
+            raise SanityCheckError
+
+    def check_execution_parity(self):
+        """
+        Run the trade logic over the same preprocessed data twice, once with the
+            original iterrows() loop and once with the array-backed loop, and
+            verify both produce the same trades
+
+        Returns
+        ---------
+        (int): number of trades matched
+
+        """
+        self._prepare_run()
+        self._run_trade_loop(self._candle_rows_legacy())
+        legacy_trades = self.trades
+        legacy_POSs = self._POSs
+        self._run_trade_loop(self._candle_rows())
+        for i, (legacy, trade) in enumerate(zip(legacy_trades, self.trades)):
+            if not legacy == trade:
+                self.logger.critical(
+                    f'{self.cfg["execution_name"]}: trade {i} differs,'
+                    f' legacy: {legacy}, array: {trade}')
+                raise ParityError
+        if not len(legacy_trades) == len(self.trades) or not legacy_POSs == self._POSs:
+            self.logger.critical(
+                f'{self.cfg["execution_name"]}: trade count/state differs,'
+                f' legacy: {len(legacy_trades)}, array: {len(self.trades)}')
+            raise ParityError
+        self.logger.info(
+            f'{self.cfg["execution_name"]}: {len(self.trades)} trades match'
+            f' between legacy and array-backed trade loops')
+        return len(self.trades)
+
+    def indicator_matrix(self):
+        """
+        Calc the indicators and return them as an IndicatorMatrix, for
+            run_trades() on other instances with different trade_params
+        """
+        self._prepare_run()
+        return IndicatorMatrix.from_df(self.data[0])
+
+    def _set_cross_cols(self):
+        self.cross_buy_open_col = f"crossover:{self.col_tags['long_entry_cross'][0]}-{self.col_tags['long_entry_cross'][1]}"
+        self.cross_buy_close_col = f"crossover:{self.col_tags['long_close_cross'][0]}-{self.col_tags['long_close_cross'][1]}"
+        self.cross_sell_open_col = f"crossunder:{self.col_tags['short_entry_cross'][0]}-{self.col_tags['short_entry_cross'][1]}"
+        self.cross_sell_close_col = f"crossunder:{self.col_tags['short_close_cross'][0]}-{self.col_tags['short_close_cross'][1]}"
+
+    def run_trades(self, matrix):
+        """
+        Run only the trade logic, against indicators already calculated by
+            indicator_matrix() (with the same non-trade_params cfg)
+        """
+        self._set_cross_cols()
+        self._run_trade_loop(CandleRows(matrix, start_ts=self.bt_start.timestamp()))
+        return RunResult(self.cfg, self.trades, self.bt_start.timestamp(), matrix.index[-1])
+
+    def run_trades_batch(self, matrix, params, fee=0.):
+        """
+        Simulate the trade logic for many sets of trade_params at once, against
+            indicators from indicator_matrix(). Only for the execution_names in
+            batch_executions; each set's trades match run_trades() with that cfg
+
+        Arguments
+        ---------
+        matrix (IndicatorMatrix):   indicators (or the preprocessed data[0] df)
+        params (dict):              trade param -> values, one per set. Params
+                                    not given are taken from cfg
+        fee (float):                fee per trade, for the ROI
+
+        Returns
+        ---------
+        (tuple): (BatchTrades, roi np.array over the sets)
+
+        """
+        self._set_cross_cols()
+        tag = ''
+        if self.cfg['floating_willr']:
+            tag = f"_{self.cfg['series'][1][1]}_float"
+        start = np.searchsorted(np.asarray(matrix.index), self.bt_start.timestamp())
+        col = lambda c: np.asarray(matrix[c], dtype=float)[start:]
+        return simulate_all_params(
+            np.asarray(matrix.index)[start:],
+            col('close'),
+            col(f'willr{tag}'),
+            col(f'willr_ema{tag}'),
+            col(f'willr_ema_prev{tag}'),
+            tuple(col(c) for c in (
+                self.cross_buy_open_col,
+                self.cross_buy_close_col,
+                self.cross_sell_open_col,
+                self.cross_sell_close_col)),
+            {
+                k: params.get(k, self.cfg[k])
+                for k in self.trade_params if not k == 'execution_name'
+            },
+            willrema_stop=self.batch_executions[self.cfg['execution_name']],
+            fee=fee)
+
+    def run(self):
+        self._prepare_run()
+        self._run_trade_loop(self._candle_rows())
 
 #        self.data[0]['position_open_state'] = self._POSs
 #        self.data[0]['trades'] = self._trades
@@ -532,10 +741,11 @@ class WillRBband(BacktestingBaseClass):
 #        plt.savefig(f'logs/plots/{symbol}_{self.start_time}.pdf')
 
         # Trades logging
-        with open(f'logs/backtesting_trades.csv', 'a', newline='') as f:
-            writer = csv.writer(f)
-            for trade in self.trades:
-                writer.writerow((trade[0], None) + (trade[1:]))
+        if self.tradelog:
+            with open(f'logs/backtesting_trades.csv', 'a', newline='') as f:
+                writer = csv.writer(f)
+                for trade in self.trades:
+                    writer.writerow((trade[0], None) + (trade[1:]))
 
         self.logger.info(
             f'Start bal: {self.cfg["start_capital"]},'
@@ -543,6 +753,7 @@ class WillRBband(BacktestingBaseClass):
             f' roi: {round((self.pnl/self.cfg["start_capital"])*100, 2)}%'
             f' num trades: {len(self.trades)}'
             f' dataframe: {self.data[0].shape}')
+        return RunResult(self.cfg, self.trades, self.bt_start.timestamp(), self.data[0].index[-1])
 
 #        # Upload files to S3
 #        write_s3('logs/backtester.log', bkt=self.s3_bkt_name)
@@ -551,18 +762,38 @@ class WillRBband(BacktestingBaseClass):
 class LiveWillRBband(WillRBband):
 
     MAX_PERIODS = (20, 14 + 43 + 1) # Corresponding to (3m, 60m) data series
-
-    def __init__(self, *args, **kwargs):
+    streaming_indicators = True # Update indicators per new candle, instead of preprocess_data()
+    KLINE_STREAM_GRACE = 30 # Secs past a candle close to wait on the kline stream before polling REST
+    PRE_TRADE_WORKERS = 4 # Concurrent pre-trade fetches (book, bals, index price, leverage)
+    ring_buffer = True # Keep live candles in fixed capacity buffers sized from MAX_PERIODS
+    BUFFER_LOOKBACKS = 8 # MAX_PERIODS lookbacks kept, so a full preprocess_data() gets converged EMAs
+    local_order_book = True # Serve get_book() from a stream-fed replica, where the exchange has one
+    account_stream = True # Serve balances/positions from a stream-fed account state, where the exchange has one
+    ACCOUNT_WAIT = 5 # Secs post-trade accounting waits for the fill to reach the account state
+    TRADE_STATE = ('position', 'position_open_state', 'open_price', 'time_opened') # Set by the _execute_trade_* signal checks
+
+    def __init__(self, *args, logs_dir='logs', **kwargs):
+        self.logs_dir = logs_dir # Live trade/candle logs, one dir per strategy when several share a process
         super().__init__(*args, **kwargs)
         self.execution_mode = 'live'
+        self.logger = logging.getLogger(f"{__name__}.{self.cfg['symbol'][0]}{self.cfg['symbol'][1]}")
         self.live_tradelog_cols = tuple()
+        self.account = None
+        if self.account_stream:
+            self.account = self.exchange.account_state(asset_type=self.cfg['asset_type'])
         self._live_tradelog_setup()
         self.last_order = tuple() # (order_status: dict, bals: dict, size: float, position_action: str)
+        self._leverage_set = None # Margin level last set on the exchange
+        self._pre_trade_pool = ThreadPoolExecutor(max_workers=self.PRE_TRADE_WORKERS)
+        # Post-trade accounting and notifications, off the order's critical path
+        self.post_trade = TaskQueue(name=f"post_trade_{self.cfg['symbol'][0]}{self.cfg['symbol'][1]}")
         self.neutral_inv = self.cfg['inv_neutral_bal']
         if self.neutral_inv == 'auto':
             bals = self.exchange.get_balances(asset_type=self.cfg['asset_type'])
             self.neutral_inv = bals[self.cfg['symbol'][0]]
-        self.trim_df = False
+        self.kline_stream = None
+        self._buffers = None # CandleRingBuffer per series, once live
+        self.order_book = None # Local replica, once live (None if the exchange has no depth stream)
 
     def _live_tradelog_setup(self):
         bals = self.exchange.get_balances(asset_type=self.cfg['asset_type'])
@@ -606,12 +837,12 @@ class LiveWillRBband(WillRBband):
                     bals.get(self.cfg['symbol'][1]), '',
                     netliq, netliq, margin_bal, margin_bal, ''))
         write_mode = 'a'
-        if not os.path.isfile('logs/live_trades.csv'):
+        if not os.path.isfile(f'{self.logs_dir}/live_trades.csv'):
             write_mode = 'w'
         else:
             cols = None
 
-        with open(f'logs/live_trades.csv', write_mode, newline='') as f:
+        with open(f'{self.logs_dir}/live_trades.csv', write_mode, newline='') as f:
             writer = csv.writer(f)
             if cols:
                 writer.writerow(cols)
@@ -646,24 +877,121 @@ class LiveWillRBband(WillRBband):
                     break
                 now = dt.datetime.utcnow()
 
-            row = {c:None for c in self.data[i].columns}
-            self.data[i].loc[idx] = row
-            self.data[i].at[idx, 'open'] = new_candle.iloc[-1]['open']
-            self.data[i].at[idx, 'high'] = new_candle.iloc[-1]['high']
-            self.data[i].at[idx, 'low'] = new_candle.iloc[-1]['low']
-            self.data[i].at[idx, 'close'] = new_candle.iloc[-1]['close']
+            self._add_candle(i, idx, new_candle.iloc[-1])
             return True
         else:
             return False
 
-    def _live_accounting(self, order_id, bals_before, size, position_action, close_price, ob_snapshot):
+    def _add_candle(self, i, idx, candle):
+        if self._buffers is not None:
+            self._buffers[i].append(idx, {c: candle[c] for c in ('open', 'high', 'low', 'close')})
+            self.data[i] = self._buffer_frame(i)
+            return
+        row = {c:None for c in self.data[i].columns}
+        self.data[i].loc[idx] = row
+        self.data[i].at[idx, 'open'] = candle['open']
+        self.data[i].at[idx, 'high'] = candle['high']
+        self.data[i].at[idx, 'low'] = candle['low']
+        self.data[i].at[idx, 'close'] = candle['close']
+
+    def _start_kline_stream(self):
+        """
+        Subscribe to closed candles for all series, unless a (shared) stream
+            was already set on the strategy. Stays None if the exchange has no
+            stream, in which case run() polls REST
+        """
+        if self.kline_stream is None:
+            symbol = self.cfg['symbol'][0] + self.cfg['symbol'][1]
+            self.kline_stream = self.exchange.kline_stream(
+                [(symbol, series[2]) for series in self.cfg['series']],
+                asset_type=self.cfg['asset_type'])
+        self._pending_candles = [collections.deque() for _ in self.cfg['series']]
+
+    def _fetch_candle_gap(self, i, start_ts, end_ts):
+        """
+        REST fetch of the candles from start_ts up to (excl) end_ts, missed by the stream
+        """
+        period = self.cfg['series'][i][2]
+        self.logger.info(f'Filling {self.cfg["series"][i][1]} candle gap {start_ts} - {end_ts} over REST')
+        df = self.exchange.get_backtest_data(
+            self.cfg['symbol'][0]+self.cfg['symbol'][1],
+            period,
+            dt.datetime.fromtimestamp(start_ts),
+            dt.datetime.fromtimestamp(end_ts + period),
+            asset_type=self.cfg['asset_type'])
+        if df is None:
+            return []
+        return [
+            {c: getattr(r, c) for c in ('datetime', 'open', 'high', 'low', 'close')}
+            for r in df.itertuples()
+            if start_ts <= int(r.datetime) < end_ts
+        ]
+
+    def _get_streamed_candle(self, i):
+        """
+        Add the next closed candle for series i from the kline stream
+
+        Candles the stream skipped (e.g. across a reconnect) are filled over
+            REST. If the stream has been quiet for KLINE_STREAM_GRACE secs
+            past a candle's close, falls back to polling REST
+        """
+        period = self.cfg['series'][i][2]
+        latest_data_idx = int(self.data[i].index[-1])
+        pending = self._pending_candles[i]
+        for candle in self.kline_stream.pop(self.cfg['symbol'][0]+self.cfg['symbol'][1], period):
+            last_idx = pending[-1]['datetime'] if pending else latest_data_idx
+            if not candle['datetime'] > last_idx:
+                continue
+            if candle['datetime'] > last_idx + period:
+                pending.extend(self._fetch_candle_gap(i, last_idx + period, candle['datetime']))
+            pending.append(candle)
+        while pending and not pending[0]['datetime'] > latest_data_idx:
+            # Already added by a REST poll
+            pending.popleft()
+        if pending:
+            candle = pending.popleft()
+            self._add_candle(i, int(candle['datetime']), candle)
+            return True
+        if dt.datetime.utcnow().timestamp() - latest_data_idx > 2*period + self.KLINE_STREAM_GRACE:
+            return self._get_latest_candle(i)
+        return False
+
+    def _live_accounting(
+            self, order_status, prev_order_status, candle_ts, bals_before, size, position_action,
+            close_price, ob_snapshot):
         """
         For live trading, dump trade to csv
 
+        Runs on the post_trade queue. order_status only holds the order_id
+            until here; it gets updated in place with the exchange's status,
+            which also fills it in self.last_order. If the exchange can't
+            give the fill, the row is written with empty quantity/price/fee
+
         """
         symbol = self.cfg['symbol'][0] + self.cfg['symbol'][1]
-        trade_status = self.exchange.order_status(
-            symbol=symbol, order_id=order_id, asset_type=self.cfg['asset_type'])
+        if self.account is not None and self.account.ready:
+            # Balances/positions below are read from the account state, once it has the fill
+            if not self.account.wait_for_order(order_status['order_id'], timeout=self.ACCOUNT_WAIT):
+                self.logger.warning(
+                    f"Order {order_status['order_id']} fill not on the account stream after"
+                    f" {self.ACCOUNT_WAIT}s, accounting may use pre-trade balances")
+        try:
+            trade_status = self.exchange.order_status(
+                symbol=symbol, order_id=order_status['order_id'], asset_type=self.cfg['asset_type'])
+        except ExchangeUnavailable as ex:
+            self.logger.error(f"Order {order_status['order_id']} status unavailable, logging it without fill: {ex}")
+            trade_status = {
+                'symbol': symbol,
+                'side': 'BUY' if position_action in ('long_open', 'short_close') else 'SELL',
+                'quantity': None,
+                'price': None,
+                'order_id': order_status['order_id'],
+                'status': 'UNKNOWN',
+                'fee': None,
+                'fee_asset': None,
+                'timestamp': int(time.time()*1000),
+            }
+        order_status.update(trade_status)
         netliq_before = self._get_netliq(bals=bals_before)
         bals_after = self.exchange.get_balances(asset_type=self.cfg['asset_type'])
         netliq_after = self._get_netliq(bals=bals_after)
@@ -678,7 +1006,7 @@ class LiveWillRBband(WillRBband):
         ts_trade = f'{ts_trade[:10]}.{ts_trade[10:]}'
         row = (
             float(ts_trade),
-            self.data[0].index[-1],
+            candle_ts,
             trade_status['symbol'],
             trade_status['side'],
             position_action,
@@ -701,7 +1029,7 @@ class LiveWillRBband(WillRBband):
             '',
             pnl)
 
-        trades_logfile = 'logs/live_trades.csv'
+        trades_logfile = f'{self.logs_dir}/live_trades.csv'
         with open(trades_logfile, 'a', newline='') as f:
             writer = csv.writer(f)
             writer.writerow(row)
@@ -713,13 +1041,13 @@ class LiveWillRBband(WillRBband):
             row[3],
             row[4],
             float(row[5]),
-            float(row[6]),
-            float(row[7]),
+            float(row[6]) if row[6] is not None else None,
+            float(row[7]) if row[7] is not None else None,
             float(row[8]),
             float(row[9]),
             row[10],
             row[11],
-            float(row[12]),
+            float(row[12]) if row[12] is not None else None,
             row[13],
             row[14],
             row[15],
@@ -738,32 +1066,35 @@ class LiveWillRBband(WillRBband):
         prec = self.exchange._symbol_info[self.cfg['asset_type']][symbol]['lot_prec'].split('.')
         if len(prec) == 1: # Precision > 0, smaller token priced < $1
             round_to = 4
-        if position_action.endswith('close'):
+        if position_action.endswith('close') and prev_order_status.get('price') is not None:
             fees = 2*self.exchange.trade_fees[self.cfg['asset_type']][symbol]['taker']
             op = operator.add if position_action.startswith('long') else operator.sub
-            hurdle = round(op(1, fees)*self.last_order[0]['price'], round_to)
+            hurdle = round(op(1, fees)*prev_order_status['price'], round_to)
             hurdle_str = f' h: {hurdle},'
         else:
             hurdle_str = ''
+        price_str = round(trade_status['price'], round_to) if trade_status['price'] is not None else '?'
         SNS_call(msg=(
             f"{ts_trade[:10]}: {self.cfg['symbol'][0]},"
-            f" p: {round(trade_status['price'], round_to)}, {hurdle_str}"
-            f" sz: {round(float(trade_status['quantity']), 5)}, {position_action},"
+            f" p: {price_str}, {hurdle_str}"
+            f" sz: {round(float(trade_status['quantity'] or size), 5)}, {position_action},"
             f" pnl: {round(pnl, 2)},"
             f" nl: {round(float(netliq_after), 2)}"))
 
-    def _live_trade_size(self, params):
+    def _live_trade_size(self, params, bals=None, index_price=None):
         """
 
         For live trading, calc max trade size allowed based on balance
         ..from API and current order book
 
         params: (time, <Long|Short>, <Open|Close>, close_price, side, ob_snapshot)
+        bals, index_price: prefetched by _pre_trade_data(), else fetched here
 
         """
-        bals = self.exchange.get_balances(asset_type=self.cfg['asset_type'])
+        if bals is None:
+            bals = self.exchange.get_balances(asset_type=self.cfg['asset_type'])
         symbol = self.cfg['symbol'][0] + self.cfg['symbol'][1]
-        book = self.exchange.get_book(symbol=symbol, asset_type=self.cfg['asset_type'])
+        book = params[5]
         prec = self.exchange._symbol_info[self.cfg['asset_type']][symbol]['lot_prec'].split('.')
         if len(prec) == 2: # Precision < 0, token price > $1
             sig_digs = len(prec[1])
@@ -810,7 +1141,8 @@ class LiveWillRBband(WillRBband):
                 if self.cfg['max_trade_size'] > 0:
                     size = self.cfg['max_trade_size']*(1 - 2*fee)
                 elif self.cfg['futures_margin_type'] == 'USDT':
-                    index_price = self.exchange.futures_get_index_price(symbol=symbol)
+                    if index_price is None:
+                        index_price = self.exchange.futures_get_index_price(symbol=symbol)
                     size = bals['USDT']*(1 - 2*fee)/float(index_price)
                 elif self.cfg['futures_margin_type'] == 'token':
                     raise NotImplementedError
@@ -859,7 +1191,8 @@ class LiveWillRBband(WillRBband):
                 if self.cfg['max_trade_size'] > 0:
                     size = self.cfg['max_trade_size']*(1 - 2*fee)
                 elif self.cfg['futures_margin_type'] == 'USDT':
-                    index_price = self.exchange.futures_get_index_price(symbol=symbol)
+                    if index_price is None:
+                        index_price = self.exchange.futures_get_index_price(symbol=symbol)
                     size = bals['USDT']*(1 - 2*fee)/float(index_price)
                 elif self.cfg['futures_margin_type'] == 'token':
                     raise NotImplementedError
@@ -958,20 +1291,58 @@ class LiveWillRBband(WillRBband):
                     bals_chk = True
         return slpg_chk, bals_chk
 
+    def _pre_trade_data(self, params):
+        """
+        Fetch what sizing the order needs, concurrently: order book snapshot,
+            balances and, for USDT margined futures opens without a
+            max_trade_size, the index price. The leverage is set alongside,
+            only when it changed
+
+        params: (time, <Long|Short>, <Open|Close>, close_price, side)
+
+        Returns
+        ---------
+        (dict, dict, str): ob_snapshot, bals, index_price (None if not needed)
+
+        """
+        symbol = self.cfg['symbol'][0] + self.cfg['symbol'][1]
+        asset_type = self.cfg['asset_type']
+        pool = self._pre_trade_pool
+        book = pool.submit(self.exchange.get_book, symbol=symbol, depth=10, asset_type=asset_type)
+        bals = pool.submit(self.exchange.get_balances, asset_type=asset_type)
+        index_price = None
+        leverage = None
+        if asset_type == 'futures':
+            if (params[2] == 'Open' and not self.cfg['max_trade_size'] > 0
+                    and self.cfg['futures_margin_type'] == 'USDT'):
+                index_price = pool.submit(self.exchange.futures_get_index_price, symbol=symbol)
+            if self._leverage_set != self.cfg['margin_level']:
+                leverage = pool.submit(
+                    self.exchange.futures_change_initial_leverage, symbol, self.cfg['margin_level'])
+        if leverage is not None:
+            leverage.result()
+            self._leverage_set = self.cfg['margin_level']
+        return book.result(), bals.result(), None if index_price is None else index_price.result()
+
     def _place_live_order(self, params):
         """
+        Only the pre-trade fetches (concurrent) and the order are on the
+            critical path. Accounting and notifications go to the post_trade
+            queue, as does the order status, which fills self.last_order[0]
 
-        params: (time, <Long|Short>, <Open|Close>, close_price, side, ob_snapshot)
+        params: (time, <Long|Short>, <Open|Close>, close_price, side)
 
         """
-        size, bals = self._live_trade_size(params)
+        t = time.perf_counter()
+        ob_snapshot, bals, index_price = self._pre_trade_data(params)
+        params = params + (ob_snapshot,)
+        size, bals = self._live_trade_size(params, bals=bals, index_price=index_price)
         symbol = self.cfg['symbol'][0] + self.cfg['symbol'][1]
         self.logger.info(
             f'Placing order - symbol: {symbol}, side: {params[4]}, size: {size}')
         if self.cfg['asset_type'] == 'spot':
             order_id = self.exchange.place_order(symbol, params[4], size)
         elif self.cfg['asset_type'] == 'futures':
-            self.exchange.futures_change_initial_leverage(symbol, self.cfg['margin_level'])
             if params[2] == 'Open':
                 order_id = self.exchange.futures_place_order(symbol, params[4], size)
             elif params[2] == 'Close':
@@ -980,80 +1351,299 @@ class LiveWillRBband(WillRBband):
                 raise ValueError
         else:
             raise ApplicationStateError
+        self.logger.info(f'Order {order_id} acked {(time.perf_counter() - t)*1000:.0f}ms from signal')
         position_action = f'{params[1].lower()}_{params[2].lower()}'
-        accting_args = (order_id, bals, size, position_action, params[3], params[5])
-        self._live_accounting(*accting_args)
-        order_status = self.exchange.order_status(
-            symbol=symbol, order_id=order_id, asset_type=self.cfg['asset_type'])
+        order_status = {'order_id': order_id}
+        prev_order_status = self.last_order[0] if self.last_order else {}
         self.last_order = (order_status, bals, size, position_action)
+        self.post_trade.submit(
+            self._live_accounting, order_status, prev_order_status, self.data[0].index[-1],
+            bals, size, position_action, params[3], params[5])
+
+    def stop(self, timeout=None):
+        """
+        Finish the queued post-trade accounting
+        """
+        self.post_trade.stop(timeout)
+        self._pre_trade_pool.shutdown(wait=False)
+
+    def _init_streaming_indicators(self):
+        """
+        Fill the streaming indicator state from the prefetched candles, then
+            check it against the batch (btalib) columns from preprocess_data()
+
+        From there on each new candle only needs an O(1) update
+            (_update_streaming_indicators) instead of re-running preprocess_data()
+            over the whole frame. Falls back to preprocess_data() if the values
+            don't match
+        """
+        period_str = self.cfg['series'][1][1] # Period str in mins (e.g. '60m')
+        tag = f'{period_str}_float'
+        self._streams = {
+            'willr': StreamingWillR(period=14),
+            'willr_ema': StreamingEMA(period=43, skip=43),
+            'bbands': StreamingBBands(period=20, devs=self.bband_devs),
+        }
+        if self.cfg['floating_willr']:
+            num_intervals = int(self.cfg['series'][1][-1]/self.cfg['series'][0][-1])
+            self._streams['floating_willr'] = StreamingFloatingWillR(
+                num_intervals, willr_period=14, ema_period=43)
+        self._stream_60m = {} # 60m timestamp -> (willr_ema, willr_ema_prev)
+        self._stream_last = {}
+
+        consistent = True
+        for i, stream_row in ((1, self._stream_longer_row), (0, self._stream_row)):
+            df = self.data[i]
+            cols = ['high', 'low', 'close']
+            if i == 0 and self.cfg['floating_willr']:
+                cols += [f'high_{tag}', f'low_{tag}', f'close_{tag}']
+            streamed = [
+                stream_row(int(idx), *values)
+                for idx, *values in zip(df.index, *(exact_values(df, c).tolist() for c in cols))
+            ]
+            for col in streamed[-1]:
+                if not check_consistency([row[col] for row in streamed], df[col]):
+                    self.logger.critical(
+                        f'Streaming {col} inconsistent with batch calc, falling back to preprocess_data()')
+                    consistent = False
+        self._stream_last_60m_idx = int(self.data[1].index[-1])
+        self._stream_last_idx = int(self.data[0].index[-1])
+        self._prune_stream_60m()
+        self.streaming_indicators = consistent
+
+    def _prune_stream_60m(self):
+        # Only the latest completed longer candles are looked up from here on
+        min_idx = self._stream_last_idx - 2*self.cfg['series'][1][-1]
+        for idx in [idx for idx in self._stream_60m if idx < min_idx]:
+            del self._stream_60m[idx]
+
+    def _stream_longer_row(self, idx, high, low, close):
+        """
+        Indicators for a new longer (60m) candle
+
+        Returns
+        ---------
+        (dict): column -> value for the row at data[1]
+
+        """
+        willr = self._streams['willr'].update(high, low, close)
+        willr_ema = self._streams['willr_ema'].update(willr)
+        willr_ema_prev = self._stream_last.get('willr_ema_60m', np.nan)
+        self._stream_last['willr_ema_60m'] = willr_ema
+        self._stream_60m[idx] = (willr_ema, willr_ema_prev)
+        return {'willr': willr, 'willr_ema': willr_ema, 'willr_ema_prev': willr_ema_prev}
+
+    def _stream_row(self, idx, high, low, close, *floating_hlc):
+        """
+        Indicators for a new shorter (3m) candle, as preprocess_data() would
+            calc them for that row
+
+        Returns
+        ---------
+        (dict): column -> value for the row at data[0]
 
-    def _trim_df(self):
         """
-        Trim the dataframes to only the length needed to calc signals
+        _, bband_high, bband_low = self._streams['bbands'].update(close)
+        row = {
+            'bband_20_low': bband_low,
+            'bband_20_low_prev': self._stream_last.get('bband_20_low', np.nan),
+            'bband_20_high': bband_high,
+            'bband_20_high_prev': self._stream_last.get('bband_20_high', np.nan),
+            'close_prev': self._stream_last.get('close', np.nan),
+        }
+        self._stream_last.update(close=close, bband_20_low=bband_low, bband_20_high=bband_high)
 
+        # Previous completed longer candle, as in the upsampling in preprocess_data()
+        dt_60m = completed_candle_ts(idx, self.cfg['series'][1][-1])
+        row['willr_ema'], row['willr_ema_prev'] = self._stream_60m.get(dt_60m, (np.nan, np.nan))
+
+        if self.cfg['floating_willr']:
+            tag = f"{self.cfg['series'][1][1]}_float"
+            (row[f'willr_{tag}'],
+                row[f'willr_ema_{tag}'],
+                row[f'willr_ema_prev_{tag}']) = self._streams['floating_willr'].update(*floating_hlc)
+
+        values = dict(row, close=close)
+        for col_1, col_2, over in (
+                ('close', 'bband_20_low', True),
+                ('close', 'bband_20_high', True),
+                ('close', 'bband_20_high', False),
+                ('close', 'bband_20_low', False)):
+            col_name = f"cross{'over' if over else 'under'}:{col_1}-{col_2}"
+            row[col_name] = bool(detect_crosses(
+                values[col_1], values[f'{col_1}_prev'], values[col_2], values[f'{col_2}_prev'],
+                over=over, mode=self.cross_mode))
+        return row
+
+    def _update_streaming_indicators(self):
         """
-        lookback = max(
+        Calc indicators for candles added since the last update, and write them
+            to the new rows of data[1]/data[0]
+        """
+        tag = f"{self.cfg['series'][1][1]}_float"
+        df = self.data[1]
+        for idx in df.index[df.index > self._stream_last_60m_idx]:
+            row = self._stream_longer_row(
+                int(idx), *(exact_at(df, idx, c) for c in ('high', 'low', 'close')))
+            self._set_row(1, idx, row)
+            self._stream_last_60m_idx = int(idx)
+
+        df = self.data[0]
+        cols = ['high', 'low', 'close']
+        if self.cfg['floating_willr']:
+            cols += [f'high_{tag}', f'low_{tag}', f'close_{tag}']
+        for idx in df.index[df.index > self._stream_last_idx]:
+            row = self._stream_row(int(idx), *(exact_at(df, idx, c) for c in cols))
+            self._set_row(0, idx, row)
+            self._stream_last_idx = int(idx)
+        self._prune_stream_60m()
+
+    def _buffer_capacity(self, i):
+        """
+        Candles of series i kept live: BUFFER_LOOKBACKS times the lookback
+            needed to calc signals (MAX_PERIODS), plus one longer candle to
+            align the window on
+        """
+        lookback = self.BUFFER_LOOKBACKS*max(
             self.MAX_PERIODS[0]*self.cfg['series'][0][-1],
             self.MAX_PERIODS[1]*self.cfg['series'][1][-1])
-        start_index = self.data[0].index[-1] - lookback
-        while True:
-            # Push back start_index to align on longer candle period
-            if start_index % self.cfg['series'][1][-1] == 0:
-                break
-            start_index -= self.cfg['series'][0][-1]
-        self.data[0] = self.data[0].loc[start_index:]
-        #self.data[1] = self.data[1].loc[start_index:]
+        return int((lookback + self.cfg['series'][1][-1])//self.cfg['series'][i][-1])
 
-    def run(self):
+    def _buffer_frame(self, i):
+        # Window of the shorter series starts on a longer candle, for the upsampling/floating calcs
+        start = None
+        if i == 0:
+            period = self.cfg['series'][1][-1]
+            start = -(-int(self._buffers[0].index[0])//period)*period
+        return self._buffers[i].frame(start=start)
+
+    def _init_buffers(self):
+        """
+        Move the prefetched (and preprocessed) data to ring buffers. From here
+            on self.data are views over their windows
+        """
+        if not self.ring_buffer:
+            return
+        self._buffers = [
+            CandleRingBuffer.from_frame(df, self._buffer_capacity(i)) for i, df in enumerate(self.data)]
+        for i in range(len(self.data)):
+            self.data[i] = self._buffer_frame(i)
+
+    def _update_buffers(self):
+        # Keep the cols a full preprocess_data() replaced on the views
+        if self._buffers is not None:
+            for i, df in enumerate(self.data):
+                self._buffers[i].update(df)
+                self.data[i] = self._buffer_frame(i)
+
+    def _next_candle_secs(self):
+        return int(
+            self.cfg['series'][0][2] - (
+                dt.datetime.utcnow().timestamp() % self.cfg['series'][0][2]))
+
+    def start_live(self):
+        """
+        Calc indicators on the prefetched data and subscribe to new candles,
+            before step() is called
+        """
+        self._expand_data()
         if self.cfg['floating_willr']:
             self._create_floating_ohlc()
         self.preprocess_data()
+        if self.streaming_indicators:
+            self._init_streaming_indicators()
+        self._compact_data()
+        self._init_buffers()
         #
         write_mode = 'a'
-        if not os.path.isfile('logs/live_candles.csv'):
+        if not os.path.isfile(f'{self.logs_dir}/live_candles.csv'):
             write_mode = 'w'
-        with open(f'logs/live_candles.csv', write_mode) as f:
+        with open(f'{self.logs_dir}/live_candles.csv', write_mode) as f:
             writer = csv.writer(f)
             row = ['time'] + list(self.data[0])
             if write_mode == 'w':
                 writer.writerow(row)
             writer.writerow(['' for _ in row])
 
-        next_candle_secs = lambda: int(
-            self.cfg['series'][0][2] - (
-                dt.datetime.utcnow().timestamp() % self.cfg['series'][0][2]))
-
         if self.debug:
-            self.data[0].to_csv(f'logs/debug/live_table.csv')
+            self.data[0].to_csv(f'{self.logs_dir}/debug/live_table.csv')
+
+        self._start_kline_stream()
+        if self.local_order_book:
+            self.order_book = self.exchange.order_book(
+                self.cfg['symbol'][0] + self.cfg['symbol'][1], asset_type=self.cfg['asset_type'])
+        self._get_candle = self._get_latest_candle if self.kline_stream is None else self._get_streamed_candle
+
+    def step(self):
+        """
+        Add the next closed candle(s), from the stream or polling the API, and
+            act on the new row
 
-        while True:
-            # Periodically update candles from API
-            if self._get_latest_candle(0): # Adds 3m candles
+        Returns
+        ---------
+        (bool): True if a new candle was processed
+
+        """
+        try:
+            if not self._get_candle(0): # Adds 3m candles
+                return False
+        except ExchangeUnavailable as ex:
+            # Try again next step, the exchange's circuit holds calls off meanwhile
+            self.logger.warning(f"{self.cfg['series'][0][1]} candle fetch failed: {ex}")
+            return False
+        now = dt.datetime.utcnow().timestamp()
+        self.logger.info(f"{now}: {self.cfg['series'][0][1]} candle fetched")
+        try:
+            if self._get_candle(1): # Adds 60m candles, hourly
                 now = dt.datetime.utcnow().timestamp()
-                self.logger.info(f"{now}: {self.cfg['series'][0][1]} candle fetched")
-                if self._get_latest_candle(1): # Adds 60m candles, hourly
-                    now = dt.datetime.utcnow().timestamp()
-                    self.logger.info(f"{now}: {self.cfg['series'][1][1]} candle fetched")
-
-                if self.trim_df:
-                    self._trim_df()
-                if self.cfg['floating_willr']:
-                    self._create_floating_ohlc()
-                self.preprocess_data()
-                row = self.data[0].iloc[-1]
-                idx = self.data[0].index[-1]
-                row = row.append(pd.Series([idx], index=['datetime']))
-                with open(f'logs/live_candles.csv', 'a') as f:
-                    writer = csv.writer(f)
-                    writer.writerow([row[-1]] + list(row[:-1]))
-                self.logger.info(f'{dt.datetime.utcnow().timestamp()}:New row:\n{row}')
-                self._on_new_candle(row)
-                self.logger.info(f"Next candle in {next_candle_secs()}s")
-                if self.debug:
-                    self.data[0].to_csv(f'logs/debug/live_table.csv')
-            else:
-                time.sleep(1)
-                if int(str(int(dt.datetime.utcnow().timestamp()))[-1]) % 9 == 0:
-                    now = dt.datetime.utcnow().timestamp()
-                    remaining = self.cfg['series'][0][2] - now % self.cfg['series'][0][2]
-                    self.logger.debug(f"Next candle in {next_candle_secs()}s")
+                self.logger.info(f"{now}: {self.cfg['series'][1][1]} candle fetched")
+        except ExchangeUnavailable as ex:
+            # Go on with the last 60m candle until a later one comes in (its gap is then filled)
+            self.logger.warning(f"{self.cfg['series'][1][1]} candle fetch failed: {ex}")
+
+        if self.cfg['floating_willr']:
+            self._update_floating_ohlc()
+        if self.streaming_indicators:
+            self._update_streaming_indicators()
+        else:
+            self._expand_data()
+            self.preprocess_data()
+            self._compact_data()
+            self._update_buffers()
+        row = self.data[0].iloc[-1]
+        idx = self.data[0].index[-1]
+        row = row.append(pd.Series([idx], index=['datetime']))
+        with open(f'{self.logs_dir}/live_candles.csv', 'a') as f:
+            writer = csv.writer(f)
+            writer.writerow([row[-1]] + list(row[:-1]))
+        self.logger.info(f'{dt.datetime.utcnow().timestamp()}:New row:\n{row}')
+        state = {attr: getattr(self, attr) for attr in self.TRADE_STATE if hasattr(self, attr)}
+        try:
+            self._on_new_candle(row)
+        except ExchangeUnavailable:
+            # Nothing was sent (orders aren't retried, only the pre-trade fetches). Undo
+            # what the signal check set for the trade, so it's checked again next candle
+            for attr in self.TRADE_STATE:
+                if attr in state:
+                    setattr(self, attr, state[attr])
+                elif hasattr(self, attr):
+                    delattr(self, attr)
+            self.logger.exception(f'Trade not placed, exchange unavailable. Call stats: {self.exchange.call_stats()}')
+        self.logger.info(f"Next candle in {self._next_candle_secs()}s")
+        if self.debug:
+            self.data[0].to_csv(f'{self.logs_dir}/debug/live_table.csv')
+        return True
+
+    def run(self):
+        self.start_live()
+        try:
+            while True:
+                if not self.step():
+                    if self.kline_stream is None:
+                        time.sleep(1)
+                    else:
+                        self.kline_stream.wait(timeout=1)
+                    if int(str(int(dt.datetime.utcnow().timestamp()))[-1]) % 9 == 0:
+                        self.logger.debug(f"Next candle in {self._next_candle_secs()}s")
+        finally:
+            self.stop()
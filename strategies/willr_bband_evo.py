@@ -22,6 +22,9 @@ class ApplicationStateError(Exception):
 class WillRBbandEvo(WillRBband):
 
     MAX_PERIODS = (20, 14 + 43) # Corresponding to (3m, 60m) data series
+    bband_devs = 2.2
+    batch_executions = dict(
+        WillRBband.batch_executions, _execute_trade_all_params_willemastop=True)
 
     def preprocess_data(self):
         self.cross_buy_open_col = f"crossover:{self.col_tags['long_entry_cross'][0]}-{self.col_tags['long_entry_cross'][1]}"
@@ -37,22 +40,15 @@ class WillRBbandEvo(WillRBband):
 
         # ..load 3m data
         i = 0
-        self.data[i]['bband_20_low'] = btalib.bbands(self.data[i]['close'], period = 20, devs = 2.2).bot
+        self.data[i]['bband_20_low'] = btalib.bbands(self.data[i]['close'], period = 20, devs = self.bband_devs).bot
         self.data[i]['bband_20_low_prev'] = self.data[i]['bband_20_low'].shift(1)
-        self.data[i]['bband_20_high'] = btalib.bbands(self.data[i]['close'], period = 20, devs = 2.2).top
+        self.data[i]['bband_20_high'] = btalib.bbands(self.data[i]['close'], period = 20, devs = self.bband_devs).top
         self.data[i]['bband_20_high_prev'] = self.data[i]['bband_20_high'].shift(1)
         self.data[i]['close_prev'] = self.data[i]['close'].shift(1)
         self.data[i]['bband_20_mid'] = (self.data[i]['bband_20_low'] + self.data[i]['bband_20_high'])/2
 
         # Upsample longer interval series to dataframe at index=0
-        modulo = int(self.cfg['series'][1][-1])
-        for _i, row in self.data[0].iterrows():
-            dt_60m = int(_i - _i % modulo) - modulo
-            if not dt_60m >= self.data[1].index[0]:
-                # Skip first 60m row
-                continue
-            self.data[0].at[_i, 'willr_ema'] = self.data[1].at[dt_60m, 'willr_ema']
-            self.data[0].at[_i, 'willr_ema_prev'] = self.data[1].at[dt_60m, 'willr_ema_prev']
+        self._upsample_series()
 
         if self.cfg['floating_willr']:
             self._create_floating_willr()
@@ -194,4 +190,8 @@ class WillRBbandEvo(WillRBband):
 
 
 class LiveWillRBbandEvo(LiveWillRBband, WillRBbandEvo):
-    pass
+
+    def _stream_row(self, *args):
+        row = super()._stream_row(*args)
+        row['bband_20_mid'] = (row['bband_20_low'] + row['bband_20_high'])/2
+        return row
@@ -12,7 +12,10 @@ from datetime import datetime
 from decimal import Decimal
 import math
 import os
+import sys
 import csv
+from utils.results import ResultsStore
+from utils.performance import RunTrades, trade_table, run_stats
 
 #importing data
 # df = pd.read_csv('backtesting_trades.csv',sep='\s*,\s*', engine = 'python')
@@ -20,8 +23,22 @@ import csv
 # # dfcandles = pd.read_csv('allcandles.csv',sep='\s*,\s*', engine = 'python')
 # df_pp = pd.read_csv('post_process.csv',sep='\s*,\s*', engine = 'python')
 
-df = pd.read_csv('logs/backtesting_trades.csv',sep='\s*,\s*', engine = 'python')
-df1 = pd.read_csv('logs/latest_bt_df.csv',sep='\s*,\s*', engine = 'python')
+#run to report: a run id (or 'latest') from the results store (backtester.py --store-results),
+#else the last run appended to logs/backtesting_trades.csv
+run_id = sys.argv[1] if len(sys.argv) > 1 else None
+if run_id:
+    store = ResultsStore()
+    if run_id == 'latest':
+        run_id = store.latest()
+    run = store.runs(run_id=run_id).iloc[0]
+    #same layout as the csv: a startup row with the symbol, then the trades
+    df = store.trades(run_id)
+    df.insert(1, 'symbol', None)
+    df = pd.concat([pd.DataFrame([{'time_candle': run['created'], 'symbol': run['symbol']}]), df], ignore_index=True)
+else:
+    run = None
+    df = pd.read_csv('logs/backtesting_trades.csv', skipinitialspace=True)
+df1 = pd.read_csv('logs/latest_bt_df.csv', skipinitialspace=True)
 # dfcandles = pd.read_csv('allcandles.csv',sep='\s*,\s*', engine = 'python')
 # df_pp = pd.read_csv('logs/post_process.csv',sep='\s*,\s*', engine = 'python')
 
@@ -53,9 +70,7 @@ df.index =range(len(df))
 
 
 symbolname = df.loc[0,'symbol']
-openlongs = 0
-openshorts = 0
-asset = 'futures'
+asset = run['asset_type'] if run is not None else 'futures'
 # asset = input('asset type?')
 if asset == 'spot':
     fee = .00075
@@ -81,134 +96,34 @@ backtestrandate = datetime.utcfromtimestamp(backtestran).strftime('%Y-%m-%d %H:%
 starting_bal = 10000
 #fee = .00075
 
-#created all new columns with initial value 0
-df['usdbal'] = starting_bal
-df['tradesize']=0
-df['tokenbal'] = 0
-df['fees'] = 0
-df['pnl'] = 0
-df['hold'] = 0
-df['roi per trade'] = 0
-#df['change in willr'] = 0 willrremove
-
-#temporary list to store data of calculation
-usdbal_list = [starting_bal]
-tradesize_list = [0]
-tokenbal_list = [0]
-fees_list = [0]
-pnl_list = [0]
-hold_list = [0]
-#hold list for wins and losses
-win_hold_list= []
-loss_hold_list =[]
-roipertrade_list = [0]
-wins = 0
-losses = 0
-win_list = [0]
-loss_list = [0]
-#change_willr_list = [0] willrremove
-
-#looping through the data
-for i in range(1, len(df)):
-    timeclose = df.loc[i,'time_candle']
-    position = df.loc[i,'position']
-    action = df.loc[i,'action']
-    price = df.loc[i,'price']
-
-    #willr = df.loc[i, 'willr'] willremove
-    #willr_prev = df.loc[i-1, 'willr']
-    #change_will_i = 0
-
-    timeopen = df.loc[i-1,'time_candle']
-    prev_action = df.loc[i-1,'action']
-    prev_price = df.loc[i-1,'price']
-    prev_usdbal = usdbal_list[i-1]
-    prev_tradesize = tradesize_list[i-1]
-    prev_tokenbal = tokenbal_list[i-1]
-    hold = None
-    starttradebal = usdbal_list[i-2]
-
-
-#calc tradesize
-    if action == 'Open':
-        if position == 'Long':
-            tradesize_i = prev_usdbal/price
-            openlongs = openlongs + 1
-        else:
-            tradesize_i = - prev_usdbal/price
-            openshorts = openshorts + 1
-    else:
-        tradesize_i = -prev_tradesize
-        hold = timeclose  - timeopen
-
-
-    tradesize_list.append(tradesize_i)
-    hold_list.append(hold)
-
-#calc pos
-    tokenbal_i = prev_tokenbal + tradesize_i
-    tokenbal_list.append(tokenbal_i)
-
-#calc fee
-    nominal_value = abs(tradesize_i*price)
-    fees_i = fee*nominal_value
-    fees_list.append(fees_i)
-
-#calc pnl and willr change
-    if action == 'Close':
-        
-        # if position == 'Long': willrremove
-        #     change_will_i = willr - willr_prev
-        # else:
-        #     change_will_i = willr_prev - willr
-
-
-        pnl_i = -tradesize_i*(price - prev_price)
-        roipertrade_i = pnl_i/starttradebal
-        roipertrade_i = round(roipertrade_i,4)
-        if roipertrade_i >0:
-            wins = wins + 1
-            win_list.append(roipertrade_i)
-        else:
-            losses = losses + 1
-            loss_list.append(roipertrade_i)
-    else:
-        pnl_i = 0
-        roipertrade_i = None
-    pnl_list.append(pnl_i)
-    roipertrade_list.append(roipertrade_i)
-
-    #change_willr_list.append(change_will_i) willrremove
-
-#calc usdbal
-    usdbal_i = prev_usdbal - fees_i + pnl_i
-    usdbal_list.append(usdbal_i)
-
-#Assign list to actual columns
-df['usdbal'] = usdbal_list
-df['tradesize'] = tradesize_list
-df['tokenbal'] = tokenbal_list
-df['fees'] = fees_list
-df['pnl'] = pnl_list
-df['hold'] = hold_list
-df['roi per trade'] = roipertrade_list
-#df['change in willr'] = change_willr_list willrremove
+#balances, fees, pnl, hold and roi per trade, computed in utils.performance
+#row 0 is the backtest startup row, trades follow
+trades = RunTrades(
+    df['time_candle'].iloc[1:].to_numpy(),
+    np.where(df['position'].iloc[1:] == 'Long', 1, -1),
+    (df['action'].iloc[1:] == 'Open').to_numpy(),
+    df['price'].iloc[1:].to_numpy(),
+    np.zeros(len(df) - 1, dtype=int))
+table = trade_table(trades, fee, start_bal=starting_bal)
+stats = run_stats(trades, fee, start_bal=starting_bal).iloc[0]
+
+df['usdbal'] = np.r_[starting_bal, table['usdbal']]
+df['tradesize'] = np.r_[0, table['tradesize']]
+df['tokenbal'] = np.r_[0, table['tokenbal']]
+df['fees'] = np.r_[0, table['fees']]
+df['pnl'] = np.r_[0, table['pnl']]
+df['hold'] = np.r_[0, table['hold']]
+df['roi per trade'] = np.r_[0, table['roi'].round(4)]
+openlongs = int(stats['opens_long'])
+openshorts = int(stats['opens_short'])
+wins = int(stats['wins'])
+losses = int(stats['losses'])
 
 
 
 #check corr between hold and roiper
 #df_new = df[['hold', 'roi per trade','change in willr']].copy() willrremove
 df_new = df[['hold', 'roi per trade']].copy()
-#calc avg hold stats for wins and losses
-for i in range(1, len(df_new)):
-    hold = df_new.loc[i,'hold']
-    roi = df_new.loc[i,'roi per trade']
-    if roi > 0:
-        win_hold_list.append(hold)
-    else:
-        loss_hold_list.append(hold)
-
-
 df_new = df_new.dropna(subset=['hold'])
 df_new.index =range(len(df_new))
 corr_holdroi = round(df_new['hold'].corr(df_new['roi per trade']),2)
@@ -276,65 +191,16 @@ roi_perc = round(roi_perc,3)
 roi = str(round(roi,3))
 
 
-#get daily balances/rois/sharpe
-df_daily = df[['time_candle', 'usdbal']].copy()
-day1 = df_daily['time_candle'][1]
-day1bal = df_daily['usdbal'][1]
-days_list = [day1]
-EODbal_list = [day1bal]
-dailychg_list =[0]
-
-# print (day1)
-nextday = day1 + 86400
-# print (nextday)
-for i in range(1, len(df_daily)):
-    timecandle_i = df_daily.loc[i,'time_candle']
-    usdbal_i = df_daily.loc[i,'usdbal']
-    #if row past the next day, get prev row's data
-    if timecandle_i > nextday:
-        day = df_daily.loc[i-1,'time_candle']
-        EOD_bal = df_daily.loc[i-1,'usdbal']
-        nextday = nextday + 86400
-        days_list.append(day)
-        EODbal_list.append(EOD_bal)
-
-data = {'EOD time_candle': days_list,
-        'EOD bal': EODbal_list}
-daily_returns = pd.DataFrame(data)
-
-#calc daily pnl
-for i in range(1, len(daily_returns)):
-    bal_i = daily_returns.loc[i, 'EOD bal']
-    prev_bal = daily_returns.loc[i-1, 'EOD bal']
-    pnl = (bal_i - prev_bal)/prev_bal
-    dailychg_list.append(pnl)
-daily_returns['daily chg'] = dailychg_list
-
-# daily_returns.to_csv('daily_returns.csv')
-
-
-
-#sharpe ann_ratio
-#min, max, avg daily return
-min_return = min(dailychg_list)
-max_return = max(dailychg_list)
-mean_return = sum(dailychg_list)/len(dailychg_list)
-#print ('min/max/avg of daily returns', '{0:.4f}'.format(min_return),'/', '{0:.4f}'.format(max_return),'/', '{0:.4f}'.format(mean_return))
-#sharpe_ann = (expreturn_ann - riskfreerate)/std _ann
-rf = 0
-mean_return_ann =  365*mean_return
-std_daily = daily_returns['daily chg'].std()
-std_ann = std_daily*math.sqrt(365)
-sharpe_ann = (mean_return_ann - rf)/std_ann
+#daily sharpe and win/loss stats
+sharpe_ann = stats['sharpe']
 total_scalps = wins + losses
-#std_ann = dailystd*sqrt(365)
 
-minwin = round(min(win_list),4)
-maxwin = round(max(win_list),4)
-avgwin = round(sum(win_list)/len(win_list),4)
-MAXloss = round(min(loss_list),4)
-MINloss = round(max(loss_list),4)
-avgloss = round(sum(loss_list)/len(loss_list),4)
+minwin = round(stats['win_min'],4)
+maxwin = round(stats['win_max'],4)
+avgwin = round(stats['win_avg'],4)
+MAXloss = round(stats['loss_max'],4)
+MINloss = round(stats['loss_min'],4)
+avgloss = round(stats['loss_avg'],4)
 
 print('')
 
@@ -355,6 +221,10 @@ print('{0:.1f}'.format(roi_perc), '% / ',
        price_chg, '%/',
        candlevol
        )
+print('max drawdown/exposure/turnover')
+print('{0:.1f}'.format(100*stats['max_drawdown']), '% / ',
+      '{0:.2f}'.format(stats['exposure']), ' / ',
+      '{0:.1f}'.format(stats['turnover']))
 
 #print to csv
 
@@ -0,0 +1,176 @@
+import threading
+import logging
+
+
+class AccountState:
+    """
+    Snapshot of one account (spot or futures): balances, positions and the
+        realized P&L of recent orders
+
+    Loaded from REST once (load()), then kept current from user data stream
+        events (apply_event()). Reads are dict lookups under a lock, so the
+        strategy gets a consistent view while the stream thread writes
+
+    Only what the stream keeps current is held: positions are amounts and
+        entry prices (POSITION_FIELDS). Unrealized P&L, and so the margin
+        balance, move with the mark price without an event, they stay on REST
+
+    Arguments
+    ---------
+    asset_type (str): 'spot' or 'futures'
+
+    """
+
+    MAX_ORDERS = 100 # Orders whose fills are kept, for wait_for_order() and order_pnl()
+    POSITION_FIELDS = ('symbol', 'positionAmt', 'entryPrice', 'positionSide')
+
+    def __init__(self, asset_type='spot'):
+        self.asset_type = asset_type
+        self.logger = logging.getLogger(__name__)
+        self.stream = None # Source of events (UserDataStream, or LocalAccountStream)
+        self.loaded = False
+        self.updated = None # Event time (ms) of the last update
+        self._balances = {} # asset -> float (spot: free, futures: wallet balance)
+        self._positions = {} # symbol -> REST style position dict, POSITION_FIELDS only (futures)
+        self._orders = {} # order_id -> {'symbol', 'status', 'realized', 'since'}
+        self._last_order = {} # symbol -> order_id
+        self._account_time = 0 # Event time (ms) of the last balance/position update
+        self._cond = threading.Condition()
+
+    @property
+    def ready(self):
+        """
+        Loaded, and its stream connected (else reads may be stale)
+        """
+        return self.loaded and self.stream is not None and self.stream.connected.is_set()
+
+    def load(self, balances, positions=None):
+        """
+        Replace the state with a REST snapshot
+
+        Arguments
+        ---------
+        balances (dict):    asset -> balance
+        positions (list):   futures positions, as from futures_get_positions()
+
+        """
+        with self._cond:
+            self._balances = {asset: float(bal) for asset, bal in balances.items()}
+            self._positions = {
+                p['symbol']: {f: p[f] for f in self.POSITION_FIELDS if f in p}
+                for p in positions or []
+            }
+            self.loaded = True
+            self._cond.notify_all()
+
+    def apply_event(self, event):
+        """
+        Update from a user data stream event (Binance spot
+            outboundAccountPosition/executionReport, futures
+            ACCOUNT_UPDATE/ORDER_TRADE_UPDATE)
+        """
+        kind = event.get('e')
+        with self._cond:
+            if kind == 'outboundAccountPosition':
+                for bal in event['B']:
+                    self._balances[bal['a']] = float(bal['f'])
+                self._account_time = event['E']
+            elif kind == 'ACCOUNT_UPDATE':
+                for bal in event['a'].get('B', []):
+                    self._balances[bal['a']] = float(bal['wb'])
+                for pos in event['a'].get('P', []):
+                    position = self._positions.setdefault(pos['s'], {'symbol': pos['s']})
+                    position.update({
+                        'positionAmt': pos['pa'],
+                        'entryPrice': pos['ep'],
+                        'positionSide': pos.get('ps', 'BOTH'),
+                    })
+                self._account_time = event['E']
+            elif kind in ('ORDER_TRADE_UPDATE', 'executionReport'):
+                # Futures nest the order under 'o'; in a spot executionReport 'o' is the order type
+                order = event['o'] if kind == 'ORDER_TRADE_UPDATE' else event
+                order_id = order['i']
+                entry = self._orders.setdefault(
+                    order_id, {'symbol': order['s'], 'status': None, 'realized': 0., 'since': event['E']})
+                entry['status'] = order['X']
+                entry['realized'] += float(order.get('rp', 0))
+                self._last_order[order['s']] = order_id
+                while len(self._orders) > self.MAX_ORDERS:
+                    del self._orders[next(iter(self._orders))]
+            else:
+                return
+            self.updated = event['E']
+            self._cond.notify_all()
+
+    def wait_for_order(self, order_id, timeout=5):
+        """
+        Block until order_id is filled and an account update has come in
+            since its first event (Binance may send it before or after the fill)
+
+        Returns
+        ---------
+        (bool): False on timeout
+
+        """
+        def done():
+            order = self._orders.get(order_id)
+            return (
+                order is not None and order['status'] == 'FILLED'
+                and self._account_time >= order['since'])
+        with self._cond:
+            return self._cond.wait_for(done, timeout)
+
+    def balances(self):
+        with self._cond:
+            return dict(self._balances)
+
+    def balance(self, asset):
+        with self._cond:
+            return self._balances.get(asset, 0.)
+
+    def positions(self):
+        with self._cond:
+            return [dict(p) for p in self._positions.values()]
+
+    def position(self, symbol):
+        with self._cond:
+            position = self._positions.get(symbol)
+            return dict(position) if position is not None else None
+
+    def order_pnl(self, symbol, order_id=None):
+        """
+        Realized P&L of order_id (or the symbol's last order), None if its
+            fills were not seen on the stream
+        """
+        with self._cond:
+            if order_id is None:
+                order_id = self._last_order.get(symbol)
+            order = self._orders.get(order_id)
+            return None if order is None else order['realized']
+
+
+class LocalAccountStream:
+    """
+    Stand-in for a user data stream: events are pushed in by hand (e.g. from
+        a paper trading exchange or a test) instead of a websocket
+
+    Arguments
+    ---------
+    state (AccountState)
+
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.state.stream = self
+        self.connected = threading.Event()
+
+    def start(self):
+        self.connected.set()
+        return self
+
+    def stop(self):
+        self.connected.clear()
+
+    def push(self, event):
+        self.state.apply_event(event)
@@ -1,3 +1,64 @@
+import numpy as np
+
+
+BOOK_DEPTHS = (100, 500, 1000, 5000) # Binance-specific
+VOL_TOL = 0.00001 # Book vol this close to the target counts as enough
+
+
+def parse_levels(levels):
+    """
+    Book side ([[price, qty], ...], str or float, best first) as float arrays
+
+    Returns
+    ---------
+    (np.array, np.array): prices, qtys
+
+    """
+    levels = np.asarray(levels, dtype=float).reshape(-1, 2)
+    return levels[:, 0], levels[:, 1]
+
+
+def walk_book(prices, qtys, sizes, vol_tol=VOL_TOL):
+    """
+    Fill market orders of each size against one side of the book, in one
+        pass: the cumulative vol of the levels is searched for every size
+
+    Arguments
+    ---------
+    prices (np.array):  level prices, best first
+    qtys (np.array):    level qtys
+    sizes (np.array):   target sizes (base token), or a single size
+
+    Returns
+    ---------
+    (tuple) of arrays, one value per size:
+        filled (bool):      book has the size (within vol_tol)
+        vol (float):        vol taken, the size or the whole book if not filled
+        avg_price (float):  avg fill price, per size (NaN if not filled)
+        slip_pct (float):   avg_price vs top of book (%)
+        num_levels (int):   levels walked
+
+    """
+    sizes = np.atleast_1d(np.asarray(sizes, dtype=float))
+    if not len(prices):
+        nan = np.full(len(sizes), np.nan)
+        return np.zeros(len(sizes), dtype=bool), np.zeros(len(sizes)), nan, nan, np.zeros(len(sizes), dtype=int)
+    accum = np.cumsum(qtys)
+    last = np.searchsorted(accum, sizes) # Level each size ends in
+    filled = (last < len(prices)) | (accum[-1] >= sizes - vol_tol)
+    last = np.minimum(last, len(prices) - 1)
+    # Notional only down to the deepest level walked
+    num_levels = int(last.max()) + 1
+    notional = np.cumsum(prices[:num_levels]*qtys[:num_levels])
+    prev_accum = np.where(last > 0, accum[last - 1], 0.)
+    prev_notional = np.where(last > 0, notional[last - 1], 0.)
+    part = np.clip(sizes - prev_accum, 0, qtys[last])
+    vol = np.where(filled, prev_accum + part, accum[-1])
+    avg_price = np.where(filled, (prev_notional + prices[last]*part)/sizes, np.nan)
+    slip_pct = np.abs(avg_price - prices[0])/prices[0]*100
+    return filled, vol, avg_price, slip_pct, last + 1
+
+
 def book_query(
         symbol,
         target_vol,
@@ -7,6 +68,9 @@ def book_query(
         client=None,
         return_book=False) -> tuple:
     """
+    Walk the book for a market order of target_vol, fetching deeper books
+        (BOOK_DEPTHS) until it is filled
+
     Return:
 
     (
@@ -19,37 +83,20 @@ def book_query(
 
     """
     _side = 'asks' if side == 'BUY' else 'bids'
-    book_levels = (100, 500, 1000, 5000) # Binance-specific
-    get_accum_vol = lambda a: sum([_[1] for _ in a])
-    diff = lambda a, b: True if abs(a-b) < 0.00001 else False
-    for book_level in book_levels:
-        #
+    for book_level in BOOK_DEPTHS:
         book = client.get_book(symbol=symbol, depth=book_level, asset_type=asset_type)
-        accum = []
-        pre_trim_vol = 0
-        for level in book[_side]:
-            accum.append((float(level[0]), float(level[1])))
-            if get_accum_vol(accum) >= target_vol:
-                trim = get_accum_vol(accum) - target_vol
-                pre_trim_vol = get_accum_vol(accum)
-                accum[-1] = (accum[-1][0], accum[-1][1] - trim)
-                break
-        if get_accum_vol(accum) >= target_vol or diff(get_accum_vol(accum), target_vol):
+        prices, qtys = parse_levels(book[_side])
+        filled, vol, avg_price, slip_pct, _ = walk_book(prices, qtys, target_vol)
+        if filled[0]:
             # Current book has sufficient vol
             break
-        elif book_level == book_levels[-1]:
+        elif book_level == BOOK_DEPTHS[-1] or len(prices) < book_level:
             # Not possible to get target_vol
-            return (False, get_accum_vol(accum), None, None)
-        else:
-            # Current level not sufficient. Call again the book at a deeper lev
-            pass
-    avg_price = sum([_[0]*_[1] for _ in accum])/target_vol
-    slip = abs(float(book[_side][0][0]) - avg_price)
-    slip_pct = (slip/float(book[_side][0][0]))*100
-    results = (get_accum_vol(accum), float(book[_side][0][0]), avg_price, slip_pct)
+            return (False, float(vol[0]), None, None)
+    results = (float(vol[0]), float(prices[0]), float(avg_price[0]), float(slip_pct[0]))
     if return_book:
         results = results + (book,)
-    if slip_pct < target_pct:
+    if slip_pct[0] < target_pct:
         return (True,) + results
     else:
         return (False,) + results
@@ -0,0 +1,166 @@
+import numpy as np
+from utils.performance import RunTrades
+
+
+class BatchTrades:
+    """
+    Trades of every param set in a batched simulation, kept as events (one
+        per candle and kind) over the param sets they apply to
+
+    Arguments
+    ---------
+    num_sets (int): number of param sets
+
+    """
+
+    def __init__(self, num_sets):
+        self.num_sets = num_sets
+        self._events = [] # (candle time, position, action, price, param set indices)
+
+    def add(self, time, position, action, price, mask):
+        idx = np.flatnonzero(mask)
+        if len(idx):
+            self._events.append((time, position, action, price, idx))
+
+    def trades(self, k):
+        """
+        Returns
+        ---------
+        (list): trades of param set k, as the single-run strategy.trades
+
+        """
+        return [
+            (time, position, action, price)
+            for time, position, action, price, idx in self._events
+            if k in idx
+        ]
+
+    def run_trades(self, start_ts=None, end_ts=None):
+        """
+        Returns
+        ---------
+        (RunTrades): trades of every param set, run k being param set k
+
+        """
+        lens = [len(idx) for *_, idx in self._events]
+        run = np.concatenate([idx for *_, idx in self._events]) if lens else np.zeros(0, dtype=int)
+        order = np.argsort(run, kind='stable')
+        time, position, action, price = (np.array(col) for col in zip(*[e[:4] for e in self._events])) \
+            if lens else ([], [], [], [])
+        return RunTrades(
+            np.repeat(time, lens)[order],
+            np.repeat(np.where(position == 'Long', 1, -1), lens)[order],
+            np.repeat(action == 'Open', lens)[order],
+            np.repeat(price, lens)[order],
+            run[order],
+            num_runs=self.num_sets,
+            start_ts=start_ts,
+            end_ts=end_ts)
+
+    def counts(self):
+        counts = np.zeros(self.num_sets, dtype=int)
+        for *_, idx in self._events:
+            counts[idx] += 1
+        return counts
+
+
+def simulate_all_params(times, close, willr, willr_ema, willr_ema_prev, crosses, params, willrema_stop=False, fee=0.):
+    """
+    Trade logic of WillRBband._execute_trade_all_params (or, with
+        willrema_stop, WillRBbandEvo._execute_trade_all_params_willemastop)
+        for many param sets at once
+
+    Position, open price and time opened are vectors over the param sets,
+        advanced one candle at a time, so the whole grid costs about one
+        backtest. Candles with no entry cross and no open position are
+        skipped. The comparisons are the single-run ones element-wise, so
+        the trades are identical
+
+    Balances follow the ta2_stats_reportonly.py bookkeeping: an open trades
+        the whole balance, a close reverses the previous trade's size, fee on
+        the notional of each
+
+    Arguments
+    ---------
+    times (np.array):           candle timestamps (secs), from bt_start on
+    close, willr, willr_ema, willr_ema_prev (np.array): cols for those candles
+    crosses (tuple):            bool arrays (buy open, buy close, sell open, sell close)
+    params (dict):              param -> array over the param sets (or scalar), for
+                                willrema_diff_threshold, willrema_long_entry,
+                                willrema_short_entry, willr_long_entry,
+                                willr_short_entry, stoploss, timestop
+    fee (float):                fee per trade, for the ROI
+
+    Returns
+    ---------
+    (tuple): (BatchTrades, roi np.array)
+
+    """
+    num_sets = max(np.size(v) for v in params.values())
+    p = {k: np.broadcast_to(np.asarray(v), (num_sets,)) for k, v in params.items()}
+    thr = p['willrema_diff_threshold']
+    stoploss = p['stoploss']
+    timestop = p['timestop']
+    has_stoploss = stoploss > 0
+    long_stop = 1 - stoploss
+    short_stop = 1 + stoploss
+
+    position = np.zeros(num_sets, dtype=int)
+    open_price = np.zeros(num_sets)
+    time_opened = np.zeros(num_sets, dtype=np.int64)
+    bal = np.ones(num_sets)
+    size = np.zeros(num_sets)
+    prev_price = np.zeros(num_sets)
+    trades = BatchTrades(num_sets)
+    num_open = 0
+
+    buy_open, buy_close, sell_open, sell_close = (np.asarray(c, dtype=bool).tolist() for c in crosses)
+    times = np.asarray(times).tolist()
+    for i, t in enumerate(times):
+        if not num_open and not (buy_open[i] or sell_open[i]):
+            continue
+        c = close[i]
+        e = willr_ema[i]
+        ep = willr_ema_prev[i]
+        w = willr[i]
+        long_sig = (e > p['willrema_long_entry']) & (w > p['willr_long_entry']) & ((e - thr) > ep)
+        short_sig = (e < p['willrema_short_entry']) & (w < p['willr_short_entry']) & ((e + thr) < ep)
+
+        if num_open:
+            held = (t - time_opened) > timestop
+            close_long = (position > 0) & (
+                buy_close[i] | (has_stoploss & (c < open_price*long_stop)) | held)
+            close_short = (position < 0) & (
+                sell_close[i] | (has_stoploss & (c > open_price*short_stop)) | held)
+            if willrema_stop:
+                close_long |= (position > 0) & ((e + thr) < ep)
+                close_short |= (position < 0) & ((e - thr) > ep)
+            closed = close_long | close_short
+            if closed.any():
+                trades.add(t, 'Long', 'Close', c, close_long)
+                trades.add(t, 'Short', 'Close', c, close_short)
+                size[closed] = -size[closed]
+                bal[closed] += -size[closed]*(c - prev_price[closed]) - fee*np.abs(size[closed]*c)
+                prev_price[closed] = c
+                position[closed] = 0
+
+        # Flat, incl. just closed (the trade loop re-runs a candle after a close)
+        if buy_open[i] or sell_open[i]:
+            flat = position == 0
+            open_long = flat & long_sig if buy_open[i] else np.zeros(num_sets, dtype=bool)
+            open_short = flat & ~long_sig & short_sig if sell_open[i] else np.zeros(num_sets, dtype=bool)
+            opened = open_long | open_short
+            if opened.any():
+                trades.add(t, 'Long', 'Open', c, open_long)
+                trades.add(t, 'Short', 'Open', c, open_short)
+                size[open_long] = bal[open_long]/c
+                size[open_short] = -bal[open_short]/c
+                bal[opened] -= fee*np.abs(size[opened]*c)
+                prev_price[opened] = c
+                position[open_long] = 1
+                position[open_short] = -1
+                open_price[opened] = c
+                time_opened[opened] = t
+        num_open = np.count_nonzero(position)
+
+    return trades, bal - 1
@@ -0,0 +1,154 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+
+class CandleStore:
+    """
+    On-disk candle store, one directory per (exchange, symbol, period,
+        asset_type) series
+
+    Candles are kept as float64 .npy arrays partitioned by month (UTC), with
+        cols: datetime (secs), open, high, low, close, volume. Partitions are
+        memory-mapped on read, so serving a window only touches the months it
+        covers
+
+    A coverage file records the time ranges already fetched from the exchange,
+        including stretches where the exchange had no candles, so only
+        missing_ranges() ever need to go over the network
+
+    Arguments
+    ---------
+    root (str): store directory (created on the first write)
+
+    """
+
+    COLS = ('datetime', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, root):
+        self.root = root
+        self.logger = logging.getLogger(__name__)
+
+    def _series_dir(self, key):
+        exchange, symbol, period, asset_type = key
+        return f'{self.root}/{exchange}_{symbol.lower()}_{int(period)}_{asset_type}'
+
+    @staticmethod
+    def _months(start_ts, end_ts):
+        """
+        Month partition names ('YYYY-MM') overlapping [start_ts, end_ts)
+        """
+        first = np.datetime64(int(start_ts), 's').astype('datetime64[M]')
+        last = np.datetime64(int(end_ts) - 1, 's').astype('datetime64[M]')
+        return [str(m) for m in np.arange(first, last + 1)]
+
+    def _read_partition(self, key, month, mmap_mode='r'):
+        path = f'{self._series_dir(key)}/{month}.npy'
+        if not os.path.isfile(path):
+            return np.empty((0, len(self.COLS)))
+        return np.load(path, mmap_mode=mmap_mode)
+
+    def _write_atomic(self, path, write):
+        # Only writes create the series directory, reads of an unknown series leave no trace
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+
+    def coverage(self, key):
+        """
+        Returns
+        ---------
+        (list): sorted, non-overlapping [start, end) ranges (secs) fetched so far
+
+        """
+        path = f'{self._series_dir(key)}/coverage.json'
+        if not os.path.isfile(path):
+            return []
+        with open(path, 'r') as f:
+            return [tuple(r) for r in json.load(f)]
+
+    def _add_coverage(self, key, start_ts, end_ts):
+        ranges = sorted(self.coverage(key) + [(int(start_ts), int(end_ts))])
+        merged = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        path = f'{self._series_dir(key)}/coverage.json'
+        self._write_atomic(path, lambda f: f.write(json.dumps(merged).encode()))
+
+    def missing_ranges(self, key, start_ts, end_ts):
+        """
+        Parts of [start_ts, end_ts) not yet fetched
+
+        Returns
+        ---------
+        (list): [start, end) ranges (secs)
+
+        """
+        missing = []
+        cursor = int(start_ts)
+        for start, end in self.coverage(key):
+            if end <= cursor:
+                continue
+            if start >= end_ts:
+                break
+            if start > cursor:
+                missing.append((cursor, start))
+            cursor = max(cursor, end)
+        if cursor < end_ts:
+            missing.append((cursor, int(end_ts)))
+        return missing
+
+    def write(self, key, df, start_ts, end_ts):
+        """
+        Merge fetched candles into the store and mark [start_ts, end_ts) as
+            covered. Candles already stored at the same timestamps are replaced
+
+        Arguments
+        ---------
+        key (tuple):        (exchange, symbol, period, asset_type)
+        df (pd.DataFrame):  candles with cols from COLS ('datetime' col or index)
+        start_ts (int):     start of the fetched range (secs)
+        end_ts (int):       end of the range known to be complete (secs)
+
+        """
+        if df is not None and len(df.index) > 0:
+            if 'datetime' not in df.columns:
+                df = df.reset_index()
+            new = df[list(self.COLS)].to_numpy(dtype=float)
+            months = new[:, 0].astype(np.int64).astype('datetime64[s]').astype('datetime64[M]').astype(str)
+            for month in np.unique(months):
+                stored = np.array(self._read_partition(key, month))
+                rows = np.concatenate([new[months == month], stored])
+                # Keep the first (newly fetched) row per timestamp
+                _, first = np.unique(rows[:, 0], return_index=True)
+                rows = rows[first]
+                path = f'{self._series_dir(key)}/{month}.npy'
+                self._write_atomic(path, lambda f: np.save(f, rows))
+        if end_ts > start_ts:
+            self._add_coverage(key, start_ts, end_ts)
+
+    def read(self, key, start_ts, end_ts):
+        """
+        Candles with start_ts <= datetime < end_ts, from the store only
+
+        Returns
+        ---------
+        (pd.DataFrame): cols open, high, low, close, volume, indexed by datetime (secs)
+
+        """
+        parts = []
+        for month in self._months(start_ts, end_ts):
+            rows = self._read_partition(key, month)
+            lo, hi = np.searchsorted(rows[:, 0], (start_ts, end_ts)) if len(rows) else (0, 0)
+            parts.append(np.array(rows[lo:hi]))
+        rows = np.concatenate(parts) if parts else np.empty((0, len(self.COLS)))
+        df = pd.DataFrame(rows[:, 1:], columns=list(self.COLS[1:]))
+        df.index = pd.Index(rows[:, 0].astype(np.int64), name='datetime')
+        return df
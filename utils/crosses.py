@@ -0,0 +1,43 @@
+import numpy as np
+
+
+STANDARD = 'standard'
+CROSS_MOD = 'cross_mod'
+
+
+def detect_crosses(a, a_prev, b, b_prev, over=True, mode=STANDARD):
+    """
+    Vectorized crossover/crossunder detection over whole arrays
+
+    A row is a cross when a is above (over) / below (under) b on that row, and
+        was not on the previous row. Rows with a NaN in any input are never a
+        cross
+
+    Semantics:
+        STANDARD:   previous row compares a_prev to b_prev
+        CROSS_MOD:  previous row compares a_prev to the current b, and b_prev
+                    is not checked for NaN (see WillRBbandCrossMod)
+
+    Arguments
+    ---------
+    a, a_prev, b, b_prev (np.array):   equal length float arrays
+    over (bool):                        crossover if True, else crossunder
+    mode (str):                         STANDARD or CROSS_MOD
+
+    Returns
+    ---------
+    (np.array): bool array, True on rows where a cross happens
+
+    """
+    a, a_prev, b, b_prev = (np.asarray(x, dtype=float) for x in (a, a_prev, b, b_prev))
+    if mode == STANDARD:
+        b_before = b_prev
+        valid = ~(np.isnan(a) | np.isnan(a_prev) | np.isnan(b) | np.isnan(b_prev))
+    elif mode == CROSS_MOD:
+        b_before = b
+        valid = ~(np.isnan(a) | np.isnan(a_prev) | np.isnan(b))
+    else:
+        raise ValueError
+    if over:
+        return valid & (a > b) & ~(a_prev > b_before)
+    return valid & (a < b) & ~(a_prev < b_before)
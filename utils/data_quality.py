@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+
+class DataReport:
+    """
+    Data quality of one candle series, from check_candles()
+
+    Arguments
+    ---------
+    period (int):               candle period (secs)
+    num_candles (int)
+    gaps (np.array):            (n, 2) missing [start, end) ranges (secs)
+    misaligned (np.array):      timestamps not on the period grid of the first candle
+    duplicates (np.array):      timestamps seen more than once
+    non_monotonic (np.array):   timestamps that come before the previous candle's
+    zero_volume (np.array):     timestamps of candles with no traded volume
+
+    """
+
+    def __init__(self, period, num_candles, gaps, misaligned, duplicates, non_monotonic, zero_volume):
+        self.period = period
+        self.num_candles = num_candles
+        self.gaps = gaps
+        self.misaligned = misaligned
+        self.duplicates = duplicates
+        self.non_monotonic = non_monotonic
+        self.zero_volume = zero_volume
+
+    @property
+    def missing_candles(self):
+        return int(((self.gaps[:, 1] - self.gaps[:, 0])//self.period).sum())
+
+    @property
+    def ok(self):
+        """
+        No gaps, misaligned, duplicate or out of order candles (zero volume
+            candles are reported only)
+        """
+        return not (len(self.gaps) or len(self.misaligned) or len(self.duplicates) or len(self.non_monotonic))
+
+    def to_dict(self):
+        return {
+            'period': self.period,
+            'num_candles': self.num_candles,
+            'gaps': len(self.gaps),
+            'missing_candles': self.missing_candles,
+            'misaligned': len(self.misaligned),
+            'duplicates': len(self.duplicates),
+            'non_monotonic': len(self.non_monotonic),
+            'zero_volume': len(self.zero_volume),
+        }
+
+    def __repr__(self):
+        return f'DataReport({self.to_dict()})'
+
+
+def check_candles(index, volume, period):
+    """
+    Check a candle series in one pass over the diffs of its timestamps
+
+    Arguments
+    ---------
+    index (np.array):   candle timestamps (secs)
+    volume (np.array):  candle volumes, or None to skip the check
+    period (int):       candle period (secs)
+
+    Returns
+    ---------
+    (DataReport)
+
+    """
+    index = np.asarray(index, dtype=np.int64)
+    diffs = np.diff(index)
+    non_monotonic = index[1:][diffs < 0]
+    if len(non_monotonic):
+        # Duplicates may not be next to each other
+        ordered = np.sort(index, kind='stable')
+        diffs = np.diff(ordered)
+    else:
+        ordered = index
+    duplicates = np.unique(ordered[1:][diffs == 0])
+    gap = diffs > period
+    gaps = np.column_stack([ordered[:-1][gap] + period, ordered[1:][gap]])
+    misaligned = index[(index - index[0]) % period != 0] if len(index) else index
+    zero_volume = index[np.asarray(volume) == 0] if volume is not None else index[:0]
+    return DataReport(period, len(index), gaps, misaligned, duplicates, non_monotonic, zero_volume)
+
+
+def sort_candles(df):
+    """
+    Candles in time order, keeping the first of any duplicate timestamps
+    """
+    df = df.iloc[np.argsort(df.index.to_numpy(), kind='stable')]
+    return df[~df.index.duplicated(keep='first')]
+
+
+def ffill_gaps(df, period):
+    """
+    Fill gaps in a sorted candle dataframe with flat candles at the previous
+        close and zero volume
+
+    Returns
+    ---------
+    (pd.DataFrame): df with the missing candles added
+
+    """
+    index = df.index.to_numpy()
+    diffs = np.diff(index)
+    gap = np.flatnonzero(diffs > period)
+    if not len(gap):
+        return df
+    counts = (diffs[gap] - 1)//period
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    times = np.repeat(index[gap], counts) + (offsets + 1)*period
+    close = np.repeat(df['close'].to_numpy()[gap], counts)
+    filled = pd.DataFrame(
+        {col: close if col in ('open', 'high', 'low', 'close') else 0. for col in df.columns},
+        index=pd.Index(times, name=df.index.name))
+    return pd.concat([df, filled]).sort_index(kind='mergesort')
@@ -0,0 +1,202 @@
+import collections
+import numpy as np
+
+
+class FloatingCandles:
+    """
+    Floating longer-period OHLC candles, built from shorter-period candles
+
+    For every shorter candle at timestamp t, the floating candle covers the
+        candles timestamped from t - period_long + period_short to t inclusive.
+        E.g. for 3m/60m candles, the row at 12:18pm gets a 60m candle made of
+        the 20 candles from 11:21am to 12:18pm. Rows without a full window of
+        history (i.e. the window starts before the first candle seen) are NaN
+
+    The batch build() is linear in the number of rows: sliding-window max/min
+        over strided views when the index is regular, monotonic deques
+        otherwise. append() keeps the same deques so live mode can extend the
+        series one candle at a time
+
+    Arguments
+    ---------
+    period_short (int):     shorter candle period (secs)
+    period_long (int):      longer candle period (secs), multiple of period_short
+
+    """
+
+    def __init__(self, period_short, period_long):
+        if not period_long % period_short == 0:
+            raise ValueError
+        self.period_short = period_short
+        self.period_long = period_long
+        self.num_intervals = int(period_long/period_short)
+        self.first_ts = None
+        self.last_ts = None
+        self._opens = collections.deque() # (ts, open), every candle in window
+        self._highs = collections.deque() # (ts, high), decreasing highs
+        self._lows = collections.deque() # (ts, low), increasing lows
+
+    def append(self, ts, open_, high, low, close):
+        """
+        Add the next shorter candle and return its floating candle
+
+        NaN highs/lows are skipped, as with DataFrame.max()/min(). If the window
+            start has no candle (gap in the series), the earliest candle in the
+            window gives the open
+
+        Returns
+        ---------
+        (tuple): floating (open, high, low, close), NaNs if window incomplete
+
+        """
+        if self.last_ts is not None and not ts > self.last_ts:
+            raise ValueError(f'Candle {ts} is not after {self.last_ts}')
+        if self.first_ts is None:
+            self.first_ts = ts
+        self.last_ts = ts
+        ts_start = ts - self.period_long + self.period_short
+
+        self._opens.append((ts, open_))
+        if not np.isnan(high):
+            while self._highs and self._highs[-1][1] <= high:
+                self._highs.pop()
+            self._highs.append((ts, high))
+        if not np.isnan(low):
+            while self._lows and self._lows[-1][1] >= low:
+                self._lows.pop()
+            self._lows.append((ts, low))
+        for window in (self._opens, self._highs, self._lows):
+            while window and window[0][0] < ts_start:
+                window.popleft()
+
+        if ts_start < self.first_ts:
+            return (np.nan, np.nan, np.nan, np.nan)
+        return (
+            self._opens[0][1],
+            self._highs[0][1] if self._highs else np.nan,
+            self._lows[0][1] if self._lows else np.nan,
+            close)
+
+    def build(self, index, open_, high, low, close):
+        """
+        Floating candles for a whole series, resetting any previous state
+
+        Arguments
+        ---------
+        index (np.array):                   candle timestamps (secs), ascending
+        open_, high, low, close (np.array): shorter candle prices
+
+        Returns
+        ---------
+        (tuple): floating (open, high, low, close) float arrays
+
+        """
+        self.__init__(self.period_short, self.period_long)
+        index = np.asarray(index, dtype=np.int64)
+        open_, high, low, close = (
+            np.asarray(x, dtype=float) for x in (open_, high, low, close))
+        n = len(index)
+        w = self.num_intervals
+        regular = n > 0 and np.all(np.diff(index) == self.period_short)
+        if not regular or n < w:
+            rows = [
+                self.append(*row)
+                for row in zip(index.tolist(), open_, high, low, close)
+            ]
+            if not rows:
+                return tuple(np.array([], dtype=float) for _ in range(4))
+            return tuple(np.array(col, dtype=float) for col in zip(*rows))
+
+        flt_open = np.full(n, np.nan)
+        flt_high = np.full(n, np.nan)
+        flt_low = np.full(n, np.nan)
+        flt_close = np.full(n, np.nan)
+        windows = np.lib.stride_tricks.sliding_window_view
+        flt_open[w-1:] = open_[:n-w+1]
+        # fmax/fmin skip NaNs unless the whole window is NaN
+        flt_high[w-1:] = np.fmax.reduce(windows(high, w), axis=1)
+        flt_low[w-1:] = np.fmin.reduce(windows(low, w), axis=1)
+        flt_close[w-1:] = close[w-1:]
+
+        # Replay the last window so append() can carry on from here
+        self.first_ts = int(index[0])
+        for row in zip(index[-w:].tolist(), open_[-w:], high[-w:], low[-w:], close[-w:]):
+            self.append(*row)
+        return flt_open, flt_high, flt_low, flt_close
+
+
+def _ewm_columns(x, period):
+    """
+    pandas ewm(span=period, adjust=False).mean() down each column of x, with
+        the same arithmetic and NaN carrying (see utils.streaming.StreamingEMA)
+    """
+    alpha = 1. / (1. + (period - 1) / 2.)
+    old_wt_factor = 1. - alpha
+    out = np.full(x.shape, np.nan)
+    weighted = np.full(x.shape[1], np.nan)
+    old_wt = np.ones(x.shape[1])
+    for k in range(x.shape[0]):
+        cur = x[k]
+        is_obs = ~np.isnan(cur)
+        has_weighted = ~np.isnan(weighted)
+        old_wt = np.where(has_weighted, old_wt*old_wt_factor, old_wt)
+        with np.errstate(invalid='ignore'):
+            new_weighted = (old_wt*weighted + alpha*cur) / (old_wt + alpha)
+        update = has_weighted & is_obs
+        weighted = np.where(update & ~(weighted == cur), new_weighted, weighted)
+        old_wt = np.where(update, 1., old_wt)
+        weighted = np.where(~has_weighted & is_obs, cur, weighted)
+        out[k] = weighted
+    return out
+
+
+def phased_willr_ema(high, low, close, num_intervals, willr_period=14, ema_period=43):
+    """
+    WillR and its EMA over floating candles, split into num_intervals
+        interleaved phases (every num_intervals-th row), all phases at once
+
+    Same values as resampling each phase (WillRBband._resample_floating_candles)
+        and running btalib.willr()/btalib.ema(_seed=3) on it, for a regular
+        index with no NaNs past the first floating candle. Each phase is a
+        column of a 2-D (rows/num_intervals, num_intervals) layout; phases
+        other than the one aligned with the first row get the leading NaN
+        candle that the resample grid adds before the data
+
+    Arguments
+    ---------
+    high, low, close (np.array):    floating candle prices, one per shorter row
+    num_intervals (int):            shorter candles per longer candle
+
+    Returns
+    ---------
+    (tuple): willr, willr_ema float arrays, aligned with the input rows
+
+    """
+    high, low, close = (np.asarray(x, dtype=float) for x in (high, low, close))
+    n = len(close)
+    w = num_intervals
+    # Phase g is column g; row r sits at (r//w + 1, g) for g > 0, (r//w, 0) for g = 0
+    rows = np.arange(n)
+    pos_k = rows//w + (rows % w > 0)
+    pos_g = rows % w
+    num_k = int(pos_k.max()) + 1 if n else 0
+
+    def phased(x):
+        m = np.full((num_k, w), np.nan)
+        m[pos_k, pos_g] = x
+        return m
+
+    h, l, c = phased(high), phased(low), phased(close)
+    willr = np.full((num_k, w), np.nan)
+    if num_k >= willr_period:
+        windows = np.lib.stride_tricks.sliding_window_view
+        # NaN anywhere in the window gives NaN, as with rolling(period).max()
+        hh = windows(h, willr_period, axis=0).max(axis=-1)
+        ll = windows(l, willr_period, axis=0).min(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            willr[willr_period-1:] = -100.0 * (hh - c[willr_period-1:]) / (hh - ll)
+    willr_ema = np.full((num_k, w), np.nan)
+    # btalib.ema(_seed=3) on a pd.Series: first ema_period values dropped
+    if num_k > ema_period:
+        willr_ema[ema_period:] = _ewm_columns(willr[ema_period:], ema_period)
+    return willr[pos_k, pos_g], willr_ema[pos_k, pos_g]
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+
+CANDLE_COLS = ('open', 'high', 'low', 'close', 'volume')
+MAX_DECIMALS = 8
+
+
+def price_decimals(values, max_decimals=MAX_DECIMALS):
+    """
+    Fewest decimals that represent all values, or None if more than
+        max_decimals are needed
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    for decimals in range(max_decimals + 1):
+        if np.allclose(np.round(values, decimals), values, rtol=1e-12, atol=0):
+            return decimals
+    return None
+
+
+def compact_candles(df):
+    """
+    Compact copy of a candle dataframe: int64 epoch index (or 'datetime' col,
+        for frames from the exchange), only the OHLCV cols, and float32 for
+        the cols that round-trip exactly at their number of decimals
+
+    Decimals of the float32 cols are kept in df.attrs['decimals'], so
+        exact_values() gives back the original float64 values
+
+    Returns
+    ---------
+    (pd.DataFrame)
+
+    """
+    cols = [col for col in CANDLE_COLS if col in df.columns]
+    out = pd.DataFrame(index=pd.RangeIndex(len(df.index)))
+    if 'datetime' in df.columns:
+        out['datetime'] = df['datetime'].to_numpy(dtype=np.int64)
+    else:
+        out.index = pd.Index(df.index.to_numpy(dtype=np.int64), name=df.index.name)
+    decimals = {}
+    for col in cols:
+        values = df[col].to_numpy(dtype=float)
+        _decimals = price_decimals(values)
+        values_32 = values.astype(np.float32)
+        if _decimals is not None and np.array_equal(
+                np.round(values_32.astype(float), _decimals), values, equal_nan=True):
+            out[col] = values_32
+            decimals[col] = _decimals
+        else:
+            out[col] = values
+    out.attrs['decimals'] = decimals
+    return out
+
+
+def expand_candles(df):
+    """
+    Upcast (in place) the float32 cols of a compact_candles() frame to their
+        exact float64 values, so indicators get calc'd at full precision
+    """
+    for col in df.attrs.get('decimals', {}):
+        if col in df.columns and df[col].dtype == np.float32:
+            df[col] = exact_values(df, col)
+    return df
+
+
+def compact_indicators(df, exclude=CANDLE_COLS):
+    """
+    Downcast the float64 cols (indicators) of a dataframe to float32, after
+        they have been calc'd at full precision
+
+    Cols in df.attrs['decimals'] go back to float32 only while they still
+        round-trip exactly (new candles may have more decimals)
+    """
+    decimals = df.attrs.get('decimals', {})
+    dtypes = {}
+    for col in df.columns:
+        if df[col].dtype != np.float64:
+            continue
+        if col in decimals:
+            values = df[col].to_numpy()
+            if np.array_equal(
+                    np.round(values.astype(np.float32).astype(float), decimals[col]), values, equal_nan=True):
+                dtypes[col] = np.float32
+            else:
+                del decimals[col]
+        elif col not in exclude:
+            dtypes[col] = np.float32
+    out = df.astype(dtypes)
+    out.attrs['decimals'] = decimals
+    return out
+
+
+def exact_values(df, col):
+    """
+    Values of col as float64, undoing the float32 rounding of compact_candles()
+    """
+    decimals = getattr(df, 'attrs', {}).get('decimals', {})
+    if col in decimals:
+        return np.round(df[col].to_numpy(dtype=float), decimals[col])
+    return df[col].to_numpy()
+
+
+def exact_at(df, idx, col):
+    """
+    Single value of exact_values(), at index idx
+    """
+    value = float(df.at[idx, col])
+    decimals = df.attrs.get('decimals', {})
+    return float(np.round(value, decimals[col])) if col in decimals else value
+
+
+def frame_memory(df, num_candles=100000):
+    """
+    Bytes used by the dataframe (incl. index and object cols) per num_candles rows
+    """
+    if not len(df.index):
+        return 0
+    return int(df.memory_usage(index=True, deep=True).sum()*num_candles/len(df.index))
@@ -0,0 +1,66 @@
+import json
+import numpy as np
+from utils.frames import exact_values
+
+
+class IndicatorMatrix:
+    """
+    Read-only matrix of the numeric columns of a preprocessed candle
+        dataframe, so the indicators can be computed once and shared
+
+    Stored column-major as one float64 .npy (first row is the index, in secs)
+        plus a .json of the column names. load() memory-maps it, so any number
+        of processes can read the same matrix, paying for the pages only once.
+        Bool columns (e.g. crosses) come back as 1.0/0.0
+
+    Stands in for the dataframe in CandleRows: .index and matrix[col] return
+        arrays
+
+    Arguments
+    ---------
+    index (np.array):   candle timestamps (secs)
+    columns (list):     column names, one per row of values
+    values (np.array):  float64, shape (len(columns), len(index))
+
+    """
+
+    def __init__(self, index, columns, values):
+        self.index = np.asarray(index, dtype=np.int64)
+        self.columns = list(columns)
+        self.values = values
+        self._pos = {col: i for i, col in enumerate(self.columns)}
+
+    @classmethod
+    def from_df(cls, df):
+        cols = [
+            col for col in df.columns
+            if df[col].dtype.kind in 'fiub'
+        ]
+        values = np.empty((len(cols), len(df.index)))
+        for i, col in enumerate(cols):
+            values[i] = exact_values(df, col)
+        return cls(df.index.to_numpy(), cols, values)
+
+    def save(self, path):
+        """
+        Write to <path>.npy and <path>.json
+        """
+        np.save(f'{path}.npy', np.vstack([self.index.astype(float), self.values]))
+        with open(f'{path}.json', 'w') as f:
+            json.dump(self.columns, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        with open(f'{path}.json', 'r') as f:
+            columns = json.load(f)
+        values = np.load(f'{path}.npy', mmap_mode=mmap_mode)
+        return cls(values[0], columns, values[1:])
+
+    def __getitem__(self, col):
+        return self.values[self._pos[col]]
+
+    def __contains__(self, col):
+        return col in self._pos
+
+    def __len__(self):
+        return len(self.index)
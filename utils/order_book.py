@@ -0,0 +1,142 @@
+import threading
+import numpy as np
+
+from utils.analytics import walk_book
+
+
+class OrderBook:
+    """
+    Local order book replica: price levels of each side in sorted arrays,
+        updated in place from a depth stream (see exchanges.binance_streams.DepthStream)
+
+    Both sides are kept in ascending price order; bids are read best first
+        from the end. Updates and reads take a lock, as the stream thread
+        writes while the strategy reads
+
+    Arguments
+    ---------
+    symbol (str)
+
+    """
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.last_update_id = None
+        self.updated = None # Exchange event time (ms) of the last update
+        self._prices = {'bids': np.empty(0), 'asks': np.empty(0)}
+        self._qtys = {'bids': np.empty(0), 'asks': np.empty(0)}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parse(levels):
+        # [[price, qty], ...] (str or float) -> float arrays, ascending by price
+        levels = np.asarray(levels, dtype=float).reshape(-1, 2)
+        order = np.argsort(levels[:, 0], kind='stable')
+        return levels[order, 0], levels[order, 1]
+
+    def load_snapshot(self, snapshot):
+        """
+        Replace the book with a REST depth snapshot ({'lastUpdateId', 'bids', 'asks'})
+        """
+        sides = {side: self._parse(snapshot[side]) for side in ('bids', 'asks')}
+        with self._lock:
+            for side, (prices, qtys) in sides.items():
+                keep = qtys > 0
+                self._prices[side] = prices[keep]
+                self._qtys[side] = qtys[keep]
+            self.last_update_id = snapshot['lastUpdateId']
+
+    def apply(self, bids, asks, update_id, event_time=None):
+        """
+        Apply a diff: each [price, qty] sets the level's qty, qty 0 removes it
+        """
+        with self._lock:
+            for side, levels in (('bids', bids), ('asks', asks)):
+                if len(levels):
+                    self._apply_side(side, *self._parse(levels))
+            self.last_update_id = update_id
+            self.updated = event_time
+
+    def _apply_side(self, side, upd_prices, upd_qtys):
+        prices = self._prices[side]
+        qtys = self._qtys[side]
+        # Last update wins for a price repeated within one diff
+        last = np.r_[upd_prices[1:] != upd_prices[:-1], True]
+        upd_prices, upd_qtys = upd_prices[last], upd_qtys[last]
+        pos = np.searchsorted(prices, upd_prices)
+        found = pos < len(prices)
+        found[found] = prices[pos[found]] == upd_prices[found]
+        qtys = qtys.copy()
+        qtys[pos[found]] = upd_qtys[found]
+        new = ~found & (upd_qtys > 0)
+        prices = np.insert(prices, pos[new], upd_prices[new])
+        qtys = np.insert(qtys, pos[new], upd_qtys[new])
+        keep = qtys > 0
+        self._prices[side] = prices[keep]
+        self._qtys[side] = qtys[keep]
+
+    def levels(self, side, depth=None):
+        """
+        Returns
+        ---------
+        (np.array, np.array): prices, qtys of side ('bids' or 'asks'), best first
+
+        """
+        with self._lock:
+            prices = self._prices[side]
+            qtys = self._qtys[side]
+            if side == 'bids':
+                prices, qtys = prices[::-1], qtys[::-1]
+            if depth is not None:
+                prices, qtys = prices[:depth], qtys[:depth]
+            return prices.copy(), qtys.copy()
+
+    def depth(self, side):
+        return len(self._prices[side])
+
+    def top(self):
+        """
+        Returns
+        ---------
+        (tuple): best bid (price, qty), best ask (price, qty); None for an empty side
+
+        """
+        with self._lock:
+            bids, asks = self._prices['bids'], self._prices['asks']
+            best_bid = (bids[-1], self._qtys['bids'][-1]) if len(bids) else None
+            best_ask = (asks[0], self._qtys['asks'][0]) if len(asks) else None
+        return best_bid, best_ask
+
+    def fill(self, side, size):
+        """
+        Walk the book for a market order of size (base token): 'BUY' takes
+            the asks, 'SELL' the bids
+
+        Arguments
+        ---------
+        side (str):     'BUY' or 'SELL'
+        size (float):   or an array of sizes, for the arrays of utils.analytics.walk_book()
+
+        Returns
+        ---------
+        (bool, float, float, float): filled, avg price, top of book price, slippage (%)
+
+        """
+        prices, qtys = self.levels('asks' if side.upper() == 'BUY' else 'bids')
+        filled, _, avg_price, slip_pct, _ = walk_book(prices, qtys, size)
+        top = float(prices[0]) if len(prices) else None
+        if np.ndim(size):
+            return filled, avg_price, top, slip_pct
+        if not filled[0]:
+            return False, None, top, None
+        return True, float(avg_price[0]), top, float(slip_pct[0])
+
+    def to_dict(self, depth=None):
+        """
+        Book in the exchange's get_book() format ({'lastUpdateId', 'bids', 'asks'}, best first)
+        """
+        book = {'lastUpdateId': self.last_update_id}
+        for side in ('bids', 'asks'):
+            prices, qtys = self.levels(side, depth)
+            book[side] = np.column_stack([prices, qtys]).tolist()
+        return book
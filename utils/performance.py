@@ -0,0 +1,259 @@
+import itertools
+import numpy as np
+import pandas as pd
+
+
+DAY = 86400
+
+
+class RunTrades:
+    """
+    Trades of any number of backtest runs as flat columns, so stats for all
+        of them are computed with array operations in one pass
+
+    Arguments
+    ---------
+    time (np.array):    candle time of each trade (secs)
+    side (np.array):    1 for Long, -1 for Short
+    is_open (np.array): True for opens, False for closes
+    price (np.array):   trade price
+    run (np.array):     run number (0..num_runs-1) of each trade. Each run's
+                        trades are contiguous and in time order
+    num_runs (int):     defaults to the last run number + 1
+    start_ts (np.array):    start of each run (secs), defaults to its first trade
+    end_ts (np.array):      end of each run (secs), defaults to its last trade
+
+    """
+
+    def __init__(self, time, side, is_open, price, run, num_runs=None, start_ts=None, end_ts=None):
+        self.time = np.asarray(time, dtype=np.int64)
+        self.side = np.asarray(side, dtype=np.int8)
+        self.is_open = np.asarray(is_open, dtype=bool)
+        self.price = np.asarray(price, dtype=float)
+        self.run = np.asarray(run, dtype=np.int64)
+        if num_runs is None:
+            num_runs = int(self.run[-1]) + 1 if len(self.run) else 0
+        self.num_runs = num_runs
+        self.offsets = np.searchsorted(self.run, np.arange(num_runs + 1)) # First trade of each run
+        self.counts = np.diff(self.offsets)
+        if len(self.time):
+            first = np.where(self.counts > 0, self.time[np.minimum(self.offsets[:-1], len(self.time) - 1)], 0)
+            last = np.where(self.counts > 0, self.time[np.maximum(self.offsets[1:] - 1, 0)], 0)
+        else:
+            first = last = np.zeros(num_runs)
+        start_ts = first if start_ts is None else start_ts
+        end_ts = last if end_ts is None else end_ts
+        self.start_ts = np.asarray(start_ts, dtype=np.int64)
+        self.end_ts = np.asarray(end_ts, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.time)
+
+    @classmethod
+    def from_lists(cls, trades_lists, start_ts=None, end_ts=None):
+        """
+        From strategy.trades style lists, one per run, of
+            (candle time, position, action, price) tuples
+        """
+        counts = [len(trades) for trades in trades_lists]
+        flat = list(itertools.chain.from_iterable(trades_lists))
+        time, position, action, price = zip(*flat) if flat else ((), (), (), ())
+        return cls(
+            time,
+            np.where(np.array(position, dtype=object) == 'Long', 1, -1),
+            np.array(action, dtype=object) == 'Open',
+            price,
+            np.repeat(np.arange(len(counts)), counts),
+            num_runs=len(counts),
+            start_ts=start_ts,
+            end_ts=end_ts)
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        From utils.results.RunResult objects
+        """
+        return cls.from_lists(
+            [r.trades for r in results],
+            start_ts=[r.start_ts for r in results],
+            end_ts=[r.end_ts for r in results])
+
+    @classmethod
+    def from_store(cls, store, run_ids):
+        """
+        From runs in a utils.results.ResultsStore, reading only their columns
+        """
+        runs = store.runs().set_index('run_id').loc[list(run_ids)]
+        cols = [store.trade_columns(run_id) for run_id in run_ids]
+        return cls(
+            np.concatenate([c['time'] for c in cols]) if cols else [],
+            np.concatenate([c['position'] for c in cols]) if cols else [],
+            np.concatenate([c['action'] for c in cols]).astype(bool) if cols else [],
+            np.concatenate([c['price'] for c in cols]) if cols else [],
+            np.repeat(np.arange(len(cols)), [len(c['time']) for c in cols]),
+            num_runs=len(cols),
+            start_ts=runs['start_ts'].to_numpy(),
+            end_ts=runs['end_ts'].to_numpy())
+
+
+def _per_run(trades, values, how, run=None, num_runs=None):
+    """
+    Aggregate per-trade values by run, NaN for runs with no values
+    """
+    run = trades.run if run is None else run
+    return pd.Series(values).groupby(run).agg(how).reindex(
+        range(trades.num_runs if num_runs is None else num_runs)).to_numpy(dtype=float)
+
+
+def trade_table(trades, fee, start_bal=1.):
+    """
+    Per-trade bookkeeping of ta2_stats_reportonly.py, for every run at once:
+        an open trades the whole balance, a close reverses the previous
+        trade's size, and fee is paid on the notional
+
+    Balances scale with the balance at the last open, so each stretch from an
+        open to the next one is a cumulative sum per unit balance, and runs
+        chain those with a cumulative product
+
+    Arguments
+    ---------
+    trades (RunTrades)
+    fee (float or np.array):        fee per trade, or one per run
+    start_bal (float or np.array):  balance before the first trade, or one per run
+
+    Returns
+    ---------
+    (dict): np.arrays with one value per trade: tradesize, tokenbal, fees,
+            pnl, usdbal, hold (secs, closes only), roi (roi per trade, closes
+            only), held (in a position after the trade)
+
+    """
+    n = len(trades)
+    fee = np.broadcast_to(np.asarray(fee, dtype=float), (trades.num_runs,))[trades.run]
+    start_bal = np.broadcast_to(np.asarray(start_bal, dtype=float), (trades.num_runs,))
+    idx = np.arange(n)
+    first_in_run = idx == trades.offsets[trades.run]
+
+    # Stretches start at each open (and run start, for closes before the first open)
+    seg_start = trades.is_open | first_in_run
+    seg_first = np.flatnonzero(seg_start)
+    seg = np.cumsum(seg_start) - 1
+    open_sign = np.where(trades.is_open[seg_first], trades.side[seg_first], 0)[seg]
+    k = idx - seg_first[seg]
+    size = open_sign*np.where(k % 2, -1., 1.)/trades.price[seg_first][seg] # Per unit of balance at the open
+    prev_price = np.concatenate([trades.price[:1], trades.price[:-1]])
+    pnl = np.where(trades.is_open, 0., -size*(trades.price - prev_price))
+    fees = fee*np.abs(size*trades.price)
+    step = pnl - fees
+    cum = np.cumsum(step)
+    ratio = 1 + cum - (cum - step)[seg_first][seg]
+
+    # Balance at each open: start_bal times the previous stretches of the run
+    seg_run = trades.run[seg_first]
+    seg_ratio = ratio[np.append(seg_first[1:], n) - 1] if n else ratio
+    prev_ratio = np.concatenate([[1.], seg_ratio[:-1]])
+    prev_ratio[first_in_run[seg_first]] = 1.
+    bal_open = (start_bal[seg_run]*pd.Series(prev_ratio).groupby(seg_run).cumprod().to_numpy())[seg]
+
+    usdbal = bal_open*ratio
+    tradesize = bal_open*size
+    before = np.where(idx - 2 >= trades.offsets[trades.run], usdbal[np.maximum(idx - 2, 0)], start_bal[trades.run])
+    prev_time = np.concatenate([trades.time[:1], trades.time[:-1]])
+    return {
+        'tradesize': tradesize,
+        'tokenbal': pd.Series(tradesize).groupby(trades.run).cumsum().to_numpy(),
+        'fees': bal_open*fees,
+        'pnl': bal_open*pnl,
+        'usdbal': usdbal,
+        'hold': np.where(trades.is_open | first_in_run, np.nan, trades.time - prev_time),
+        'roi': np.where(trades.is_open, np.nan, bal_open*pnl/before),
+        'held': (k % 2 == 0) & (open_sign != 0),
+    }
+
+
+def run_stats(trades, fee, start_bal=1., periods_per_year=365):
+    """
+    Performance stats of every run, from trade_table()
+
+    Drawdown is over the balances after each trade. Sharpe is annualized from
+        daily returns of the end of day balance, from start_ts to end_ts.
+        Exposure is the share of that time spent in a position, turnover the
+        notional traded as a multiple of the start balance
+
+    Arguments
+    ---------
+    trades (RunTrades)
+    fee (float or np.array):        fee per trade, or one per run
+    start_bal (float or np.array):  balance before the first trade, or one per run
+    periods_per_year (int):         for annualizing the Sharpe ratio
+
+    Returns
+    ---------
+    (pd.DataFrame): one row per run
+
+    """
+    table = trade_table(trades, fee, start_bal=start_bal)
+    num_runs = trades.num_runs
+    start_bal = np.broadcast_to(np.asarray(start_bal, dtype=float), (num_runs,))
+    run = trades.run
+    counts = trades.counts
+    usdbal = table['usdbal']
+    end_bal = np.where(counts > 0, usdbal[np.maximum(trades.offsets[1:] - 1, 0)] if len(usdbal) else 0., start_bal)
+    is_close = ~trades.is_open
+    roi = table['roi']
+    win = is_close & (roi > 0)
+    loss = is_close & ~(roi > 0)
+
+    # Drawdown from the running peak, incl. the start balance
+    peak = np.maximum(pd.Series(usdbal).groupby(run).cummax().to_numpy(), start_bal[run])
+    max_drawdown = np.nan_to_num(_per_run(trades, usdbal/peak - 1, 'min'))
+    max_drawdown = np.minimum(max_drawdown, 0.)
+
+    # Time in a position: from a trade to the next one (or end_ts) if held after it
+    next_time = np.concatenate([trades.time[1:], [0]])
+    last_in_run = np.zeros(len(trades), dtype=bool)
+    last_in_run[trades.offsets[1:][counts > 0] - 1] = True
+    next_time = np.where(last_in_run, np.maximum(trades.end_ts[run], trades.time), next_time)
+    held_secs = np.bincount(run, weights=table['held']*(next_time - trades.time), minlength=num_runs)
+    span = trades.end_ts - trades.start_ts
+
+    # End of day balances: after the last trade before each day's end
+    days = np.maximum(span, 0)//DAY + 1
+    day_run = np.repeat(np.arange(num_runs), days)
+    day_end = (np.arange(days.sum()) - np.repeat(np.cumsum(days) - days, days) + 1)*DAY
+    width = int(max(span.max(), 0)) + 2*DAY if num_runs else 0
+    trade_key = run*width + np.clip(trades.time - trades.start_ts[run], 0, width - 1)
+    last = np.searchsorted(trade_key, day_run*width + day_end) - 1
+    in_run = (last >= trades.offsets[day_run]) if len(usdbal) else np.zeros(len(day_run), dtype=bool)
+    eod = np.where(in_run, usdbal[np.maximum(last, 0)] if len(usdbal) else 0., start_bal[day_run])
+    first_day = np.arange(len(day_run)) == np.repeat(np.cumsum(days) - days, days)
+    prev_eod = np.where(first_day, start_bal[day_run], np.concatenate([[1.], eod[:-1]]))
+    daily = pd.Series(eod/prev_eod - 1).groupby(day_run)
+    std = daily.std().reindex(range(num_runs)).to_numpy()
+    sharpe = daily.mean().reindex(range(num_runs)).to_numpy()/std*np.sqrt(periods_per_year)
+
+    num_closes = np.bincount(run, weights=is_close, minlength=num_runs)
+    return pd.DataFrame({
+        'num_trades': counts,
+        'opens_long': np.bincount(run, weights=trades.is_open & (trades.side > 0), minlength=num_runs).astype(int),
+        'opens_short': np.bincount(run, weights=trades.is_open & (trades.side < 0), minlength=num_runs).astype(int),
+        'closes': num_closes.astype(int),
+        'end_bal': end_bal,
+        'roi': end_bal/start_bal - 1,
+        'fees': np.bincount(run, weights=table['fees'], minlength=num_runs),
+        'avg_roi_per_trade': _per_run(trades, roi[is_close], 'mean', run=run[is_close]),
+        'win_rate': np.bincount(run, weights=win, minlength=num_runs)/np.where(num_closes, num_closes, np.nan),
+        'wins': np.bincount(run, weights=win, minlength=num_runs).astype(int),
+        'losses': np.bincount(run, weights=loss, minlength=num_runs).astype(int),
+        'win_max': _per_run(trades, roi[win], 'max', run=run[win]),
+        'win_min': _per_run(trades, roi[win], 'min', run=run[win]),
+        'win_avg': _per_run(trades, roi[win], 'mean', run=run[win]),
+        'loss_max': _per_run(trades, roi[loss], 'min', run=run[loss]),
+        'loss_min': _per_run(trades, roi[loss], 'max', run=run[loss]),
+        'loss_avg': _per_run(trades, roi[loss], 'mean', run=run[loss]),
+        'avg_hold': _per_run(trades, table['hold'][is_close], 'mean', run=run[is_close]),
+        'sharpe': sharpe,
+        'max_drawdown': max_drawdown,
+        'exposure': held_secs/np.where(span > 0, span, np.nan),
+        'turnover': np.bincount(run, weights=np.abs(table['tradesize']*trades.price), minlength=num_runs)/start_bal,
+    })
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+
+# Fee per trade used for backtest balances, as ta2_stats_reportonly.py
+FEES = {'spot': 0.00075, 'futures': 0.0004}
+
+POSITIONS = ('Short', None, 'Long') # Stored as -1/1
+ACTIONS = ('Close', 'Open') # Stored as 0/1
+
+
+def trade_balances(trades, fee, start_bal=1.):
+    """
+    Balance after each trade, with the same bookkeeping as
+        ta2_stats_reportonly.py: an open trades the whole balance, a close
+        reverses the previous trade's size, and fee is paid on the notional
+
+    Arguments
+    ---------
+    trades (list):      (candle time, position, action, price) tuples
+    fee (float):        fee per trade
+    start_bal (float):  balance before the first trade
+
+    Returns
+    ---------
+    (np.array): balances, one per trade
+
+    """
+    bal = start_bal
+    size = 0.
+    prev_price = None
+    balances = np.empty(len(trades))
+    for i, (_, position, action, price) in enumerate(trades):
+        if action == 'Open':
+            size = bal/price if position == 'Long' else -bal/price
+            pnl = 0.
+        else:
+            size = -size
+            pnl = -size*(price - prev_price) if prev_price else 0.
+        bal += pnl - fee*abs(size*price)
+        prev_price = price
+        balances[i] = bal
+    return balances
+
+
+class RunResult:
+    """
+    Trades and settings of one backtest run, returned by the strategy's run()
+
+    Arguments
+    ---------
+    cfg (dict):         run config (strategy, symbol, params, ...)
+    trades (list):      (candle time, position, action, price) tuples
+    start_ts (int):     backtest start (secs)
+    end_ts (int):       last candle (secs)
+    run_id (str):       defaults to a new unique id
+
+    """
+
+    def __init__(self, cfg, trades, start_ts, end_ts, run_id=None):
+        self.run_id = run_id or uuid.uuid4().hex[:16]
+        self.cfg = cfg
+        self.trades = list(trades)
+        self.start_ts = int(start_ts)
+        self.end_ts = int(end_ts)
+
+    @property
+    def symbol(self):
+        return self.cfg['symbol'][0] + self.cfg['symbol'][1]
+
+    @property
+    def fee(self):
+        return FEES[self.cfg['asset_type']]
+
+    def trades_df(self):
+        return pd.DataFrame(self.trades, columns=['time_candle', 'position', 'action', 'price'])
+
+    def balances(self):
+        """
+        Balance after each trade, starting from cfg start_capital
+        """
+        return trade_balances(self.trades, self.fee, start_bal=self.cfg['start_capital'])
+
+    def roi(self):
+        return trade_balances(self.trades, self.fee)[-1] - 1 if self.trades else 0.
+
+    def summary(self):
+        """
+        Returns
+        ---------
+        (dict): one row for a results table
+
+        """
+        return {
+            'run_id': self.run_id,
+            'strategy': self.cfg['strategy'],
+            'symbol': self.symbol,
+            'asset_type': self.cfg['asset_type'],
+            'start_ts': self.start_ts,
+            'end_ts': self.end_ts,
+            'num_trades': len(self.trades),
+            'roi': self.roi(),
+        }
+
+
+class ResultsStore:
+    """
+    Append-only store of backtest runs
+
+    Each run's trades are saved as columns (time, position, action, price) in
+        their own <run_id>.npz, and one line per run (summary + params) is
+        appended to runs.jsonl. Appends of a single line are atomic, so
+        parallel runs can share a store, and readers only load the runs they
+        ask for
+
+    Arguments
+    ---------
+    root (str): store directory (created if missing), defaults to
+                $RESULTS_DIR or data/results/
+
+    """
+
+    def __init__(self, root=None):
+        if root is None:
+            root = os.environ.get(
+                'RESULTS_DIR',
+                f"{'/'.join(os.path.abspath(__file__).split('/')[:-2])}/data/results")
+        self.root = root
+        if not os.path.isdir(root):
+            os.makedirs(root)
+
+    def append(self, result):
+        time_candle, position, action, price = (
+            zip(*result.trades) if result.trades else ((), (), (), ()))
+        np.savez(
+            f'{self.root}/{result.run_id}.npz',
+            time=np.array(time_candle, dtype=np.int64),
+            position=np.array([POSITIONS.index(p) - 1 for p in position], dtype=np.int8),
+            action=np.array([ACTIONS.index(a) for a in action], dtype=np.int8),
+            price=np.array(price, dtype=float))
+        line = dict(result.summary(), created=int(time.time()), params=result.cfg)
+        with open(f'{self.root}/runs.jsonl', 'a') as f:
+            f.write(json.dumps(line, default=str) + '\n')
+        return result.run_id
+
+    def runs(self, **filters):
+        """
+        Runs in the store, optionally filtered on summary fields or params,
+            e.g. runs(symbol='BTCUSDT', stoploss=0.01)
+
+        Returns
+        ---------
+        (pd.DataFrame): one row per run, oldest first, params as columns
+
+        """
+        rows = []
+        path = f'{self.root}/runs.jsonl'
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    run = json.loads(line)
+                    params = run.pop('params')
+                    run.update({k: v for k, v in params.items() if k not in run and not isinstance(v, (list, dict))})
+                    if all(run.get(k) == v for k, v in filters.items()):
+                        rows.append(run)
+        return pd.DataFrame(rows)
+
+    def trade_columns(self, run_id):
+        """
+        Returns
+        ---------
+        (dict): trade columns of the run as stored: time, position (-1/1),
+                action (0 Close/1 Open), price
+
+        """
+        with np.load(f'{self.root}/{run_id}.npz') as cols:
+            return {col: cols[col] for col in ('time', 'position', 'action', 'price')}
+
+    def trades(self, run_id):
+        """
+        Returns
+        ---------
+        (pd.DataFrame): trades of the run, cols time_candle, position, action, price
+
+        """
+        cols = self.trade_columns(run_id)
+        return pd.DataFrame({
+            'time_candle': cols['time'],
+            'position': [POSITIONS[p + 1] for p in cols['position']],
+            'action': [ACTIONS[a] for a in cols['action']],
+            'price': cols['price'],
+        })
+
+    def latest(self):
+        """
+        run_id of the last run appended, or None
+        """
+        path = f'{self.root}/runs.jsonl'
+        if not os.path.isfile(path):
+            return None
+        last = None
+        with open(path, 'r') as f:
+            for last in f:
+                pass
+        return json.loads(last)['run_id'] if last else None
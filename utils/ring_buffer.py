@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+
+def _empty_value(dtype):
+    # Value of a new row's cols, before they are set
+    if dtype.kind == 'f':
+        return np.nan
+    if dtype.kind == 'b':
+        return False
+    if dtype.kind in 'iu':
+        return 0
+    if dtype.kind in 'mM':
+        return np.datetime64('NaT')
+    return None
+
+
+class CandleRingBuffer:
+    """
+    Fixed capacity storage of a candle series and its indicator cols, for
+        live strategies that would otherwise grow a dataframe per candle
+
+    Each col is an array of 2*capacity rows. Candles are appended past the
+        window and once the arrays are full the window is moved back to the
+        front, so an append is O(1) (amortized) and the window is
+        always one contiguous slice. Memory stays at 2*capacity rows however
+        long the process runs
+
+    frame() is a zero-copy dataframe over the window. Values are written with
+        set() (df.at[] on the frame may copy the col, e.g. a float64 value
+        into a float32 col)
+
+    Arguments
+    ---------
+    capacity (int):     candles kept
+    dtypes (dict):      col -> numpy dtype
+    index_name (str)
+    attrs (dict):       df.attrs of the frames (e.g. compact_candles() decimals)
+
+    """
+
+    def __init__(self, capacity, dtypes, index_name=None, attrs=None):
+        self.capacity = capacity
+        self.index_name = index_name
+        self.attrs = {} if attrs is None else attrs
+        self._index = np.zeros(2*capacity, dtype=np.int64)
+        self._cols = {}
+        for col, dtype in dtypes.items():
+            self.add_column(col, dtype)
+        self._start = 0
+        self._end = 0
+
+    @classmethod
+    def from_frame(cls, df, capacity):
+        """
+        Buffer with the last capacity rows of df
+        """
+        buf = cls(
+            capacity, {col: df[col].dtype for col in df.columns},
+            index_name=df.index.name, attrs=df.attrs)
+        df = df.iloc[-capacity:]
+        n = len(df.index)
+        buf._index[:n] = df.index.to_numpy(dtype=np.int64)
+        for col, values in buf._cols.items():
+            values[:n] = df[col].to_numpy()
+        buf._end = n
+        return buf
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def index(self):
+        return self._index[self._start:self._end]
+
+    def add_column(self, col, dtype):
+        dtype = np.dtype(dtype)
+        values = np.empty(len(self._index), dtype=dtype)
+        values[:] = _empty_value(dtype)
+        self._cols[col] = values
+
+    def append(self, idx, values=None):
+        """
+        Add a row at idx, from the values (col -> value) given. Other cols
+            are left empty (NaN, False, NaT, ...)
+        """
+        if self._end == len(self._index):
+            # Move the window (less the row dropped by this append) to the front
+            keep = self.capacity - 1
+            self._index[:keep] = self._index[self._end - keep:self._end]
+            for col_values in self._cols.values():
+                col_values[:keep] = col_values[self._end - keep:self._end]
+            self._start, self._end = 0, keep
+        pos = self._end
+        self._index[pos] = idx
+        values = {} if values is None else values
+        for col, col_values in self._cols.items():
+            col_values[pos] = values.get(col, _empty_value(col_values.dtype))
+        self._end += 1
+        self._start = max(self._start, self._end - self.capacity)
+
+    def set(self, idx, values):
+        """
+        Set the values (col -> value) of the row at idx
+        """
+        pos = self._start + int(np.searchsorted(self.index, idx))
+        if not (pos < self._end and self._index[pos] == idx):
+            raise KeyError(idx)
+        for col, value in values.items():
+            self._cols[col][pos] = value
+
+    def frame(self, start=None):
+        """
+        Zero-copy dataframe over the window, from index start if given
+        """
+        beg = self._start
+        if start is not None:
+            beg += int(np.searchsorted(self.index, start))
+        df = pd.DataFrame(
+            {col: values[beg:self._end] for col, values in self._cols.items()},
+            index=pd.Index(self._index[beg:self._end], name=self.index_name),
+            copy=False)
+        df.attrs = self.attrs
+        return df
+
+    def update(self, df):
+        """
+        Write back the cols of a frame() that were replaced or added on it
+            (e.g. by a full preprocess_data()), over the rows it covers
+        """
+        beg = self._start + int(np.searchsorted(self.index, df.index[0]))
+        end = beg + len(df.index)
+        for col in df.columns:
+            values = df[col].to_numpy()
+            if col not in self._cols:
+                self.add_column(col, values.dtype)
+            elif not np.can_cast(values.dtype, self._cols[col].dtype, casting='safe'):
+                self._cols[col] = self._cols[col].astype(values.dtype)
+            col_values = self._cols[col]
+            if not np.shares_memory(col_values, values):
+                col_values[beg:end] = values
+        self.attrs = df.attrs
@@ -0,0 +1,176 @@
+import collections
+import math
+import numpy as np
+
+
+def _nan_in(values):
+    return any(math.isnan(v) for v in values)
+
+
+class StreamingWillR:
+    """
+    Williams %R updated one candle at a time, as btalib.willr()
+
+    Holds the last `period` highs/lows, so each update is O(period)
+    """
+
+    def __init__(self, period=14):
+        self.period = period
+        self._highs = collections.deque(maxlen=period)
+        self._lows = collections.deque(maxlen=period)
+        self.value = math.nan
+
+    def update(self, high, low, close):
+        self._highs.append(float(high))
+        self._lows.append(float(low))
+        if len(self._highs) < self.period or _nan_in(self._highs) or _nan_in(self._lows):
+            self.value = math.nan
+            return self.value
+        hh = max(self._highs)
+        ll = min(self._lows)
+        num = -100.0 * (hh - close)
+        den = hh - ll
+        if den == 0:
+            self.value = math.nan if num == 0 or math.isnan(num) else math.copysign(math.inf, num)
+        else:
+            self.value = num / den
+        return self.value
+
+
+class StreamingEMA:
+    """
+    Exponential moving average updated one value at a time
+
+    Follows the arithmetic of pandas ewm(span=period, adjust=False).mean(),
+        which btalib.ema() runs under the hood, including how NaN inputs are
+        carried
+
+    Arguments
+    ---------
+    period (int):   EMA span
+    skip (int):     number of leading inputs ignored (output NaN). btalib.ema()
+                    with _seed=3 (no seed value) on a plain pd.Series drops
+                    its first `period` inputs, i.e. skip=period
+
+    """
+
+    def __init__(self, period, skip=0):
+        self.period = period
+        self.skip = skip
+        self.alpha = 1. / (1. + (period - 1) / 2.)
+        self._old_wt_factor = 1. - self.alpha
+        self._old_wt = 1.
+        self._count = 0
+        self.value = math.nan
+
+    def update(self, x):
+        self._count += 1
+        if self._count <= self.skip:
+            return math.nan
+        x = float(x)
+        is_obs = not math.isnan(x)
+        if not math.isnan(self.value):
+            self._old_wt *= self._old_wt_factor
+            if is_obs:
+                if not self.value == x:
+                    self.value = (
+                        (self._old_wt*self.value + self.alpha*x)
+                        / (self._old_wt + self.alpha))
+                self._old_wt = 1.
+        elif is_obs:
+            self.value = x
+        return self.value
+
+
+class StreamingBBands:
+    """
+    Bollinger bands (population stddev) updated one close at a time, as
+        btalib.bbands()
+
+    The window sums are recomputed exactly over the `period` values held
+        (math.fsum), so they can differ from pandas' running sums in the
+        last few bits
+
+    Returns
+    ---------
+    (tuple): (mid, top, bot)
+
+    """
+
+    def __init__(self, period=20, devs=2.0):
+        self.period = period
+        self.devs = devs
+        self._closes = collections.deque(maxlen=period)
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, close):
+        self._closes.append(float(close))
+        if len(self._closes) < self.period or _nan_in(self._closes):
+            self.value = (math.nan, math.nan, math.nan)
+            return self.value
+        mid = math.fsum(self._closes)/self.period
+        std = math.sqrt(math.fsum((c - mid)**2 for c in self._closes)/self.period)
+        devdist = self.devs*std
+        self.value = (mid, mid + devdist, mid - devdist)
+        return self.value
+
+
+class StreamingFloatingWillR:
+    """
+    WillR/EMA on floating longer-period candles, updated one shorter candle at
+        a time
+
+    The batch calc (WillRBband._create_floating_willr) splits the floating
+        candles into num_intervals interleaved phases (every num_intervals-th
+        row) and runs WillR/EMA on each phase independently. This keeps one
+        StreamingWillR/StreamingEMA pair per phase and routes each new row to
+        its phase
+
+    The resample grid of every phase but the one aligned with the first row
+        starts one longer period before the data, adding a leading NaN candle
+        to that phase. This is reproduced on construction, so the state must be
+        filled starting from the same first row as the batch calc
+
+    Returns (from update)
+    ---------
+    (tuple): (willr, willr_ema, willr_ema_prev) for the new row, where
+        willr_ema_prev is the phase's previous EMA value
+
+    """
+
+    def __init__(self, num_intervals, willr_period=14, ema_period=43):
+        self.num_intervals = num_intervals
+        self._phases = [
+            (StreamingWillR(willr_period), StreamingEMA(ema_period, skip=ema_period))
+            for _ in range(num_intervals)
+        ]
+        self._prev = [math.nan]*num_intervals
+        self._row = 0
+        for willr, ema in self._phases[1:]:
+            ema.update(willr.update(math.nan, math.nan, math.nan))
+
+    def update(self, high, low, close):
+        phase = self._row % self.num_intervals
+        self._row += 1
+        willr, ema = self._phases[phase]
+        r = willr.update(high, low, close)
+        e = ema.update(r)
+        prev = self._prev[phase]
+        self._prev[phase] = e
+        return r, e, prev
+
+
+def check_consistency(streamed, batch, rtol=1e-9, atol=1e-9):
+    """
+    Compare streamed indicator values with the batch-calculated column
+
+    Returns
+    ---------
+    (bool): True if NaNs line up and all other values are within tolerance
+
+    """
+    streamed = np.asarray(streamed, dtype=float)
+    batch = np.asarray(batch, dtype=float)
+    if not streamed.shape == batch.shape:
+        return False
+    return bool(np.allclose(streamed, batch, rtol=rtol, atol=atol, equal_nan=True))
@@ -0,0 +1,43 @@
+import numpy as np
+
+
+def completed_candle_ts(ts, period):
+    """
+    Start timestamp of the longer candle used for a shorter candle at ts
+
+    This is the longer candle before the one ts falls in, i.e. one that
+        completed before ts, so nothing leaks from the future. E.g. for 60m
+        candles, rows from 12:00pm to 12:57pm all map to the 11:00am candle
+
+    Arguments
+    ---------
+    ts (int or np.array):   shorter candle timestamp(s) (secs)
+    period (int):           longer candle period (secs)
+
+    """
+    return ts - ts % period - period
+
+
+def align_to_base(base_index, df, period, cols):
+    """
+    Map columns of a longer series onto the rows of the base (shortest) series
+
+    One vectorized join on completed_candle_ts(); base rows whose longer
+        candle is not in df (e.g. before its first row) get NaN
+
+    Arguments
+    ---------
+    base_index (pd.Index):  base series timestamps (secs)
+    df (pd.DataFrame):      longer series, indexed by candle start (secs)
+    period (int):           longer candle period (secs)
+    cols (iterable):        columns of df to align
+
+    Returns
+    ---------
+    (pd.DataFrame): cols, indexed like base_index
+
+    """
+    base_index = np.asarray(base_index, dtype=np.int64)
+    aligned = df[list(cols)].reindex(completed_candle_ts(base_index, period))
+    aligned.index = base_index
+    return aligned
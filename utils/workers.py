@@ -0,0 +1,57 @@
+import queue
+import logging
+import threading
+
+
+class TaskQueue:
+    """
+    FIFO queue of tasks, run one at a time by a background (daemon) thread
+
+    Tasks run in the order submitted, so each one sees the state left by the
+        ones before it. A task that raises is logged and the next one runs
+
+    Arguments
+    ---------
+    name (str): thread name, for the logs
+
+    """
+
+    def __init__(self, name='tasks'):
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                func, args, kwargs = task
+                func(*args, **kwargs)
+            except Exception:
+                self.logger.exception(f'{self.name}: task failed')
+            finally:
+                self._queue.task_done()
+
+    def submit(self, func, *args, **kwargs):
+        self._queue.put((func, args, kwargs))
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def join(self):
+        """
+        Wait for the submitted tasks to be done
+        """
+        self._queue.join()
+
+    def stop(self, timeout=None):
+        """
+        Run the tasks still queued, then end the thread
+        """
+        self._queue.put(None)
+        self._thread.join(timeout)